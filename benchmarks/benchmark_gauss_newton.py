@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+r"""Benchmark of fit with Migrad and with Gauss-Newton for configurations of `scripts/`.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./benchmarks/benchmark_gauss_newton.py \
+        --configurations asimov-stat asimov-pull-detector real-covmat poisson-stat \
+        --covariance-cache cache/
+"""
+from __future__ import annotations
+
+from argparse import Namespace
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from dag_modelling.tools.logger import logger, set_verbosity
+from dayabay_model import model_dayabay
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import (
+    GaussNewtonMinimizer,
+    ParametersVector,
+    StatisticResiduals,
+    update_covariance_matrix_cached,
+    update_dict_parameters,
+)
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from dag_modelling.parameters import Parameter
+
+# Configurations of `scripts/fit_dayabay_dgm.sh`
+CONFIGURATIONS: dict[str, dict[str, Any]] = {
+    "asimov-stat": {
+        "model": {"concatenation_mode": "detector_period"},
+        "data": "asimov",
+        "statistic": "stat.chi2cnp",
+        "free_parameters": [
+            "survival_probability.DeltaMSq32",
+            "survival_probability.SinSq2Theta13",
+        ],
+        "constrained_parameters": [],
+    },
+    "asimov-pull-detector": {
+        "model": {"concatenation_mode": "detector"},
+        "data": "asimov",
+        "statistic": "full.pull.chi2cnp",
+        "free_parameters": ["survival_probability"],
+        "constrained_parameters": ["detector"],
+    },
+    "real-covmat": {
+        "model": {"concatenation_mode": "detector_period"},
+        "data": "real",
+        "statistic": "full.covmat.chi2cnp",
+        "free_parameters": ["survival_probability", "neutrino_per_fission_factor"],
+        "constrained_parameters": [],
+    },
+    "poisson-stat": {
+        "model": {"concatenation_mode": "detector", "monte_carlo_mode": "poisson", "seed": 1},
+        "data": "asimov",
+        "statistic": "stat.chi2cnp",
+        "free_parameters": ["survival_probability", "neutrino_per_fission_factor"],
+        "constrained_parameters": [],
+    },
+}
+
+
+def main(opts: Namespace) -> None:
+    if opts.verbose:
+        opts.verbose = min(opts.verbose, 3)
+        set_verbosity(opts.verbose)
+
+    for name in opts.configurations:
+        configuration = CONFIGURATIONS[name]
+        model = model_dayabay(path_data=opts.path_data, **configuration["model"])
+        storage = model.storage
+        model.switch_data(configuration["data"])
+        if "covmat" in configuration["statistic"]:
+            if opts.covariance_cache:
+                update_covariance_matrix_cached(
+                    model,
+                    {
+                        "path_data": opts.path_data,
+                        "concatenation_mode": configuration["model"]["concatenation_mode"],
+                    },
+                    opts.covariance_cache,
+                )
+            else:
+                model.update_covariance_matrix()
+
+        parameters: dict[str, Parameter] = {}
+        update_dict_parameters(
+            parameters, configuration["free_parameters"], storage["parameters.free"]
+        )
+        update_dict_parameters(
+            parameters, configuration["constrained_parameters"], storage["parameters.constrained"]
+        )
+        statistic = storage[f"outputs.statistic.{configuration['statistic']}"]
+        vector = ParametersVector(parameters)
+        nominal = vector.values
+
+        minimizers = {
+            "migrad": IMinuitMinimizer(statistic, parameters=parameters, nbins=model.nbins),
+            "gauss-newton": GaussNewtonMinimizer(
+                statistic,
+                parameters=parameters,
+                residuals=StatisticResiduals(storage, configuration["statistic"]),
+                nbins=model.nbins,
+            ),
+        }
+        for minimizer_name, minimizer in minimizers.items():
+            vector.set(nominal)
+            statistic.data
+            start = perf_counter()
+            fit = minimizer.fit()
+            time = perf_counter() - start
+            logger.info(
+                f"{name} ({len(vector)} parameters), {minimizer_name}: chi2 {fit['fun']:.6f}, "
+                f"success {fit['success']}, nfev {fit['nfev']}, time {time:.2f} s, "
+                + ", ".join(
+                    f"{parameter} {fit['xdict'][parameter]:.6g}±{fit['errorsdict'][parameter]:.2g}"
+                    for parameter in opts.report_parameters
+                    if parameter in fit["xdict"]
+                )
+            )
+        vector.set(nominal)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("-v", "--verbose", default=1, action="count", help="verbosity level")
+    parser.add_argument("--path-data", default=None, help="Path to data")
+    parser.add_argument(
+        "--configurations",
+        default=list(CONFIGURATIONS),
+        choices=list(CONFIGURATIONS),
+        nargs="+",
+        help="Configurations of fits from `scripts/fit_dayabay_dgm.sh`",
+    )
+    parser.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="Directory to cache Jacobians of systematic covariance matrix",
+    )
+    parser.add_argument(
+        "--report-parameters",
+        default=["survival_probability.SinSq2Theta13", "survival_probability.DeltaMSq32"],
+        nargs="*",
+        help="Parameters, which best fit values and errors are printed",
+    )
+
+    main(parser.parse_args())
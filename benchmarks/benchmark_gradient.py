@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+r"""Benchmark of fit with numerical derivatives of Migrad and with `StatisticGradient`.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./benchmarks/benchmark_gradient.py \
+        --free-parameters survival_probability neutrino_per_fission_factor \
+        --constrained-parameters detector reactor background reactor_antineutrino \
+        --statistic full.pull.chi2cnp
+"""
+from __future__ import annotations
+
+from argparse import Namespace
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from dag_modelling.tools.logger import logger, set_verbosity
+from dayabay_model import model_dayabay
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import IMinuitGradientMinimizer, ParametersVector, update_dict_parameters
+
+if TYPE_CHECKING:
+    from dag_modelling.parameters import Parameter
+
+
+def main(opts: Namespace) -> None:
+    if opts.verbose:
+        opts.verbose = min(opts.verbose, 3)
+        set_verbosity(opts.verbose)
+
+    model = model_dayabay(path_data=opts.path_data, concatenation_mode=opts.concatenation_mode)
+    storage = model.storage
+    model.switch_data(opts.data)
+
+    parameters: dict[str, Parameter] = {}
+    update_dict_parameters(parameters, opts.free_parameters, storage["parameters.free"])
+    update_dict_parameters(
+        parameters, opts.constrained_parameters, storage["parameters.constrained"]
+    )
+    statistic = storage[f"outputs.statistic.{opts.statistic}"]
+    vector = ParametersVector(parameters)
+    nominal = vector.values
+    logger.info(f"Number of parameters: {len(vector)}")
+
+    minimizers = {
+        "numeric": IMinuitMinimizer(statistic, parameters=parameters),
+        **{
+            f"gradient ({method})": IMinuitGradientMinimizer(
+                statistic,
+                parameters=parameters,
+                gradient_scale=opts.gradient_scale,
+                gradient_method=method,
+            )
+            for method in opts.gradient_methods
+        },
+    }
+    for name, minimizer in minimizers.items():
+        vector.set(nominal)
+        statistic.data
+        start = perf_counter()
+        fit = minimizer.fit()
+        time = perf_counter() - start
+        nevaluations = fit["nfev"]
+        if isinstance(minimizer, IMinuitGradientMinimizer):
+            nevaluations += minimizer.gradient.nevaluations
+        logger.info(
+            f"{name}: chi2 {fit['fun']:.6f}, success {fit['success']}, nfev {fit['nfev']}, "
+            f"evaluations with gradient {nevaluations}, time {time:.2f} s"
+        )
+    vector.set(nominal)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("-v", "--verbose", default=1, action="count", help="verbosity level")
+    parser.add_argument("--path-data", default=None, help="Path to data")
+    parser.add_argument(
+        "--concatenation-mode",
+        default="detector",
+        choices=["detector", "detector_period"],
+        help="Choose type of concatenation for final observation: by detector or by detector and period",
+    )
+    parser.add_argument(
+        "--data",
+        default="real",
+        choices=["asimov", "real"],
+        help="Choose data for fit",
+    )
+    parser.add_argument(
+        "--statistic",
+        default="full.pull.chi2cnp",
+        help="Choose chi-squared function for minimizer, e.g. `stat.chi2cnp`",
+    )
+    parser.add_argument(
+        "--free-parameters",
+        default=[],
+        nargs="*",
+        help="Add free parameters to minimization process",
+    )
+    parser.add_argument(
+        "--constrained-parameters",
+        default=[],
+        nargs="*",
+        help="Add constrained parameters to minimization process",
+    )
+    parser.add_argument(
+        "--gradient-methods",
+        default=["central", "forward"],
+        choices=["central", "forward"],
+        nargs="+",
+        help="Finite differences of gradient",
+    )
+    parser.add_argument(
+        "--gradient-scale",
+        default=1e-3,
+        type=float,
+        help="Scale of steps of finite differences",
+    )
+
+    main(parser.parse_args())
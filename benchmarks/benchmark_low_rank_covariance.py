@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+r"""Benchmark of chi-squared with dense and factored (low-rank + diagonal) covariance matrix.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./benchmarks/benchmark_low_rank_covariance.py \
+        --variance-fractions 0.99 0.9999 0.999999 \
+        --covariance-cache cache/
+"""
+from __future__ import annotations
+
+from argparse import Namespace
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+from dag_modelling.tools.logger import logger, set_verbosity
+from dayabay_model import model_dayabay
+from scipy.linalg import cho_factor, cho_solve
+
+from fits import LowRankCovariance, update_covariance_matrix_cached
+
+if TYPE_CHECKING:
+    from typing import Callable
+
+    from numpy.typing import NDArray
+
+
+def chi2_dense(covariance_matrix: NDArray, residual: NDArray, diagonal: NDArray) -> float:
+    """Calculate chi-squared with Cholesky decomposition of dense matrix, reference implementation."""
+    matrix = covariance_matrix.copy()
+    matrix[np.diag_indices_from(matrix)] += diagonal
+    return float(residual @ cho_solve(cho_factor(matrix, lower=True), residual))
+
+
+def measure(function: Callable[[], float], repeat: int) -> tuple[float, float]:
+    """Return value of function and time per call in seconds."""
+    start = perf_counter()
+    for _ in range(repeat):
+        value = function()
+    return value, (perf_counter() - start) / repeat
+
+
+def main(opts: Namespace) -> None:
+    if opts.verbose:
+        opts.verbose = min(opts.verbose, 3)
+        set_verbosity(opts.verbose)
+
+    for concatenation_mode in opts.concatenation_modes:
+        model = model_dayabay(path_data=opts.path_data, concatenation_mode=concatenation_mode)
+        storage = model.storage
+        model.switch_data(opts.data)
+        if opts.covariance_cache:
+            update_covariance_matrix_cached(
+                model,
+                {"path_data": opts.path_data, "concatenation_mode": concatenation_mode},
+                opts.covariance_cache,
+            )
+        else:
+            model.update_covariance_matrix()
+
+        covariance_matrix = storage["outputs.covariance.covmat_syst.sum"].data.copy()
+        variance = storage["outputs.statistic.staterr.cnp_variance"].data.copy()
+        residual = (
+            storage["outputs.data.proxy"].data
+            - storage["outputs.eventscount.final.concatenated.selected"].data
+        )
+        chi2_model = storage["outputs.statistic.full.covmat.chi2cnp"].data[0]
+
+        chi2, time_dense = measure(
+            lambda: chi2_dense(covariance_matrix, residual, variance), opts.repeat
+        )
+        logger.info(
+            f"{concatenation_mode}: n={residual.size}, chi2 of model {chi2_model:.6f}, "
+            f"dense {chi2:.6f}, {time_dense * 1e3:.3f} ms/call"
+        )
+        for variance_fraction in opts.variance_fractions:
+            low_rank = LowRankCovariance.from_matrix(
+                covariance_matrix, variance_fraction=variance_fraction
+            )
+            chi2_low_rank, time_low_rank = measure(
+                lambda: low_rank.chi2(residual, variance), opts.repeat
+            )
+            logger.info(
+                f"{concatenation_mode}: variance fraction {variance_fraction}, "
+                f"k={low_rank.rank}, retained {low_rank.retained_variance:.8f}, "
+                f"chi2 {chi2_low_rank:.6f} (difference {chi2_low_rank - chi2:+.2e}), "
+                f"{time_low_rank * 1e3:.3f} ms/call, speed up {time_dense / time_low_rank:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("-v", "--verbose", default=1, action="count", help="verbosity level")
+    parser.add_argument("--path-data", default=None, help="Path to data")
+    parser.add_argument(
+        "--concatenation-modes",
+        default=["detector", "detector_period"],
+        choices=["detector", "detector_period"],
+        nargs="+",
+        help="Choose types of concatenation for final observation",
+    )
+    parser.add_argument(
+        "--data",
+        default="real",
+        choices=["asimov", "real"],
+        help="Choose data for residuals",
+    )
+    parser.add_argument(
+        "--variance-fractions",
+        default=[0.99, 0.9999, 0.999999],
+        type=float,
+        nargs="+",
+        help="Fractions of variance to be retained by the factor",
+    )
+    parser.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="Directory to cache Jacobians of systematic covariance matrix",
+    )
+    parser.add_argument("--repeat", default=100, type=int, help="Number of calls to measure")
+
+    main(parser.parse_args())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+r"""Microbenchmark of assignment of parameters: loop over `Parameter` vs `ParametersVector`.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./benchmarks/benchmark_parameters_vector.py \
+        --systematic-parameters-groups detector reactor \
+        --num 200
+"""
+
+from __future__ import annotations
+
+from argparse import Namespace
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+from dag_modelling.tools.logger import logger, set_verbosity
+from dayabay_model import model_dayabay
+
+from fits import ParametersVector
+
+if TYPE_CHECKING:
+    from typing import Callable
+
+    from dag_modelling.core.output import Output
+    from dag_modelling.parameters import Parameter
+    from numpy.typing import NDArray
+
+
+def set_parameters_loop(parameters: list[Parameter], values: NDArray) -> None:
+    """Set values of parameters one by one, reference implementation."""
+    for parameter, value in zip(parameters, values):
+        parameter.value = value
+
+
+def measure(
+    assign: Callable[[NDArray], None],
+    samples: NDArray,
+    observation: Output | None = None,
+) -> float:
+    """Measure time per sample of assignment and, optionally, evaluation of observation.
+
+    Parameters
+    ----------
+    assign : Callable[[NDArray], None]
+        Function that assigns vector of values.
+    samples : NDArray
+        Two dimensional array of samples.
+    observation : Output, optional
+        Observation to be evaluated after each assignment.
+
+    Returns
+    -------
+    float
+        Time per sample in seconds.
+    """
+    start = perf_counter()
+    for sample in samples:
+        assign(sample)
+        if observation is not None:
+            observation.data
+    return (perf_counter() - start) / samples.shape[0]
+
+
+def main(opts: Namespace) -> None:
+    if opts.verbose:
+        opts.verbose = min(opts.verbose, 3)
+        set_verbosity(opts.verbose)
+
+    model = model_dayabay(path_data=opts.path_data, concatenation_mode=opts.concatenation_mode)
+    storage = model.storage
+    observation = storage["outputs.eventscount.final.concatenated.selected"]
+
+    vector = ParametersVector.from_groups(
+        opts.systematic_parameters_groups, storage["parameters.normalized"]
+    )
+    parameters = vector.parameters
+    nominal = vector.values
+    observation.data
+
+    generator = np.random.Generator(np.random.MT19937(opts.seed))
+    samples = generator.normal(size=(opts.num, len(vector)))
+    # Only a few parameters are changed, as in scan over grid
+    samples_sparse = np.tile(nominal, (opts.num, 1))
+    samples_sparse[:, : opts.nchanged] = samples[:, : opts.nchanged]
+
+    assignments = {
+        "loop": lambda values: set_parameters_loop(parameters, values),
+        "vector": vector.set,
+    }
+    logger.info(f"Number of parameters: {len(vector)}, number of samples: {opts.num}")
+    for title, samples_, evaluate in (
+        ("all parameters changed, assignment only", samples, False),
+        ("all parameters changed, with evaluation", samples, True),
+        (f"{opts.nchanged} parameters changed, assignment only", samples_sparse, False),
+        (f"{opts.nchanged} parameters changed, with evaluation", samples_sparse, True),
+    ):
+        times = {}
+        for name, assign in assignments.items():
+            assign(nominal)
+            observation.data
+            times[name] = measure(assign, samples_, observation if evaluate else None)
+        logger.info(
+            f"{title}: "
+            + ", ".join(f"{name} {time * 1e6:.1f} us/sample" for name, time in times.items())
+            + f", speed up {times['loop'] / times['vector']:.2f}"
+        )
+    vector.set(nominal)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("-v", "--verbose", default=1, action="count", help="verbosity level")
+    parser.add_argument("--path-data", default=None, help="Path to data")
+    parser.add_argument(
+        "--concatenation-mode",
+        default="detector",
+        choices=["detector", "detector_period"],
+        help="Choose type of concatenation for final observation: by detector or by detector and period",
+    )
+    parser.add_argument(
+        "--systematic-parameters-groups",
+        "--groups",
+        nargs="+",
+        required=True,
+        help="Groups of normalized parameters to be assigned",
+    )
+    parser.add_argument("--seed", default=0, type=int, help="Seed of generator")
+    parser.add_argument("--num", default=200, type=int, help="Number of samples")
+    parser.add_argument(
+        "--nchanged",
+        default=2,
+        type=int,
+        help="Number of changed parameters in the sparse case",
+    )
+
+    main(parser.parse_args())
@@ -12,23 +12,45 @@ Example of call
         --systematic-parameters-groups survival_probability background \
         "--seed 1 \
         "--num 500
+
+Example of call with several worker processes
+
+.. code-block:: shell
+
+    ./covariances/covmatrix_mc.py \
+        --systematic-parameters-groups all \
+        --seed 1 \
+        --num 10000 \
+        --workers 8
 """
+
 from __future__ import annotations
+
+import os
+import warnings
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from json import dumps as json_dumps
+from typing import TYPE_CHECKING
+
 import h5py
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
-from dag_modelling.tools.logger import set_verbosity
-from dayabay_model import model_dayabay
 from dag_modelling.parameters import Parameter
-from typing import TYPE_CHECKING
+from dag_modelling.tools.logger import logger, set_verbosity
+from dayabay_model import model_dayabay
+from matplotlib import pyplot as plt
+from scipy.stats import norm, qmc
+
+from fits import LowRankCovariance
 
 if TYPE_CHECKING:
-    from typing import Callable
-    from numpy.typing import NDArray
+    from typing import Any, Callable, Literal
+
     from dag_modelling.core import NodeStorage
     from dag_modelling.core.output import Output
+    from numpy.typing import NDArray
 
 
 SYSTEMATIC_UNCERTAINTIES_GROUPS = {
@@ -53,35 +75,230 @@ def save_npz(data: NDarray, filename: str) -> None:
     np.savez(filename, covariance_matrix=data)
 
 
-def save_hdf5(data: NDarray, filename: str) -> None:
+def save_npy(data: NDArray, filename: str) -> None:
+    np.save(filename, data)
+
+
+def load_covariance_matrix(filename: str) -> NDArray:
+    """Load covariance matrix saved by the script.
+
+    Parameters
+    ----------
+    filename : str
+        Path to file with covariance matrix, supports: `csv`, `dat`, `npz`, `npy`, `hdf5`.
+
+    Returns
+    -------
+    NDArray
+        Covariance matrix.
+    """
+    *rootparts, ext = filename.split(".")
+    match ext:
+        case "csv":
+            return pd.read_csv(filename).to_numpy()
+        case "dat":
+            return np.loadtxt(filename)
+        case "npz":
+            return np.load(filename)["covariance_matrix"]
+        case "npy":
+            return np.load(filename)
+        case "hdf5":
+            with h5py.File(filename, "r") as f:
+                return f["covariance_matrix"][:]
+        case _:
+            raise RuntimeError(f"Couldn't load covariance matrix from `.{ext}`-type")
+
+
+def save_hdf5(
+    covariance_matrices: dict[str, NDArray],
+    labelled_groups: dict[str, list[str]],
+    asimov: NDArray,
+    bin_edges: NDArray,
+    concatenation_mode: str,
+    filename: str,
+    low_rank: LowRankCovariance | None = None,
+    compression: Literal["gzip", "lzf"] | None = None,
+    chunk_size: int = 256,
+) -> None:
+    """Save covariance matrices to HDF5 file.
+
+    Absolute covariance matrix of all the groups is saved to `covariance_matrix`
+    dataset, relative covariance matrix and correlation matrix are saved to
+    `covariance_matrix_relative` and `correlation_matrix` datasets. If matrices
+    of several groups are passed, each of them is saved to `covariance_matrices/<label>`.
+
+    Matrices are stored in square chunks, so a block of matrix could be read
+    without reading the whole dataset, see `fits.load_covariance_matrix_block`.
+
+    Parameters
+    ----------
+    covariance_matrices : dict[str, NDArray]
+        Absolute covariance matrices labelled by group, `total` is for all the groups.
+    labelled_groups : dict[str, list[str]]
+        Parameters groups that were used for each matrix.
+    asimov : NDArray
+        Asimov observation.
+    bin_edges : NDArray
+        Bin edges of observation of a single detector (period).
+    concatenation_mode : str
+        Type of concatenation of the final observation.
+    filename : str
+        Path to HDF5 file.
+    low_rank : LowRankCovariance, optional
+        Factored representation of the total covariance matrix, saved to `low_rank` group.
+    compression : Literal["gzip", "lzf"], optional
+        Compression filter of matrices.
+    chunk_size : int
+        Size of square chunk of matrices.
+
+    Returns
+    -------
+    None
+    """
+    covariance_matrix = covariance_matrices["total"]
+    size = min(chunk_size, covariance_matrix.shape[0])
+    options = {"chunks": (size, size), "compression": compression}
     with h5py.File(filename, "w") as f:
-        f.create_dataset("covariance_matrix", data=data)
+        f.attrs["concatenation_mode"] = concatenation_mode
+        f.attrs["systematic_parameters_groups"] = list(labelled_groups["total"])
+        f.create_dataset("bin_edges", data=bin_edges)
+        f.create_dataset("asimov", data=asimov)
+        f.create_dataset("covariance_matrix", data=covariance_matrix, **options)
+        f.create_dataset(
+            "covariance_matrix_relative",
+            data=covariance_matrix / np.outer(asimov, asimov),
+            **options,
+        )
+        f.create_dataset(
+            "correlation_matrix",
+            data=calculate_correlation_matrix(covariance_matrix),
+            **options,
+        )
+        if low_rank is not None:
+            group = f.create_group("low_rank")
+            group.attrs["rank"] = low_rank.rank
+            group.attrs["retained_variance"] = low_rank.retained_variance
+            group.create_dataset("factor", data=low_rank.factor, compression=compression)
+            group.create_dataset("diagonal", data=low_rank.diagonal)
+        if len(covariance_matrices) == 1:
+            return
+        for label, covariance_matrix in covariance_matrices.items():
+            dataset = f.create_dataset(
+                f"covariance_matrices/{label}", data=covariance_matrix, **options
+            )
+            dataset.attrs["systematic_parameters_groups"] = list(labelled_groups[label])
 
 
 _save_data: dict[str, Callable] = {
     "csv": save_csv,
     "dat": save_dat,
     "npz": save_npz,
-    "hdf5": save_hdf5,
+    "npy": save_npy,
+}
+
+
+def _convert_uniform_to_normal(samples: NDArray) -> NDArray:
+    """Convert samples of U(0, 1) to N(0, 1) via inverse transform.
+
+    Samples are squeezed a bit to avoid infinite values at the bounds.
+    """
+    return norm.ppf(0.5 + (1 - 1e-10) * (samples - 0.5))
+
+
+# Samplers draw `N` samples of `nparameters` parameters. Pseudo-random samplers use
+# generator of the stream. Quasi-random samplers ignore it: there is a single sequence
+# of `total` samples for the whole calculation, scrambled with `seed`, and each call
+# draws samples from `start` to `start + N` of it. So the sequence is split between
+# streams and steps and does not depend on them.
+
+
+def sample_normal(
+    generator: np.random.Generator, N: int, nparameters: int, **kwargs: int | None
+) -> NDArray:
+    """Draw independent samples of normal unit distribution N(0, 1)."""
+    return generator.normal(0, 1, size=(N, nparameters))
+
+
+def sample_sobol(
+    generator: np.random.Generator,
+    N: int,
+    nparameters: int,
+    *,
+    seed: int = 0,
+    start: int = 0,
+    total: int | None = None,
+) -> NDArray:
+    """Draw samples of scrambled Sobol sequence transformed to N(0, 1).
+
+    Balance properties of the sequence hold when the total number of samples
+    is a power of 2, the sequence is not regenerated for `start`, it is skipped.
+    """
+    sobol = qmc.Sobol(nparameters, seed=seed)
+    if start:
+        sobol.fast_forward(start)
+    with warnings.catch_warnings():
+        # Balance is checked for the whole sequence in `main`, not for the part
+        warnings.filterwarnings("ignore", "The balance properties", UserWarning)
+        return _convert_uniform_to_normal(sobol.random(N))
+
+
+def sample_latin_hypercube(
+    generator: np.random.Generator,
+    N: int,
+    nparameters: int,
+    *,
+    seed: int = 0,
+    start: int = 0,
+    total: int | None = None,
+) -> NDArray:
+    """Draw samples of Latin hypercube transformed to N(0, 1).
+
+    Hypercube of `total` samples is generated, stratification holds for all of them.
+    """
+    hypercube = qmc.LatinHypercube(nparameters, seed=seed).random(total or start + N)
+    return _convert_uniform_to_normal(hypercube[start : start + N])
+
+
+def sample_antithetic(
+    generator: np.random.Generator, N: int, nparameters: int, **kwargs: int | None
+) -> NDArray:
+    """Draw pairs of samples of N(0, 1), the second sample of the pair is opposite to the first.
+
+    If `N` is odd, the last sample is not paired.
+    """
+    samples = np.empty((N, nparameters))
+    samples_half = generator.normal(0, 1, size=((N + 1) // 2, nparameters))
+    samples[0::2] = samples_half
+    samples[1::2] = -samples_half[: N // 2]
+    return samples
+
+
+_samplers: dict[str, Callable[..., NDArray]] = {
+    "normal": sample_normal,
+    "sobol": sample_sobol,
+    "latin-hypercube": sample_latin_hypercube,
+    "antithetic": sample_antithetic,
 }
 
 
-def variate_parameters(parameters: list[Parameter], generator: np.random.Generator) -> None:
-    """Randomize value of parameters via normal unit distribution N(0, 1).
+def expand_systematic_groups(model, groups: list[str]) -> list[str]:
+    """Replace `all` with the list of all systematic groups of model.
 
     Parameters
     ----------
-    parameters : list[Parameter]
-        List of normalized parameters.
-    generator : np.random.Generator
-        Numpy generator of pseudo-random numbers.
+    model : model_dayabay_v0x
+        Object of model.
+    groups : list[str]
+        List of parameters groups.
 
     Returns
     -------
-    None
+    list[str]
+        List of parameters groups.
     """
-    for parameter in parameters:
-        parameter.value = generator.normal(0, 1)
+    if "all" in groups:
+        return list(model.systematic_uncertainties_groups().values())
+    return list(groups)
 
 
 def create_list_of_variation_parameters(
@@ -106,9 +323,7 @@ def create_list_of_variation_parameters(
         List of normalized parameters.
     """
     parameters = []
-    if "all" in groups:
-        groups = model.systematic_uncertainties_groups().values()
-    for group in groups:
+    for group in expand_systematic_groups(model, groups):
         if isinstance(storage[f"parameters.normalized.{group}"], Parameter):
             parameters.append(storage[f"parameters.normalized.{group}"])
         else:
@@ -118,12 +333,188 @@ def create_list_of_variation_parameters(
     return parameters
 
 
+class CovarianceAccumulator:
+    r"""Streaming accumulator of the mean and the sum of products of deviations.
+
+    Samples are buffered into preallocated block of `block_size` rows. When
+    the block is full, it is folded into the accumulated sums with a single
+    matrix product. Memory is bounded by :math:`O(K n + n^2)`, where `K` is
+    size of the block and `n` is size of the observation.
+
+    Notes
+    -----
+    Block with :math:`n_b` samples, mean :math:`\overline{x}^b`, and sum of
+    products of deviations :math:`M^b` is merged with the accumulated values
+    (:math:`n_a`, :math:`\overline{x}^a`, :math:`M^a`) via pairwise formula
+
+    .. math:: M_{ij} = M^a_{ij} + M^b_{ij} + \frac{n_a n_b}{n_a + n_b}\delta_i\delta_j,
+
+    where :math:`\delta = \overline{x}^b - \overline{x}^a`. The last term is appended
+    to the centered block as an extra row, so the block is folded with one product.
+    """
+
+    __slots__ = (
+        "_block",
+        "_block_count",
+        "_product",
+        "count",
+        "mean",
+        "deviations_product_sum",
+    )
+
+    _block: NDArray
+    _block_count: int
+    _product: NDArray
+    count: int
+    mean: NDArray
+    deviations_product_sum: NDArray
+
+    def __init__(self, size: int, block_size: int = 100) -> None:
+        self._block = np.zeros((block_size + 1, size))
+        self._block_count = 0
+        self._product = np.empty((size, size))
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.deviations_product_sum = np.zeros((size, size))
+
+    @property
+    def block_size(self) -> int:
+        return self._block.shape[0] - 1
+
+    def add(self, observation: NDArray) -> None:
+        """Add sample to the block, fold the block if it is full."""
+        self._block[self._block_count] = observation
+        self._block_count += 1
+        if self._block_count == self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Fold buffered samples into the accumulated sums."""
+        nsamples_block = self._block_count
+        if nsamples_block == 0:
+            return
+        block = self._block[: nsamples_block + 1]
+        block_mean = block[:nsamples_block].mean(axis=0)
+        block[:nsamples_block] -= block_mean
+
+        nsamples = self.count + nsamples_block
+        delta = block_mean - self.mean
+        block[nsamples_block] = delta * (self.count * nsamples_block / nsamples) ** 0.5
+        np.matmul(block.T, block, out=self._product)
+
+        self.deviations_product_sum += self._product
+        self.mean += delta * (nsamples_block / nsamples)
+        self.count = nsamples
+        self._block_count = 0
+
+    def merge(self, other: CovarianceAccumulator) -> None:
+        """Merge accumulated sums of other accumulator into this one."""
+        self.flush()
+        other.flush()
+        if other.count == 0:
+            return
+        nsamples = self.count + other.count
+        delta = other.mean - self.mean
+        self.deviations_product_sum += other.deviations_product_sum
+        self.deviations_product_sum += np.outer(delta, delta) * (
+            self.count * other.count / nsamples
+        )
+        self.mean += delta * (other.count / nsamples)
+        self.count = nsamples
+
+    def covariance(self, asimov: NDArray | None = None) -> NDArray:
+        r"""Calculate absolute covariance matrix from accumulated sums.
+
+        Parameters
+        ----------
+        asimov : NDArray, optional
+            Asimov observation (no fluctuation of parameters).
+
+        Returns
+        -------
+        NDArray
+            Two dimensional square array, absolute covariance matrix.
+
+        Notes
+        -----
+        If Asimov observation is not passed, the next formula is used
+
+        .. math:: cov_{ij} = \frac{M_{ij}}{N - 1},
+
+        If Asimov observation is passed, it is used as mean
+
+        .. math:: cov_{ij} = \frac{M_{ij}}{N} + (\overline{x_i} - x_i^A)(\overline{x_j} - x_j^A).
+        """
+        self.flush()
+        if asimov is not None:
+            deviation = self.mean - asimov
+            return self.deviations_product_sum / self.count + np.outer(deviation, deviation)
+        return self.deviations_product_sum / (self.count - 1)
+
+
+def accumulate_covariance(
+    parameters: list[Parameter],
+    generator: np.random.Generator,
+    observation: Output,
+    N: int,
+    accumulator: CovarianceAccumulator,
+    sampler: str = "normal",
+    seed: int = 0,
+    start: int = 0,
+    total: int | None = None,
+) -> None:
+    """Variate parameters and add observations to the accumulator.
+
+    Parameters
+    ----------
+    parameters : list[Parameter]
+        List of normalized parameters.
+    generator : np.random.Generator
+        Numpy generator of pseudo-random numbers.
+    observation : Output
+        Observation of model that depends on parameters.
+    N : int
+        Number of samples.
+    accumulator : CovarianceAccumulator
+        Accumulator of samples.
+    sampler : str
+        Name of sampler from `_samplers`.
+    seed : int
+        Seed of scrambling of quasi-random sequence.
+    start : int
+        Index of the first sample in quasi-random sequence.
+    total : int, optional
+        Total number of samples of quasi-random sequence. Default: `start + N`.
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    All the `N` samples of parameters are drawn at once. Every parameter changes
+    in each sample, so values are written directly, without comparison with the
+    current ones of `ParametersVector`.
+    Parameters are returned back to the initial values after sampling.
+    """
+    values = [parameter.value for parameter in parameters]
+    samples = _samplers[sampler](generator, N, len(parameters), seed=seed, start=start, total=total)
+    for sample in samples:
+        for parameter, value in zip(parameters, sample.tolist()):
+            parameter.value = value
+        accumulator.add(observation.data)
+    for parameter, value in zip(parameters, values):
+        parameter.value = value
+
+
 def covariance_matrix_calculation(
     parameters: list[Parameter],
     generator: np.random.Generator,
     observation: Output,
     N: int,
     asimov: NDArray | None = None,
+    block_size: int = 100,
+    sampler: str = "normal",
 ) -> NDArray:
     r"""Calculate absolute covariance matrix.
 
@@ -139,6 +530,10 @@ def covariance_matrix_calculation(
         Number of samples for calculation covariance matrices.
     asimov : NDArray, optional
         Asimov observation (no fluctuation of parameters).
+    block_size : int
+        Number of samples folded into accumulated sums at once.
+    sampler : str
+        Name of sampler from `_samplers`.
 
     Returns
     -------
@@ -149,97 +544,353 @@ def covariance_matrix_calculation(
     -----
     For the calculation used the next formula
 
-    .. math:: cov_{ij} = \frac{1}{N}\sum_{k = 1}^{N}(x_i^k - \overline{x_i})(x_j^k - \overline{x_j}),
+    .. math:: cov_{ij} = \frac{1}{N - 1}\sum_{k = 1}^{N}(x_i^k - \overline{x_i})(x_j^k - \overline{x_j}),
 
     where `x_i^k` is `i`-th bin value of `k`-th sample, `\overline{x_i}` is mean
-    value of `i`-th bin, $N$ is normalization factor
+    value of `i`-th bin. The sum is accumulated block by block, see `CovarianceAccumulator`.
+
+    If Asimov observation is passed, it is used instead of mean and the
+    normalization factor is `N`.
+    """
+    accumulator = CovarianceAccumulator(observation.data.shape[0], block_size)
+    accumulate_covariance(parameters, generator, observation, N, accumulator, sampler)
+    return accumulator.covariance(asimov)
 
-    Here we are using simplified formula
 
-    .. math:: cov_{ij} = \frac{1}{\text{norm}} \overline{x_i x_j} - \overline{x_i}\overline{x_j^A} - \overline{x_j}\overline{x_i^A} + \overline{x_i^A}\overline{x_i^A},
+_worker_state: dict[str, Any] = {}
 
-    where we averaging over all MC samples
 
-    If Asimov observation is passed, the next formula is used
+def _initialize_worker(model_options: dict[str, Any]) -> None:
+    """Build model instance in the worker process.
 
-    .. math:: cov_{ij} = \frac{1}{\text{norm}} \overline{x_i x_j} - \overline{x_i}\overline{x_j^A} - \overline{x_j}\overline{x_i^A} + \overline{x_i^A}\overline{x_j^A},
+    Parameters
+    ----------
+    model_options : dict[str, Any]
+        Keyword arguments for the model.
+
+    Returns
+    -------
+    None
     """
-    observation_size = observation.data.shape[0]
-    product_mean = np.zeros((observation_size, observation_size))
-    observation_sum = np.zeros(observation_size)
-    for _ in range(N):
-        variate_parameters(parameters, generator)
-        observation_sum += observation.data
-        product_mean += np.outer(observation.data, observation.data)
-    if asimov is not None:
-        product_mean /= N
-        observation_mean_asimov = np.outer(observation_sum, asimov) / N
-        observation_product_mean = (
-            observation_mean_asimov + observation_mean_asimov.T - np.outer(asimov, asimov)
-        )
-    else:
-        product_mean /= N - 1
-        observation_product_mean = np.outer(observation_sum, observation_sum) / ((N - 1) * N)
-    covariance_matrix_absolute = product_mean - observation_product_mean
-    return covariance_matrix_absolute
+    model = model_dayabay(**model_options)
+    _worker_state["model"] = model
+    _worker_state["observation"] = model.storage["outputs.eventscount.final.concatenated.selected"]
+    _worker_state["parameters"] = {}
 
 
-def covariance_matrix_calculation_alternative(
-    parameters: list[Parameter],
+def _accumulate_covariance_worker(
     generator: np.random.Generator,
-    observation: Output,
     N: int,
-    asimov: NDArray | None = None,
-) -> NDArray:
-    r"""Calculate absolute matrix (alternative method).
+    block_size: int,
+    groups: list[str],
+    sampler: str,
+    seed: int,
+    start: int,
+    total: int | None,
+) -> tuple[CovarianceAccumulator, np.random.Generator]:
+    """Accumulate samples within model of the worker process.
+
+    Generator is returned back to keep the state of the stream in the main process.
+    """
+    model = _worker_state["model"]
+    key = tuple(groups)
+    if key not in _worker_state["parameters"]:
+        _worker_state["parameters"][key] = create_list_of_variation_parameters(
+            model, model.storage, groups
+        )
+    observation = _worker_state["observation"]
+    accumulator = CovarianceAccumulator(observation.data.shape[0], block_size)
+    accumulate_covariance(
+        _worker_state["parameters"][key],
+        generator,
+        observation,
+        N,
+        accumulator,
+        sampler,
+        seed,
+        start,
+        total,
+    )
+    accumulator.flush()
+    return accumulator, generator
+
+
+def create_generators(seed: int, nstreams: int) -> list[np.random.Generator]:
+    """Create independent generators from spawned children of the seed sequence.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the root sequence.
+    nstreams : int
+        Number of independent streams.
+
+    Returns
+    -------
+    list[np.random.Generator]
+        List of generators, one per stream.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    return [
+        np.random.Generator(np.random.MT19937(child)) for child in seed_sequence.spawn(nstreams)
+    ]
+
+
+def split_samples(N: int, nstreams: int, multiple: int = 1) -> list[int]:
+    """Split number of samples between streams as equally as possible.
 
     Parameters
     ----------
-    parameters : list[Parameter]
-        List of normalized parameters.
-    generator : np.random.Generator
-        Numpy generator of pseudo-random numbers.
-    observation : Output
-        Observation of model that depends on parameters.
     N : int
-        Number of samples for calculation covariance matrices.
-    asimov : NDArray, optional
-        Two dimensional square array, absolute covariance matrix.
+        Total number of samples.
+    nstreams : int
+        Number of streams.
+    multiple : int
+        Number of samples of each stream is a multiple of it, e.g. 2 to keep
+        antithetic pairs within a stream. The rest of the division goes to the last stream.
 
     Returns
     -------
-    NDArray
-        Absolute covariance matrix.
+    list[int]
+        Number of samples for each stream.
+    """
+    nunits = N // multiple
+    counts = [multiple * (nunits // nstreams + (i < nunits % nstreams)) for i in range(nstreams)]
+    counts[-1] += N % multiple
+    return counts
+
+
+def accumulate_covariance_streams(
+    accumulator: CovarianceAccumulator,
+    generators: list[np.random.Generator],
+    N: int,
+    parameters: list[Parameter] | None = None,
+    observation: Output | None = None,
+    executor: ProcessPoolExecutor | None = None,
+    groups: list[str] = [],
+    sampler: str = "normal",
+    seed: int = 0,
+    total: int | None = None,
+) -> list[np.random.Generator]:
+    """Add samples from streams of pseudo-random numbers to the accumulator.
+
+    Quasi-random sequence is not split into independent streams: samples
+    of each stream are the next part of the same sequence, which continues
+    from the number of samples in the accumulator.
+
+    Parameters
+    ----------
+    accumulator : CovarianceAccumulator
+        Accumulator of samples.
+    generators : list[np.random.Generator]
+        Generators of streams. Without executor streams are processed one by one.
+    N : int
+        Number of samples, they are split between streams. The result does not
+        depend on executor, it depends on the number of streams only.
+    parameters : list[Parameter], optional
+        List of normalized parameters, used without executor.
+    observation : Output, optional
+        Observation of model that depends on parameters, used without executor.
+    executor : ProcessPoolExecutor, optional
+        Pool of processes initialized with `_initialize_worker`.
+    groups : list[str]
+        List of parameters groups, used with executor.
+    sampler : str
+        Name of sampler from `_samplers`.
+    seed : int
+        Seed of scrambling of quasi-random sequence.
+    total : int, optional
+        Total number of samples of quasi-random sequence.
+
+    Returns
+    -------
+    list[np.random.Generator]
+        Generators of streams in the updated state.
+    """
+    nstreams = len(generators)
+    # Antithetic pairs are not split between streams
+    counts = split_samples(N, nstreams, 2 if sampler == "antithetic" else 1)
+    starts = (accumulator.count + np.cumsum([0] + counts[:-1])).tolist()
+    if executor is None:
+        for generator, N_stream, start in zip(generators, counts, starts):
+            stream_accumulator = CovarianceAccumulator(
+                accumulator.mean.size, accumulator.block_size
+            )
+            accumulate_covariance(
+                parameters,
+                generator,
+                observation,
+                N_stream,
+                stream_accumulator,
+                sampler,
+                seed,
+                start,
+                total,
+            )
+            stream_accumulator.flush()
+            accumulator.merge(stream_accumulator)
+        return generators
+
+    results = list(
+        executor.map(
+            _accumulate_covariance_worker,
+            generators,
+            counts,
+            [accumulator.block_size] * nstreams,
+            [groups] * nstreams,
+            [sampler] * nstreams,
+            [seed] * nstreams,
+            starts,
+            [total] * nstreams,
+        )
+    )
+    for worker_accumulator, _ in results:
+        accumulator.merge(worker_accumulator)
+    return [generator for _, generator in results]
 
-    Notes
-    -----
-    For the calculation used simplified formula
 
-    .. math:: cov_{ij} = \frac{1}{\text{norm}} \overline{x_i x_j} - \overline{x_i}\overline{x_j^A} - \overline{x_j}\overline{x_i^A} + \overline{x_i^A}\overline{x_j^A},
+def save_checkpoint(
+    filename: str,
+    accumulator: CovarianceAccumulator,
+    generators: list[np.random.Generator],
+    groups: list[str],
+    sampler: str = "normal",
+    options: dict[str, Any] = {},
+) -> None:
+    """Save state of accumulator and streams of pseudo-random numbers to HDF5 file.
 
-    where `S` is `Nx(observation size)` matrix that contains all Monte-Carlo samples.
+    File is written to temporary file first and renamed after, so an
+    interrupted write does not corrupt previous checkpoint.
 
-    Here we use a lot of memory to store every Monte-Carlo sample and we provide
-    calculations via matrix product
+    Parameters
+    ----------
+    filename : str
+        Path to checkpoint.
+    accumulator : CovarianceAccumulator
+        Accumulator of samples.
+    generators : list[np.random.Generator]
+        Generators of streams, each of them should be based on `MT19937`.
+    groups : list[str]
+        List of parameters groups that were used for Monte-Carlo method.
+    sampler : str
+        Name of sampler that was used for Monte-Carlo method.
+    options : dict[str, Any]
+        Options of model and of calculation, which change samples, see `get_checkpoint_options`.
+
+    Returns
+    -------
+    None
+    """
+    accumulator.flush()
+    filename_tmp = f"{filename}.tmp"
+    with h5py.File(filename_tmp, "w") as f:
+        f.attrs["count"] = accumulator.count
+        f.attrs["systematic_parameters_groups"] = list(groups)
+        f.attrs["sampler"] = sampler
+        f.attrs["options"] = json_dumps(options, sort_keys=True)
+        f.create_dataset("mean", data=accumulator.mean)
+        f.create_dataset("deviations_product_sum", data=accumulator.deviations_product_sum)
+        for i, generator in enumerate(generators):
+            state = generator.bit_generator.state
+            dataset = f.create_dataset(f"generators/{i:d}", data=state["state"]["key"])
+            dataset.attrs["pos"] = state["state"]["pos"]
+    os.replace(filename_tmp, filename)
+
+
+def load_checkpoint(
+    filename: str,
+    groups: list[str],
+    block_size: int = 100,
+    sampler: str = "normal",
+    options: dict[str, Any] = {},
+) -> tuple[CovarianceAccumulator, list[np.random.Generator]]:
+    """Load state of accumulator and streams of pseudo-random numbers from HDF5 file.
 
-    If Asimov observation is passed, the next formula is used
+    Parameters
+    ----------
+    filename : str
+        Path to checkpoint.
+    groups : list[str]
+        List of parameters groups that will be used for Monte-Carlo method.
+        It must be the same as in checkpoint.
+    block_size : int
+        Number of samples folded into accumulated sums at once.
+    sampler : str
+        Name of sampler that will be used for Monte-Carlo method.
+        It must be the same as in checkpoint.
+    options : dict[str, Any]
+        Options of model and of calculation, see `get_checkpoint_options`.
+        They must be the same as in checkpoint.
 
-    .. math:: cov_{ij} = \frac{1}{\text{norm}} \overline{x_i x_j} - \overline{x_i}\overline{x_j^A} - \overline{x_j}\overline{x_i^A} + \overline{x_i^A}\overline{x_j^A},
+    Returns
+    -------
+    tuple[CovarianceAccumulator, list[np.random.Generator]]
+        Accumulator and generators of streams.
     """
-    observation_size = observation.data.shape[0]
-    samples = np.zeros((N, observation_size))
-    for i in range(N):
-        variate_parameters(parameters, generator)
-        samples[i] = observation.data
-    if asimov is not None:
-        samples_mean = asimov
-        covariance_normalization_factor = N
-    else:
-        samples_mean = samples.mean(axis=0)
-        covariance_normalization_factor = N - 1
-    samples_diff = samples - samples_mean
-    covariance_matrix_absolute = samples_diff.T @ samples_diff / covariance_normalization_factor
-    return covariance_matrix_absolute
+    with h5py.File(filename, "r") as f:
+        groups_checkpoint = [
+            group.decode() if isinstance(group, bytes) else group
+            for group in f.attrs["systematic_parameters_groups"]
+        ]
+        if sorted(groups_checkpoint) != sorted(groups):
+            raise RuntimeError(
+                f"Checkpoint is created for groups {groups_checkpoint}, but {groups} are passed"
+            )
+        sampler_checkpoint = f.attrs.get("sampler", "normal")
+        if sampler_checkpoint != sampler:
+            raise RuntimeError(
+                f"Checkpoint is created with sampler {sampler_checkpoint}, but {sampler} is passed"
+            )
+        options_checkpoint = f.attrs.get("options", "{}")
+        if options_checkpoint != json_dumps(options, sort_keys=True):
+            raise RuntimeError(
+                f"Checkpoint is created with options {options_checkpoint}, but {options} are passed"
+            )
+        mean = f["mean"][:]
+        accumulator = CovarianceAccumulator(mean.shape[0], block_size)
+        accumulator.count = int(f.attrs["count"])
+        accumulator.mean = mean
+        accumulator.deviations_product_sum = f["deviations_product_sum"][:]
+
+        generators = []
+        for i in range(len(f["generators"])):
+            dataset = f[f"generators/{i:d}"]
+            bit_generator = np.random.MT19937()
+            bit_generator.state = {
+                "bit_generator": "MT19937",
+                "state": {"key": dataset[:], "pos": int(dataset.attrs["pos"])},
+            }
+            generators.append(np.random.Generator(bit_generator))
+    return accumulator, generators
+
+
+def get_checkpoint_options(opts: Namespace) -> dict[str, Any]:
+    """Collect options of the script, which change samples stored in checkpoint.
+
+    Parameters
+    ----------
+    opts : Namespace
+        Options of the script.
+
+    Returns
+    -------
+    dict[str, Any]
+        Options of model, Asimov data as mean and, for quasi-random samplers,
+        seed and number of samples.
+    """
+    options = {
+        "path_data": opts.path_data,
+        "concatenation_mode": opts.concatenation_mode,
+        "par": [list(pair) for pair in opts.par],
+        "asimov_as_mean": opts.asimov_as_mean,
+    }
+    if opts.sampler in {"sobol", "latin-hypercube"}:
+        # Quasi-random sequence of samples is scrambled with seed
+        options["seed"] = opts.seed
+    if opts.sampler == "latin-hypercube":
+        # Hypercube is generated for the total number of samples
+        options["num"] = opts.num
+    return options
 
 
 def calculate_correlation_matrix(covariance_matrix: NDArray) -> NDArray:
@@ -264,43 +915,326 @@ def calculate_correlation_matrix(covariance_matrix: NDArray) -> NDArray:
     return covariance_matrix / np.outer(diagonal, diagonal) ** 0.5
 
 
+def calculate_jacobian(
+    parameters: list[Parameter],
+    observation: Output,
+    step: float = 1.0,
+    scheme: Literal["forward", "central"] = "central",
+) -> NDArray:
+    r"""Calculate derivatives of observation over normalized parameters.
+
+    Parameters are shifted one by one and returned back to the initial values.
+    Only the part of the graph, that depends on the shifted parameter, is
+    re-evaluated.
+
+    Parameters
+    ----------
+    parameters : list[Parameter]
+        List of normalized parameters.
+    observation : Output
+        Observation of model that depends on parameters.
+    step : float
+        Shift of normalized parameter, in units of standard deviation.
+    scheme : Literal["forward", "central"]
+        Scheme of finite differences.
+
+    Returns
+    -------
+    NDArray
+        Two dimensional array of derivatives, `(observation size)x(number of parameters)`.
+
+    Notes
+    -----
+    Forward scheme needs `n + 1` evaluations of the model, central scheme needs `2n`
+    evaluations, where `n` is number of parameters
+
+    .. math:: J_{ik} = \frac{x_i(\theta_k + h) - x_i(\theta_k)}{h},
+        \quad J_{ik} = \frac{x_i(\theta_k + h) - x_i(\theta_k - h)}{2h}.
+    """
+    nominal = observation.data.copy()
+    jacobian = np.empty((nominal.shape[0], len(parameters)))
+    for i, parameter in enumerate(parameters):
+        value = parameter.value
+        parameter.value = value + step
+        jacobian[:, i] = observation.data
+        if scheme == "central":
+            parameter.value = value - step
+            jacobian[:, i] -= observation.data
+            jacobian[:, i] /= 2 * step
+        else:
+            jacobian[:, i] -= nominal
+            jacobian[:, i] /= step
+        parameter.value = value
+    return jacobian
+
+
+def covariance_matrix_from_jacobian(jacobian: NDArray) -> NDArray:
+    r"""Calculate linearized absolute covariance matrix.
+
+    Parameters
+    ----------
+    jacobian : NDArray
+        Derivatives of observation over normalized parameters.
+
+    Returns
+    -------
+    NDArray
+        Two dimensional square array, absolute covariance matrix.
+
+    Notes
+    -----
+    Normalized parameters are distributed within N(0, 1) and they are
+    not correlated, so the covariance matrix is
+
+    .. math:: V = J J^T.
+    """
+    return jacobian @ jacobian.T
+
+
+def compare_covariance_matrices(
+    covariance_matrix: NDArray, covariance_matrix_reference: NDArray
+) -> dict[str, float]:
+    """Calculate measures of difference between two covariance matrices.
+
+    Parameters
+    ----------
+    covariance_matrix : NDArray
+        Covariance matrix to be checked.
+    covariance_matrix_reference : NDArray
+        Reference covariance matrix.
+
+    Returns
+    -------
+    dict[str, float]
+        Relative difference in Frobenius norm, maximal relative difference of
+        diagonal elements, and maximal absolute difference of correlation matrices.
+    """
+    diagonal = np.diagonal(covariance_matrix)
+    diagonal_reference = np.diagonal(covariance_matrix_reference)
+    correlation_difference = calculate_correlation_matrix(
+        covariance_matrix
+    ) - calculate_correlation_matrix(covariance_matrix_reference)
+    return {
+        "frobenius_relative": float(
+            np.linalg.norm(covariance_matrix - covariance_matrix_reference)
+            / np.linalg.norm(covariance_matrix_reference)
+        ),
+        "diagonal_relative_max": float(np.nanmax(np.abs(diagonal / diagonal_reference - 1))),
+        "correlation_absolute_max": float(np.nanmax(np.abs(correlation_difference))),
+    }
+
+
+def run_monte_carlo(
+    opts: Namespace,
+    parameters: list[Parameter],
+    observation: Output,
+    groups: list[str],
+    executor: ProcessPoolExecutor | None = None,
+    checkpoint: str | None = None,
+    asimov: NDArray | None = None,
+    convergence_reference: NDArray | None = None,
+) -> NDArray:
+    """Calculate absolute covariance matrix via Monte-Carlo approach.
+
+    Depending on options, samples are produced by pool of processes,
+    checkpoints are saved, calculation is resumed from checkpoint, and
+    distance to the reference matrix is reported during calculation.
+
+    Parameters
+    ----------
+    opts : Namespace
+        Options of the script.
+    parameters : list[Parameter]
+        List of normalized parameters.
+    observation : Output
+        Observation of model that depends on parameters.
+    groups : list[str]
+        List of parameters groups, used by worker processes and checkpoints.
+    executor : ProcessPoolExecutor, optional
+        Pool of processes initialized with `_initialize_worker`.
+    checkpoint : str, optional
+        Path to checkpoint.
+    asimov : NDArray, optional
+        Asimov observation (no fluctuation of parameters).
+    convergence_reference : NDArray, optional
+        Reference covariance matrix for the convergence report.
+
+    Returns
+    -------
+    NDArray
+        Two dimensional square array, absolute covariance matrix.
+    """
+    covariance_previous = None
+    if opts.resume or opts.add_samples:
+        accumulator, generators = load_checkpoint(
+            checkpoint, groups, opts.block_size, opts.sampler, get_checkpoint_options(opts)
+        )
+        if len(generators) != opts.streams:
+            raise RuntimeError(
+                f"Checkpoint contains {len(generators)} streams, "
+                f"but {opts.streams} streams are passed"
+            )
+        logger.info(f"Load checkpoint with {accumulator.count} samples from {checkpoint}")
+        if accumulator.count > 1:
+            covariance_previous = accumulator.covariance(asimov)
+        nsamples = opts.add_samples if opts.add_samples else opts.num - accumulator.count
+    else:
+        accumulator = CovarianceAccumulator(observation.data.shape[0], opts.block_size)
+        generators = create_generators(opts.seed, opts.streams)
+        nsamples = opts.num
+
+    steps = [step for step in (opts.checkpoint_every, opts.convergence_every) if step]
+    step = min(steps) if steps else nsamples
+    while nsamples > 0:
+        nsamples_step = min(step, nsamples)
+        generators = accumulate_covariance_streams(
+            accumulator,
+            generators,
+            nsamples_step,
+            parameters,
+            observation,
+            executor,
+            groups,
+            opts.sampler,
+            opts.seed,
+            opts.num,
+        )
+        nsamples -= nsamples_step
+        if checkpoint:
+            save_checkpoint(
+                checkpoint,
+                accumulator,
+                generators,
+                groups,
+                opts.sampler,
+                get_checkpoint_options(opts),
+            )
+            logger.info(f"Save checkpoint with {accumulator.count} samples to {checkpoint}")
+        if convergence_reference is not None:
+            distance = np.linalg.norm(accumulator.covariance(asimov) - convergence_reference)
+            logger.info(
+                f"Convergence: N={accumulator.count}, relative distance to reference "
+                f"(Frobenius norm): {distance / np.linalg.norm(convergence_reference):g}"
+            )
+
+    covariance_absolute = accumulator.covariance(asimov)
+    if covariance_previous is not None:
+        difference = np.linalg.norm(covariance_absolute - covariance_previous)
+        logger.info(
+            "Relative change of covariance matrix (Frobenius norm): "
+            f"{difference / np.linalg.norm(covariance_absolute):g}"
+        )
+    return covariance_absolute
+
+
 def main(opts: Namespace) -> None:
     if opts.verbose:
         set_verbosity(opts.verbose)
 
-    model = model_dayabay(
+    model_options = dict(
         path_data=opts.path_data,
+        concatenation_mode=opts.concatenation_mode,
         parameter_values=opts.par,
     )
+    model = model_dayabay(**model_options)
 
     storage: NodeStorage = model.storage
+    if opts.sampler == "sobol" and not opts.add_samples and opts.num & (opts.num - 1):
+        logger.warning(
+            f"Balance properties of Sobol sequence require number of samples {opts.num} "
+            "to be a power of 2"
+        )
 
     observation = storage["outputs.eventscount.final.concatenated.selected"]
     asimov = observation.data.copy()
-    generator = np.random.Generator(np.random.MT19937(opts.seed))
-
-    parameters = create_list_of_variation_parameters(
-        model,
-        storage,
-        opts.systematic_parameters_groups,
-    )
-
-    if opts.alternative:
-        covariance_absolute = covariance_matrix_calculation_alternative(
-            parameters,
-            generator,
-            observation,
-            opts.num,
-            asimov if opts.asimov_as_mean else None,
-        )
-    else:
-        covariance_absolute = covariance_matrix_calculation(
-            parameters,
-            generator,
-            observation,
-            opts.num,
-            asimov if opts.asimov_as_mean else None,
+    asimov_mean = asimov if opts.asimov_as_mean else None
+
+    # Every covariance matrix is labelled and calculated with its own groups,
+    # `total` contains all the chosen groups. With `--decompose` Monte-Carlo total
+    # matrix is the sum of matrices of groups, see `get_covariances_mc`
+    labelled_groups = {"total": opts.systematic_parameters_groups}
+    if opts.decompose:
+        for group in expand_systematic_groups(model, opts.systematic_parameters_groups):
+            labelled_groups[group] = [group]
+    labelled_parameters = {
+        label: create_list_of_variation_parameters(model, storage, groups)
+        for label, groups in labelled_groups.items()
+    }
+    parameters = labelled_parameters["total"]
+
+    convergence_reference = None
+    if opts.convergence_reference:
+        convergence_reference = load_covariance_matrix(opts.convergence_reference)
+
+    def get_checkpoint(label: str) -> str | None:
+        if not opts.checkpoint or label == "total":
+            return opts.checkpoint
+        *rootparts, ext = opts.checkpoint.split(".")
+        return ".".join((*rootparts, label, ext))
+
+    def get_covariances_mc(executor: ProcessPoolExecutor | None) -> dict[str, NDArray]:
+        # Groups are sampled independently, so the total matrix is not sampled again,
+        # cross terms of parameters of different groups, which are non-linear, are neglected
+        labels = [label for label in labelled_groups if not (opts.decompose and label == "total")]
+        covariances = {
+            label: run_monte_carlo(
+                opts,
+                labelled_parameters[label],
+                observation,
+                labelled_groups[label],
+                executor,
+                get_checkpoint(label),
+                asimov_mean,
+                convergence_reference if label == "total" else None,
+            )
+            for label in labels
+        }
+        if opts.decompose:
+            covariances["total"] = sum(covariances.values())
+            if convergence_reference is not None:
+                distance = np.linalg.norm(covariances["total"] - convergence_reference)
+                logger.info(
+                    "Relative distance of sum of groups to reference (Frobenius norm): "
+                    f"{distance / np.linalg.norm(convergence_reference):g}"
+                )
+        return covariances
+
+    with (
+        ProcessPoolExecutor(
+            max_workers=opts.workers,
+            initializer=_initialize_worker,
+            initargs=(model_options,),
         )
+        if opts.workers > 1
+        else nullcontext()
+    ) as executor:
+        if opts.method == "jacobian":
+            # Derivatives are calculated once for all the parameters with shared nominal point
+            jacobian = calculate_jacobian(
+                parameters, observation, opts.jacobian_step, opts.jacobian_scheme
+            )
+            columns = {parameter: i for i, parameter in enumerate(parameters)}
+            covariances_absolute = {
+                label: covariance_matrix_from_jacobian(
+                    jacobian[:, [columns[parameter] for parameter in label_parameters]]
+                )
+                for label, label_parameters in labelled_parameters.items()
+            }
+            if opts.compare_mc:
+                covariances_mc = get_covariances_mc(executor)
+                for label, groups in labelled_groups.items():
+                    logger.info(
+                        f"Comparison of linearized and Monte-Carlo covariance matrices for "
+                        f"{label} {groups}:"
+                    )
+                    for key, value in compare_covariance_matrices(
+                        covariances_absolute[label], covariances_mc[label]
+                    ).items():
+                        logger.info(f"    {key}: {value:g}")
+        else:
+            covariances_absolute = get_covariances_mc(executor)
+
+    covariance_absolute = covariances_absolute["total"]
 
     covariance_relative = covariance_absolute / np.outer(asimov, asimov)
     correlation_matrix = calculate_correlation_matrix(covariance_absolute)
@@ -329,9 +1263,31 @@ def main(opts: Namespace) -> None:
 
     plt.show()
 
-    if args.output:
-        *filename, ext = args.output.split(".")
-        _save_data[ext](covariance_absolute, args.output)
+    low_rank = None
+    if opts.low_rank or opts.low_rank_variance:
+        low_rank = LowRankCovariance.from_matrix(
+            covariance_absolute, opts.low_rank, opts.low_rank_variance
+        )
+        logger.info(
+            f"Low-rank covariance matrix: rank {low_rank.rank} of {covariance_absolute.shape[0]}, "
+            f"retained variance {low_rank.retained_variance:.8f}"
+        )
+
+    if opts.output:
+        *filename, ext = opts.output.split(".")
+        if ext == "hdf5":
+            save_hdf5(
+                covariances_absolute,
+                labelled_groups,
+                asimov,
+                storage["outputs.edges.energy_final"].data,
+                opts.concatenation_mode,
+                opts.output,
+                low_rank,
+                opts.compression,
+            )
+        else:
+            _save_data[ext](covariance_absolute, opts.output)
 
 
 if __name__ == "__main__":
@@ -363,32 +1319,156 @@ if __name__ == "__main__":
         nargs="+",
         help="Choose systematic parameters for building covariance matrix",
     )
+    cov.add_argument(
+        "--method",
+        default="mc",
+        choices=["mc", "jacobian"],
+        help="Choose method: Monte-Carlo sampling or linearization via derivatives",
+    )
+    cov.add_argument(
+        "--jacobian-step",
+        default=1.0,
+        type=float,
+        help="Choose shift of normalized parameters for derivatives, in standard deviations",
+    )
+    cov.add_argument(
+        "--jacobian-scheme",
+        default="central",
+        choices=["forward", "central"],
+        help="Choose scheme of finite differences for derivatives",
+    )
+    cov.add_argument(
+        "--compare-mc",
+        action="store_true",
+        help="Compare linearized covariance matrix with Monte-Carlo one",
+    )
+    cov.add_argument(
+        "--decompose",
+        action="store_true",
+        help="Calculate covariance matrix for each group separately as well as for all groups",
+    )
     cov.add_argument(
         "--asimov-as-mean",
         action="store_true",
         help="Use Asimov data as mean",
     )
     cov.add_argument(
-        "--alternative",
-        action="store_true",
-        help="Use alternative method for calculation (much memory-intensive)",
+        "--sampler",
+        default="normal",
+        choices=_samplers.keys(),
+        help="Choose sampler of normalized parameters",
+    )
+    cov.add_argument(
+        "--block-size",
+        default=100,
+        type=int,
+        help="Choose number of samples folded into covariance matrix at once",
     )
     cov.add_argument(
         "--seed",
         default=0,
+        type=int,
         help="Choose seed of randomization algorithm",
     )
     cov.add_argument(
         "-N",
         "--num",
         default=1000,
+        type=int,
         help="Choose number of samples",
     )
+    cov.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Choose number of worker processes, each of them builds its own model",
+    )
+    cov.add_argument(
+        "--streams",
+        default=8,
+        type=int,
+        help="Choose number of independent streams of pseudo-random numbers, "
+        "result does not depend on --workers",
+    )
+    checkpoint = parser.add_argument_group("checkpoint", "checkpoint related options")
+    checkpoint.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Path to HDF5 file to save state of calculation",
+    )
+    checkpoint.add_argument(
+        "--checkpoint-every",
+        default=0,
+        type=int,
+        help="Choose number of samples between saving of checkpoints, 0 means only at the end",
+    )
+    checkpoint.add_argument(
+        "--convergence-every",
+        default=0,
+        type=int,
+        help="Choose number of samples between reports of distance to --convergence-reference",
+    )
+    checkpoint.add_argument(
+        "--convergence-reference",
+        type=str,
+        help="Path to reference covariance matrix for convergence report",
+    )
+    resume = checkpoint.add_mutually_exclusive_group()
+    resume.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue calculation from checkpoint until --num samples are reached",
+    )
+    resume.add_argument(
+        "--add-samples",
+        default=0,
+        type=int,
+        help="Extend calculation from checkpoint with a number of samples",
+    )
     parser.add_argument(
         "--output",
         type=str,
         help="Path to save covariance matrix",
     )
+    parser.add_argument(
+        "--low-rank",
+        default=None,
+        type=int,
+        help="Save factored covariance matrix U U^T + D with rank of U, hdf5 only",
+    )
+    parser.add_argument(
+        "--low-rank-variance",
+        default=None,
+        type=float,
+        help="Save factored covariance matrix U U^T + D, "
+        "rank of U is chosen to keep the fraction of variance, hdf5 only",
+    )
+    parser.add_argument(
+        "--compression",
+        default=None,
+        choices=["gzip", "lzf"],
+        help="Compress datasets of hdf5 output",
+    )
     args = parser.parse_args()
+    if (args.resume or args.add_samples) and not args.checkpoint:
+        parser.error("--resume and --add-samples require --checkpoint")
+    if args.convergence_every and not args.convergence_reference:
+        parser.error("--convergence-every requires --convergence-reference")
+    if args.sampler == "antithetic" and any(
+        number % 2
+        for number in (args.num, args.checkpoint_every, args.convergence_every, args.add_samples)
+    ):
+        parser.error(
+            "antithetic sampler requires even --num, --checkpoint-every, --convergence-every "
+            "and --add-samples"
+        )
+    if args.sampler == "latin-hypercube" and args.add_samples:
+        parser.error("latin-hypercube sampler is generated for --num samples, use --resume")
+    if args.decompose and args.output and not args.output.endswith(".hdf5"):
+        parser.error("--decompose supports only hdf5 output")
+    if (args.low_rank or args.low_rank_variance) and not (
+        args.output and args.output.endswith(".hdf5")
+    ):
+        parser.error("--low-rank and --low-rank-variance require hdf5 output")
 
     main(args)
@@ -2,22 +2,45 @@
 
 from __future__ import annotations
 
+import os
+from collections.abc import Mapping
+from hashlib import sha256
+from importlib.metadata import version
 from json import dump as json_dump
+from json import dumps as json_dumps
 from pickle import dump as pickle_dump
 from typing import TYPE_CHECKING
 
+import h5py
 import numpy as np
+from contourpy import contour_generator
 from dag_modelling.parameters import Parameter
+from dayabay_data_official import get_path_data
+from dayabay_model import model_dayabay
+from dgm_fit.fit_result import FitResult
+from dgm_fit.iminuit_minimizer import CppRuntimeError, IMinuitMinimizer
+from dgm_fit.minimizer_base import MinimizerBase
 from iminuit.minuit import Minuit
 from iminuit.util import MErrors
+from scipy.interpolate import (
+    BSpline,
+    PPoly,
+    RBFInterpolator,
+    RegularGridInterpolator,
+    make_interp_spline,
+)
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+from scipy.stats import chi2, norm
 from yaml import add_representer
 from yaml import safe_dump as yaml_dump
 
 if TYPE_CHECKING:
+    from argparse import Namespace
+    from collections.abc import Sequence
     from typing import Any
 
     from dag_modelling.core import NodeStorage
-    from dgm_fit.minimizer_base import MinimizerBase
+    from dag_modelling.core.output import Output
     from numpy.typing import NDArray
 
 add_representer(
@@ -58,6 +81,1538 @@ def update_dict_parameters(
             )
 
 
+class ParametersVector:
+    """Binding of parameters to a vector of values.
+
+    Names are resolved to the slots of parameters (the common output and the index
+    in it) only once, when the binding is created. After that, values are compared
+    with the current ones in one vectorized operation and only the changed parameters
+    are written, so only the nodes that depend on them are tainted. Each changed
+    parameter is still written and taints its children separately: almost every
+    parameter of the model has its own output, so writes could not be grouped.
+    The binding pays off, when a few parameters of a large vector are changed.
+
+    Attributes
+    ----------
+    names : list[str]
+        Names of parameters, the order of the vector.
+    parameters : list[Parameter]
+        Bound parameters, the order of the vector.
+
+    Notes
+    -----
+    The binding reads buffers of the parameters directly, it relies on the slots
+    of `Parameter` of `dag_modelling`. Parameters may be still modified in other
+    ways between the calls, the current values are read back on each call.
+    """
+
+    __slots__ = ("names", "parameters", "_outputs", "_indices", "_buffers")
+
+    names: list[str]
+    parameters: list[Parameter]
+    _outputs: list[Output]
+    _indices: list[int]
+    _buffers: list[NDArray]
+
+    def __init__(self, parameters: Mapping[str, Parameter] | Sequence[Parameter]) -> None:
+        if isinstance(parameters, Mapping):
+            self.names = list(parameters.keys())
+            self.parameters = list(parameters.values())
+        else:
+            self.parameters = list(parameters)
+            self.names = [parameter.name for parameter in self.parameters]
+        self._outputs = [parameter._common_output for parameter in self.parameters]
+        self._indices = [parameter._idx for parameter in self.parameters]
+        self._buffers = [output.data for output in self._outputs]
+
+    @classmethod
+    def from_groups(cls, groups: list[str], model_parameters: NodeStorage) -> ParametersVector:
+        """Create binding of groups of parameters, see `update_dict_parameters`.
+
+        Parameters
+        ----------
+        groups : list[str]
+            List of groups of parameters or parameters.
+        model_parameters : NodeStorage
+            Storage of model parameters.
+
+        Returns
+        -------
+        ParametersVector
+            Binding of parameters.
+        """
+        dict_parameters: dict[str, Parameter] = {}
+        update_dict_parameters(dict_parameters, groups, model_parameters)
+        return cls(dict_parameters)
+
+    def __len__(self) -> int:
+        return len(self.parameters)
+
+    @property
+    def values(self) -> NDArray:
+        """Current values of parameters."""
+        return np.fromiter(
+            (buffer[idx] for buffer, idx in zip(self._buffers, self._indices)),
+            dtype="d",
+            count=len(self._indices),
+        )
+
+    def set(self, values: NDArray) -> int:
+        """Set values of parameters.
+
+        Parameters
+        ----------
+        values : NDArray
+            Values of parameters, the same order as `names`.
+
+        Returns
+        -------
+        int
+            Number of changed parameters.
+        """
+        values = np.asarray(values, dtype="d")
+        if values.shape != (len(self._indices),):
+            raise RuntimeError(
+                f"Expect vector of {len(self._indices)} values, got array of shape {values.shape}"
+            )
+        changed = np.flatnonzero(self.values != values)
+        outputs, indices = self._outputs, self._indices
+        for position, value in zip(changed.tolist(), values[changed].tolist()):
+            outputs[position].seti(indices[position], value)
+        return changed.size
+
+
+class StatisticGradient:
+    """Gradient of statistic with finite differences, which change one parameter at a time.
+
+    The point is applied with `ParametersVector`, so parameters, which are not
+    changed since the previous call, are not tainted. Then each parameter is
+    shifted and restored alone, so only the part of the graph, which depends on
+    this parameter, is re-evaluated on each step. The gradient of the last point
+    is cached, `reset` clears the cache, when the statistic is changed without change
+    of the parameters, e.g. by new data or covariance matrix. The object is callable with the same arguments as the function
+    of `iminuit.Minuit`, so it could be passed as `grad`.
+
+    Parameters
+    ----------
+    statistic : Output
+        Output of statistic.
+    parameters : Mapping[str, Parameter] | Sequence[Parameter]
+        Parameters, the order of arguments.
+    scale : float
+        Step is `scale` times sigma of Gaussian parameters, absolute value
+        of the initial value of free parameters or 1 for zero initial value.
+    method : str
+        Finite differences: `central` with two evaluations per parameter
+        or `forward` with one evaluation per parameter.
+
+    Attributes
+    ----------
+    steps : NDArray
+        Steps of parameters.
+    nevaluations : int
+        Number of evaluations of the statistic.
+    """
+
+    __slots__ = ("statistic", "vector", "steps", "method", "nevaluations", "_point", "_gradient")
+
+    statistic: Output
+    vector: ParametersVector
+    steps: NDArray
+    method: str
+    nevaluations: int
+    _point: NDArray | None
+    _gradient: NDArray | None
+
+    def __init__(
+        self,
+        statistic: Output,
+        parameters: Mapping[str, Parameter] | Sequence[Parameter],
+        *,
+        scale: float = 1e-3,
+        method: str = "central",
+    ) -> None:
+        if method not in {"central", "forward"}:
+            raise RuntimeError(f"Method `{method}` is not supported, use `central` or `forward`")
+        self.statistic = statistic
+        self.vector = ParametersVector(parameters)
+        self.method = method
+        values = np.abs(self.vector.values)
+        sigmas = np.array(
+            [getattr(parameter, "sigma", np.nan) for parameter in self.vector.parameters],
+            dtype="d",
+        )
+        self.steps = scale * np.where(
+            np.isfinite(sigmas), sigmas, np.where(values > 0, values, 1.0)
+        )
+        self.nevaluations = 0
+        self._point = None
+        self._gradient = None
+
+    def __call__(self, *values: float | NDArray) -> NDArray:
+        point = np.ravel(np.asarray(values, dtype="d"))
+        if self._point is not None and np.array_equal(point, self._point):
+            return self._gradient.copy()
+
+        self.vector.set(point)
+        statistic = self.statistic
+        gradient = np.empty_like(point)
+        if self.method == "forward":
+            center = statistic.data[0]
+            self.nevaluations += 1
+        for i, (output, idx, value, step) in enumerate(
+            zip(self.vector._outputs, self.vector._indices, point.tolist(), self.steps.tolist())
+        ):
+            output.seti(idx, value + step)
+            upper = statistic.data[0]
+            if self.method == "central":
+                output.seti(idx, value - step)
+                gradient[i] = (upper - statistic.data[0]) / (2.0 * step)
+            else:
+                gradient[i] = (upper - center) / step
+            output.seti(idx, value)
+        self.nevaluations += point.size * (2 if self.method == "central" else 1)
+
+        self._point, self._gradient = point, gradient
+        return gradient.copy()
+
+    def reset(self) -> None:
+        """Clear the cached gradient of the last point."""
+        self._point = None
+        self._gradient = None
+
+
+class IMinuitGradientMinimizer(IMinuitMinimizer):
+    """Minimizer of `dgm_fit`, Migrad of which uses gradient of `StatisticGradient`.
+
+    Without gradient Migrad differentiates statistic numerically and each call
+    re-assigns all the parameters, so the whole graph is re-evaluated. Here
+    the function applies parameters with `ParametersVector` and the gradient
+    re-evaluates only the part of the graph, which depends on each parameter.
+
+    Parameters
+    ----------
+    statistic : Output
+        Output of statistic.
+    parameters : dict[str, Parameter]
+        Parameters for minimization.
+    gradient_scale : float
+        Scale of steps, see `StatisticGradient`.
+    gradient_method : str
+        Finite differences, see `StatisticGradient`.
+    **kwargs
+        Arguments of `IMinuitMinimizer`.
+    """
+
+    __slots__ = ("_gradient",)
+
+    _gradient: StatisticGradient
+
+    def __init__(
+        self,
+        statistic: Output,
+        parameters: dict[str, Parameter],
+        *,
+        gradient_scale: float = 1e-3,
+        gradient_method: str = "central",
+        **kwargs,
+    ) -> None:
+        super().__init__(statistic, parameters, **kwargs)
+        self._gradient = StatisticGradient(
+            statistic, parameters, scale=gradient_scale, method=gradient_method
+        )
+
+    @property
+    def gradient(self) -> StatisticGradient:
+        return self._gradient
+
+    def init_minimizer(self) -> Minuit:
+        """Initialize the Minuit minimizer with the function and gradient of the statistic.
+
+        Data or covariance matrix could be changed since the previous fit,
+        so the cached gradient is cleared.
+        """
+        minimizer = super().init_minimizer()
+        self._gradient.reset()
+        vector, statistic = self._gradient.vector, self._gradient.statistic
+
+        def fcn(*params):
+            vector.set(np.asarray(params, dtype="d"))
+            return statistic.data[0]
+
+        self._minimizer = Minuit(
+            fcn, *minimizer.values, grad=self._gradient, name=minimizer.parameters
+        )
+        self._minimizer.throw_nan = True
+        self._minimizer.errordef = minimizer.errordef
+        self._minimizer.limits = minimizer.limits
+        return self._minimizer
+
+
+class StatisticResiduals:
+    """Residuals of least-squares statistic, sum of squares of which is the statistic.
+
+    Statistic based on `Chi2` node is split into residuals of each bin
+    `(data - theory) / errors` or `L^{-1} (data - theory)` for Cholesky
+    decomposition `L` of covariance matrix. For `full.pull.*` statistics values
+    of all the normalized parameters are appended as residuals of pull terms.
+
+    Parameters
+    ----------
+    storage : NodeStorage
+        Storage of model.
+    statistic : str
+        Name of statistic, e.g. `full.pull.chi2cnp`. Statistics `*.chi2poisson`
+        and `*.chi2p_unbiased` are not sums of squares and are not supported.
+
+    Attributes
+    ----------
+    size : int
+        Number of residuals.
+    """
+
+    __slots__ = ("size", "_triplets", "_pulls", "_nbins")
+
+    size: int
+    _triplets: list[tuple[Output, Output, Output]]
+    _pulls: list[Parameter]
+    _nbins: int
+
+    def __init__(self, storage: NodeStorage, statistic: str) -> None:
+        *kind, name = statistic.split(".")
+        if name in {"chi2poisson", "chi2p_unbiased"} or not kind:
+            raise RuntimeError(f"Statistic {statistic} is not a sum of squares of residuals")
+        kind = ".".join(kind)
+        match kind:
+            case "stat" | "full.pull":
+                node = storage[f"nodes.statistic.stat.{name}"]
+            case "full.covmat":
+                node = storage[f"nodes.statistic.full.covmat.{name}"]
+            case _:
+                raise RuntimeError(f"Statistic {statistic} is not supported")
+        outputs = [inp.parent_output for inp in node.inputs]
+        self._triplets = list(zip(outputs[0::3], outputs[1::3], outputs[2::3]))
+        self._pulls = []
+        if kind == "full.pull":
+            self._pulls = list(storage["parameters.normalized"].walkvalues())
+        self._nbins = sum(data.dd.size for data, _, _ in self._triplets)
+        self.size = self._nbins + len(self._pulls)
+
+    def __call__(self) -> NDArray:
+        """Evaluate residuals for the current values of parameters."""
+        residuals = np.empty(self.size, dtype="d")
+        start = 0
+        for data, theory, errors in self._triplets:
+            difference = data.data - theory.data
+            stop = start + difference.size
+            if errors.dd.dim == 2:
+                residuals[start:stop] = solve_triangular(errors.data, difference, lower=True)
+            else:
+                residuals[start:stop] = difference / errors.data
+            start = stop
+        residuals[self._nbins :] = [parameter.value for parameter in self._pulls]
+        return residuals
+
+    def jacobian(self, vector: ParametersVector, steps: NDArray, residuals: NDArray) -> NDArray:
+        """Calculate Jacobian of residuals with forward differences.
+
+        Each parameter is shifted alone and restored, as in `StatisticGradient`.
+
+        Parameters
+        ----------
+        vector : ParametersVector
+            Parameters, the columns of Jacobian.
+        steps : NDArray
+            Steps of parameters.
+        residuals : NDArray
+            Residuals at the current values of parameters.
+
+        Returns
+        -------
+        NDArray
+            Jacobian of shape `(size, len(vector))`.
+        """
+        jacobian = np.empty((residuals.size, len(vector)), dtype="d")
+        for i, (output, idx, value, step) in enumerate(
+            zip(vector._outputs, vector._indices, vector.values.tolist(), steps.tolist())
+        ):
+            output.seti(idx, value + step)
+            jacobian[:, i] = (self() - residuals) / step
+            output.seti(idx, value)
+        return jacobian
+
+
+class GaussNewtonMinimizer(MinimizerBase):
+    """Levenberg-Marquardt minimizer of least-squares statistic.
+
+    Jacobian of residuals from `StatisticResiduals` is calculated with forward
+    differences, each parameter is shifted alone, as in `StatisticGradient`.
+    Step is the solution of `(J^T J + lambda diag(J^T J)) step = -J^T r`, damping
+    `lambda` is decreased after successful steps and increased otherwise, so the
+    method turns into Gauss-Newton close to the minimum. Covariance matrix is
+    `(J^T J)^{-1}` in the minimum. Result has the same keys as result of
+    `IMinuitMinimizer`.
+
+    Parameters
+    ----------
+    statistic : Output
+        Output of statistic.
+    parameters : dict[str, Parameter]
+        Parameters for minimization.
+    residuals : StatisticResiduals
+        Residuals of the statistic.
+    max_iterations : int
+        Maximal number of iterations.
+    tolerance : float
+        Fit converges, when decrease of statistic is below tolerance.
+    scale : float
+        Scale of steps of finite differences, see `StatisticGradient`.
+    **kwargs
+        Arguments of `MinimizerBase`.
+    """
+
+    __slots__ = ("_residuals", "_max_iterations", "_tolerance", "_gradient")
+
+    _residuals: StatisticResiduals
+    _max_iterations: int
+    _tolerance: float
+    _gradient: StatisticGradient
+
+    def __init__(
+        self,
+        statistic: Output,
+        parameters: dict[str, Parameter],
+        name: str = "gauss-newton",
+        label: str = "gauss-newton",
+        *,
+        residuals: StatisticResiduals,
+        max_iterations: int = 100,
+        tolerance: float = 1e-6,
+        scale: float = 1e-3,
+        **kwargs,
+    ) -> None:
+        super().__init__(statistic, parameters, name, label, **kwargs)
+        self._residuals = residuals
+        self._max_iterations = max_iterations
+        self._tolerance = tolerance
+        self._gradient = StatisticGradient(statistic, parameters, scale=scale)
+
+    def _child_fit(self, **_) -> dict:
+        vector = self._gradient.vector
+        lower, upper = np.array(
+            [self._limits.get(name, (None, None)) for name in self.parameters_names],
+            dtype="d",
+        ).T
+        lower, upper = np.nan_to_num(lower, nan=-np.inf), np.nan_to_num(upper, nan=np.inf)
+
+        with FitResult() as fr:
+            point = vector.values
+            residuals = self._residuals()
+            fun = residuals @ residuals
+            nfev, damping, success, message = 1, 1e-3, False, "maximal number of iterations"
+            for _ in range(self._max_iterations):
+                jacobian = self._residuals.jacobian(vector, self._gradient.steps, residuals)
+                nfev += point.size
+                hessian, gradient = jacobian.T @ jacobian, jacobian.T @ residuals
+                diagonal = np.diag(hessian).copy()
+                diagonal[diagonal == 0.0] = 1.0
+                while damping < 1e10:
+                    step = np.linalg.solve(hessian + damping * np.diag(diagonal), -gradient)
+                    point_new = np.clip(point + step, lower, upper)
+                    vector.set(point_new)
+                    residuals_new = self._residuals()
+                    nfev += 1
+                    fun_new = residuals_new @ residuals_new
+                    if fun_new <= fun:
+                        break
+                    damping *= 10.0
+                else:
+                    vector.set(point)
+                    message = "step does not decrease statistic"
+                    break
+                damping = max(damping / 10.0, 1e-12)
+                decrease = fun - fun_new
+                point, residuals, fun = point_new, residuals_new, fun_new
+                if decrease < self._tolerance:
+                    success, message = True, "decrease of statistic is below tolerance"
+                    break
+
+            vector.set(point)
+            jacobian = self._residuals.jacobian(vector, self._gradient.steps, residuals)
+            nfev += point.size
+            try:
+                covariance = np.linalg.inv(jacobian.T @ jacobian)
+            except np.linalg.LinAlgError:
+                covariance, success, message = None, False, "singular matrix J^T J"
+            vector.set(point)
+            fun = float(self.statistic.data[0])
+
+        fr.set(
+            x=point,
+            errors=np.sqrt(np.diag(covariance)) if covariance is not None else None,
+            fun=fun,
+            success=success,
+            summary=message,
+            minimizer=self._label,
+            nfev=nfev,
+            errorsdef=1.0,
+            covariance=covariance,
+            nbins=self.nbins,
+            npars_free=self.npars_free,
+            npars_constrained=self.npars_constrained,
+            ndof=self.nbins - self.npars_free,
+        )
+        self._result = fr.result
+        self.patchresult()
+
+        return self.result
+
+
+def get_profile_crossing(
+    minimizer: MinimizerBase,
+    parameter: Parameter,
+    fun_min: float,
+    error: float,
+    side: int,
+    *,
+    errordef: float = 1.0,
+    tolerance: float = 1e-3,
+    max_iterations: int = 20,
+) -> dict[str, Any]:
+    """Find one side of profile error of parameter, as Minos does for both sides.
+
+    Parameter is fixed at shifts from its best fit value, the other parameters are
+    minimized, each fit starts from the previous conditional minimum. Square root
+    of the increase of statistic is almost linear in the shift, its crossing of
+    `sqrt(errordef)` is found with secant method, the first step is the parabolic
+    error. Parameters are restored.
+
+    Parameters
+    ----------
+    minimizer : MinimizerBase
+        Minimizer of the other parameters, they start from the best fit.
+    parameter : Parameter
+        Profiled parameter, it is at the best fit value.
+    fun_min : float
+        Minimum of statistic.
+    error : float
+        Parabolic error of parameter.
+    side : int
+        Side of error: -1 for lower, 1 for upper.
+    errordef : float
+        Increase of statistic, which defines error.
+    tolerance : float
+        Relative tolerance of square root of increase of statistic.
+    max_iterations : int
+        Maximal number of fits.
+
+    Returns
+    -------
+    dict[str, Any]
+        Signed error `error`, `is_valid`, `nfev` and `message`, as status of
+        `IMinuitMinimizer.profile_errors`.
+    """
+    vector, fixed = ParametersVector(minimizer.parameters), ParametersVector([parameter])
+    start, best_fit = vector.values, fixed.values
+    target = errordef**0.5
+    points, shift, nfev = [(0.0, 0.0)], side * abs(error), 0
+    status = {"error": None, "is_valid": False, "nfev": 0, "message": "maximal number of fits"}
+    for _ in range(max_iterations):
+        fixed.set(best_fit + shift)
+        fit = minimizer.fit()
+        nfev += fit["nfev"]
+        if not fit["success"]:
+            status["message"] = f"fit failed at shift {shift}"
+            break
+        vector.set(fit["x"])
+        root = max(fit["fun"] - fun_min, 0.0) ** 0.5
+        points.append((shift, root))
+        if abs(root - target) < tolerance * target:
+            status.update(error=shift, is_valid=True, message="")
+            break
+        (shift_prev, root_prev), (shift, root) = points[-2:]
+        if root == root_prev:
+            status["message"] = f"statistic does not change at shift {shift}"
+            break
+        shift += (target - root) * (shift - shift_prev) / (root - root_prev)
+    status["nfev"] = nfev
+    fixed.set(best_fit)
+    vector.set(start)
+    return status
+
+
+def get_linear_parameters(
+    residuals: StatisticResiduals,
+    parameters: Mapping[str, Parameter],
+    *,
+    scale: float = 1e-3,
+) -> dict[str, float]:
+    """Measure non-linearity of residuals for constrained parameters.
+
+    For each parameter residuals are shifted by one sigma up and down and the
+    shifts are compared with the prediction of the derivative, calculated with
+    the step of `scale` sigma. Non-linearity is the largest relative deviation
+    `|r(p ± sigma) - r(p) ∓ J sigma| / |J sigma|`. Parameters, which do not
+    change residuals, have zero non-linearity. Parameters are restored.
+
+    Parameters
+    ----------
+    residuals : StatisticResiduals
+        Residuals of the statistic.
+    parameters : Mapping[str, Parameter]
+        Constrained parameters, each parameter has `sigma`.
+    scale : float
+        Scale of steps of derivative.
+
+    Returns
+    -------
+    dict[str, float]
+        Non-linearity of each parameter.
+    """
+    vector = ParametersVector(parameters)
+    sigmas = np.array([parameter.sigma for parameter in vector.parameters], dtype="d")
+    center = residuals()
+    nonlinearity = {}
+    for name, output, idx, value, sigma in zip(
+        vector.names, vector._outputs, vector._indices, vector.values.tolist(), sigmas.tolist()
+    ):
+        output.seti(idx, value + scale * sigma)
+        linear = (residuals() - center) / scale
+        norm = np.linalg.norm(linear)
+        deviations = []
+        for sign in (1.0, -1.0):
+            output.seti(idx, value + sign * sigma)
+            deviations.append(np.linalg.norm(residuals() - center - sign * linear))
+        output.seti(idx, value)
+        nonlinearity[name] = max(deviations) / norm if norm > 0.0 else 0.0
+    return nonlinearity
+
+
+class IMinuitProfiledMinimizer(IMinuitMinimizer):
+    """Minimizer of `dgm_fit`, Migrad of which minimizes statistic over part of parameters only.
+
+    Residuals from `StatisticResiduals` are approximately linear functions of the
+    profiled (nuisance) parameters `p`: `r(p) = r(c) + J (p - c)`, where `c` is the
+    linearization point. Together with the pull terms, which are residuals too, the
+    minimum over `p` is the solution of the penalized linear least-squares problem
+    `p = c - J^+ r(c)`. It is applied in each call of the function of Migrad, so
+    Migrad varies only the other parameters and each call costs two evaluations
+    of the statistic. The statistic is evaluated exactly in the profiled point.
+
+    Jacobian `J` is fixed during Migrad, it is re-calculated in the best fit point
+    and Migrad is repeated, until the parameters of Migrad shift less than
+    `shift_tolerance` of their errors. Covariance matrix of the profiled parameters
+    is propagated from the Hesse covariance matrix with the linear model, result
+    has the same keys and order of parameters as result of `IMinuitMinimizer`.
+    Minos in `profile_errors` is available for the parameters of Migrad only.
+
+    Parameters
+    ----------
+    statistic : Output
+        Output of statistic.
+    parameters : dict[str, Parameter]
+        All the parameters for minimization.
+    residuals : StatisticResiduals
+        Residuals of the statistic, `full.pull.*` statistic includes pull terms.
+    profiled : list[str]
+        Names of parameters, which are minimized analytically.
+    scale : float
+        Scale of steps of Jacobian, see `StatisticGradient`.
+    max_passes : int
+        Maximal number of Migrad runs with updated Jacobian.
+    shift_tolerance : float
+        Passes converge, when the parameters of Migrad shift less than `shift_tolerance`
+        of their errors.
+    **kwargs
+        Arguments of `IMinuitMinimizer`.
+    """
+
+    __slots__ = (
+        "_residuals",
+        "_profiled",
+        "_vector",
+        "_outer",
+        "_inner",
+        "_steps_outer",
+        "_steps_inner",
+        "_max_passes",
+        "_shift_tolerance",
+        "_center",
+        "_projector",
+        "_npasses",
+    )
+
+    _residuals: StatisticResiduals
+    _profiled: list[str]
+    _vector: ParametersVector
+    _outer: ParametersVector
+    _inner: ParametersVector
+    _steps_outer: NDArray
+    _steps_inner: NDArray
+    _max_passes: int
+    _shift_tolerance: float
+    _center: NDArray | None
+    _projector: NDArray | None
+    _npasses: int
+
+    def __init__(
+        self,
+        statistic: Output,
+        parameters: dict[str, Parameter],
+        name: str = "iminuit-profiled",
+        label: str = "iminuit-profiled",
+        *,
+        residuals: StatisticResiduals,
+        profiled: list[str],
+        scale: float = 1e-3,
+        max_passes: int = 5,
+        shift_tolerance: float = 0.1,
+        **kwargs,
+    ) -> None:
+        super().__init__(statistic, parameters, name, label, **kwargs)
+        unknown = set(profiled) - set(parameters)
+        if unknown:
+            raise RuntimeError(f"Profiled parameters {sorted(unknown)} are not minimized")
+        self._residuals = residuals
+        self._profiled = [name for name in parameters if name in set(profiled)]
+        self._vector = ParametersVector(parameters)
+        self._outer = ParametersVector(
+            {name: parameter for name, parameter in parameters.items() if name not in profiled}
+        )
+        self._inner = ParametersVector({name: parameters[name] for name in self._profiled})
+        steps = dict(
+            zip(parameters, StatisticGradient(statistic, parameters, scale=scale).steps.tolist())
+        )
+        self._steps_outer = np.array([steps[name] for name in self._outer.names], dtype="d")
+        self._steps_inner = np.array([steps[name] for name in self._inner.names], dtype="d")
+        self._max_passes = max_passes
+        self._shift_tolerance = shift_tolerance
+        self._center = None
+        self._projector = None
+        self._npasses = 0
+
+    @property
+    def profiled(self) -> list[str]:
+        return self._profiled
+
+    def _linearize(self) -> int:
+        """Calculate Jacobian of profiled parameters in the current point.
+
+        Returns
+        -------
+        int
+            Number of evaluations of the statistic.
+        """
+        self._center = self._inner.values
+        jacobian = self._residuals.jacobian(self._inner, self._steps_inner, self._residuals())
+        self._projector = -np.linalg.pinv(jacobian)
+        return len(self._inner) + 1
+
+    def _profile(self) -> float:
+        """Set the profiled parameters to the minimum of the linear model."""
+        self._inner.set(self._center)
+        self._inner.set(self._center + self._projector @ self._residuals())
+        return self.statistic.data[0]
+
+    def init_minimizer(self) -> Minuit:
+        """Initialize the Minuit minimizer of the parameters, which are not profiled."""
+        if self._projector is None:
+            self._linearize()
+        outer = self._outer
+
+        def fcn(*params):
+            outer.set(np.asarray(params, dtype="d"))
+            return self._profile()
+
+        self._minimizer = minimizer = Minuit(fcn, *outer.values, name=outer.names)
+        minimizer.throw_nan = True
+        minimizer.errordef = self._errordef
+        minimizer.limits = [self._limits.get(name, (None, None)) for name in outer.names]
+        return minimizer
+
+    def _child_fit(self, **kwargs) -> dict:
+        ncall = kwargs.pop("ncall", None)
+        iterate = kwargs.pop("iterate", 5)
+        outer = self._outer
+
+        with FitResult() as fr:
+            nfev, success, message, minimizer = 0, False, "", None
+            for npasses in range(1, self._max_passes + 1):
+                nfev += self._linearize()
+                start = outer.values
+                minimizer = self.init_minimizer()
+                try:
+                    minimizer.migrad(ncall=ncall, iterate=iterate)
+                except CppRuntimeError as exc:
+                    message = f"{exc.what()}"  # pyright: ignore
+                    break
+                except RuntimeError as exc:
+                    message = repr(exc)
+                    break
+                finally:
+                    nfev += 2 * minimizer.nfcn
+                fmin = minimizer.fmin
+                message = {key[1:]: getattr(fmin, key) for key in fmin.__slots__}
+                success = minimizer.valid
+                outer.set(np.array(minimizer.values))
+                self._profile()
+                shift = np.abs(outer.values - start) / np.array(minimizer.errors)
+                if success and np.all(shift < self._shift_tolerance):
+                    break
+            else:
+                success = False
+            self._npasses = npasses
+
+            # Covariance matrix of Migrad is approximate, the function changes between
+            # the passes, so it is calculated with Hesse in the minimum
+            covariance = None
+            if success:
+                nfcn = minimizer.nfcn
+                minimizer.hesse()
+                nfev += 2 * (minimizer.nfcn - nfcn)
+                outer.set(np.array(minimizer.values))
+                self._profile()
+            if minimizer.covariance is not None:
+                covariance, jacobian_outer = self._get_covariance(np.array(minimizer.covariance))
+                nfev += jacobian_outer
+            fun = float(self.statistic.data[0])
+
+        fr.set(
+            x=self._vector.values,
+            errors=np.sqrt(np.diag(covariance)) if covariance is not None else None,
+            fun=fun,
+            success=success,
+            summary=message,
+            minimizer=self._label,
+            nfev=nfev,
+            errorsdef=self._errordef,
+            covariance=covariance,
+            nbins=self.nbins,
+            npars_free=self.npars_free,
+            npars_constrained=self.npars_constrained,
+            ndof=self.nbins - self.npars_free,
+            npasses=self._npasses,
+            profiled=self._profiled,
+        )
+        self._result = fr.result
+        self.patchresult()
+
+        return self.result
+
+    def _get_covariance(self, covariance_outer: NDArray) -> tuple[NDArray, int]:
+        """Propagate covariance matrix of Migrad to all the parameters with the linear model.
+
+        Profiled parameters depend on the others as `p = c - J^+ r(c, q)`, so
+        `dp/dq = -J^+ J_q`. Covariance matrix of `p` is the sum of the conditional
+        part `(J^T J)^{-1}` and the propagated part `dp/dq C_q (dp/dq)^T`.
+
+        Returns
+        -------
+        tuple[NDArray, int]
+            Covariance matrix in order of parameters and number of evaluations of the statistic.
+        """
+        residuals = self._residuals()
+        jacobian_outer = self._residuals.jacobian(self._outer, self._steps_outer, residuals)
+        derivative = self._projector @ jacobian_outer
+        covariance_inner = (
+            self._projector @ self._projector.T + derivative @ covariance_outer @ derivative.T
+        )
+        order = [*self._outer.names, *self._inner.names]
+        positions = np.array([order.index(name) for name in self.parameters_names])
+        covariance = np.block(
+            [
+                [covariance_outer, covariance_outer @ derivative.T],
+                [derivative @ covariance_outer, covariance_inner],
+            ]
+        )
+        return covariance[np.ix_(positions, positions)], len(self._outer) + 1
+
+    def profile_errors(self, names: list[str] | None = None, *args, **kwargs) -> dict:
+        """Calculate errors with Minos for the parameters of Migrad, see `IMinuitMinimizer`.
+
+        Profiled parameters are skipped, their errors are in `errorsdict` of the fit.
+        """
+        names = names or self._outer.names
+        skipped = [name for name in names if name in self._profiled]
+        if skipped:
+            self.logger.warning(f"Minos is not available for profiled parameters {skipped}")
+        names = [name for name in names if name not in self._profiled]
+        if not names:
+            return {"names": [], "errors": [], "errorsdict": {}, "errors_profile_status": {}}
+        return super().profile_errors(names, *args, **kwargs)
+
+
+def load_covariance_matrix_block(
+    filename: str,
+    rows: slice = slice(None),
+    columns: slice = slice(None),
+    dataset: str = "covariance_matrix",
+) -> NDArray:
+    """Load block of matrix saved by `covariances/covmatrix_mc.py` without reading the whole file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to file with matrix, supports: `hdf5`, `npy`.
+    rows : slice
+        Rows of block.
+    columns : slice
+        Columns of block.
+    dataset : str
+        Name of dataset for `hdf5`: `covariance_matrix`, `covariance_matrix_relative`,
+        `correlation_matrix`, `covariance_matrices/<group>`.
+
+    Returns
+    -------
+    NDArray
+        Block of matrix.
+
+    Notes
+    -----
+    For `hdf5` only chunks that intersect the block are read (and decompressed).
+    `npy` file is memory-mapped, only pages of the block are read.
+    """
+    *rootparts, ext = filename.split(".")
+    match ext:
+        case "hdf5":
+            with h5py.File(filename, "r") as f:
+                return f[dataset][rows, columns]
+        case "npy":
+            return np.array(np.load(filename, mmap_mode="r")[rows, columns])
+        case _:
+            raise RuntimeError(f"Couldn't load block of matrix from `.{ext}`-type")
+
+
+class LowRankCovariance:
+    r"""Covariance matrix in factored form :math:`V = U U^T + D`.
+
+    :math:`U` is :math:`n \times k` factor and :math:`D` is diagonal. Linear systems
+    are solved via Woodbury identity
+
+    .. math:: V^{-1} = D^{-1} - D^{-1} U (I + U^T D^{-1} U)^{-1} U^T D^{-1},
+
+    which costs :math:`O(n k^2)` instead of :math:`O(n^3)` for dense matrix.
+
+    Attributes
+    ----------
+    factor : NDArray
+        Factor :math:`U`, `n x k`.
+    diagonal : NDArray
+        Diagonal :math:`D`, `n`.
+    retained_variance : float
+        Fraction of trace of the initial matrix, retained by the factor.
+    """
+
+    __slots__ = ("factor", "diagonal", "retained_variance")
+
+    factor: NDArray
+    diagonal: NDArray
+    retained_variance: float
+
+    def __init__(self, factor: NDArray, diagonal: NDArray, retained_variance: float = 1.0) -> None:
+        self.factor = factor
+        self.diagonal = diagonal
+        self.retained_variance = retained_variance
+
+    @classmethod
+    def from_matrix(
+        cls,
+        covariance_matrix: NDArray,
+        rank: int | None = None,
+        variance_fraction: float | None = None,
+    ) -> LowRankCovariance:
+        """Factorize dense covariance matrix with truncated eigendecomposition.
+
+        Diagonal keeps the variances, which are not described by the factor,
+        so diagonal of the factored matrix is the same as of the initial one.
+
+        Parameters
+        ----------
+        covariance_matrix : NDArray
+            Dense symmetric covariance matrix.
+        rank : int, optional
+            Number of eigenvectors to keep.
+        variance_fraction : float, optional
+            Minimal fraction of trace to keep, if `rank` is not passed.
+            If both are not passed, all the eigenvalues above numerical precision are kept.
+
+        Returns
+        -------
+        LowRankCovariance
+            Factored covariance matrix.
+        """
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance_matrix)
+        eigenvalues = eigenvalues[::-1].clip(min=0.0)
+        eigenvectors = eigenvectors[:, ::-1]
+        cumulative = np.cumsum(eigenvalues) / eigenvalues.sum()
+        if rank is None and variance_fraction is not None:
+            rank = int(np.searchsorted(cumulative, variance_fraction)) + 1
+        elif rank is None:
+            threshold = eigenvalues[0] * eigenvalues.size * np.finfo(eigenvalues.dtype).eps
+            rank = np.count_nonzero(eigenvalues > threshold)
+        rank = min(rank, eigenvalues.size)
+        factor = eigenvectors[:, :rank] * np.sqrt(eigenvalues[:rank])
+        diagonal = (np.diagonal(covariance_matrix) - np.square(factor).sum(axis=1)).clip(min=0.0)
+        return cls(factor, diagonal, float(cumulative[rank - 1]))
+
+    @property
+    def rank(self) -> int:
+        return self.factor.shape[1]
+
+    def to_matrix(self) -> NDArray:
+        """Return dense covariance matrix."""
+        return self.factor @ self.factor.T + np.diag(self.diagonal)
+
+    def _factorize(self, diagonal: NDArray | None) -> tuple[NDArray, NDArray, tuple]:
+        """Return inverse of diagonal, scaled factor and Cholesky factor of capacitance."""
+        diagonal_total = self.diagonal if diagonal is None else self.diagonal + diagonal
+        if not np.all(diagonal_total > 0):
+            raise RuntimeError("Diagonal part should be positive for Woodbury solve")
+        diagonal_inverse = 1.0 / diagonal_total
+        factor_scaled = self.factor * diagonal_inverse[:, None]
+        capacitance = self.factor.T @ factor_scaled
+        capacitance[np.diag_indices_from(capacitance)] += 1.0
+        return diagonal_inverse, factor_scaled, cho_factor(capacitance, lower=True)
+
+    def solve(self, vector: NDArray, diagonal: NDArray | None = None) -> NDArray:
+        r"""Solve :math:`(V + \mathrm{diag}(d)) x = b`.
+
+        Parameters
+        ----------
+        vector : NDArray
+            Right-hand side :math:`b`.
+        diagonal : NDArray, optional
+            Extra diagonal :math:`d`, e.g. statistical variances.
+
+        Returns
+        -------
+        NDArray
+            Solution :math:`x`.
+        """
+        diagonal_inverse, factor_scaled, capacitance = self._factorize(diagonal)
+        return diagonal_inverse * vector - factor_scaled @ cho_solve(
+            capacitance, factor_scaled.T @ vector
+        )
+
+    def chi2(self, residual: NDArray, diagonal: NDArray | None = None) -> float:
+        r"""Calculate :math:`r^T (V + \mathrm{diag}(d))^{-1} r`.
+
+        Parameters
+        ----------
+        residual : NDArray
+            Difference between data and model :math:`r`.
+        diagonal : NDArray, optional
+            Extra diagonal :math:`d`, e.g. statistical variances.
+
+        Returns
+        -------
+        float
+            Value of chi-squared.
+        """
+        return float(residual @ self.solve(residual, diagonal))
+
+    def log_determinant(self, diagonal: NDArray | None = None) -> float:
+        r"""Calculate logarithm of determinant of :math:`V + \mathrm{diag}(d)`.
+
+        Parameters
+        ----------
+        diagonal : NDArray, optional
+            Extra diagonal :math:`d`, e.g. statistical variances.
+
+        Returns
+        -------
+        float
+            Logarithm of determinant.
+        """
+        diagonal_inverse, _, (capacitance, _) = self._factorize(diagonal)
+        return float(2 * np.log(np.diagonal(capacitance)).sum() - np.log(diagonal_inverse).sum())
+
+
+def load_low_rank_covariance(filename: str) -> LowRankCovariance:
+    """Load factored covariance matrix saved by `covariances/covmatrix_mc.py`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to `hdf5` file with `low_rank` group.
+
+    Returns
+    -------
+    LowRankCovariance
+        Factored covariance matrix.
+    """
+    with h5py.File(filename, "r") as f:
+        group = f["low_rank"]
+        return LowRankCovariance(
+            group["factor"][:], group["diagonal"][:], group.attrs["retained_variance"]
+        )
+
+
+def get_covariance_cache_key(model, model_options: Mapping[str, Any]) -> str:
+    """Create key of systematic covariance matrix of the model.
+
+    Key is a hash of versions of packages, model options, names of covariance groups,
+    and names and values of all the parameters (the point, where Jacobians are calculated).
+
+    Parameters
+    ----------
+    model : model_dayabay
+        Object of model.
+    model_options : Mapping[str, Any]
+        Options of model that change the model, e.g. path to data and concatenation mode.
+
+    Returns
+    -------
+    str
+        Hexadecimal key.
+    """
+    parameters = dict(model.storage["parameters.all"].walkjoineditems())
+    description = {
+        "versions": {package: version(package) for package in ("dag-modelling", "dayabay-model")},
+        "model": dict(model_options),
+        "jacobians": list(model.storage["nodes.covariance.jacobians"].walkjoinedkeys()),
+        "parameters": list(parameters.keys()),
+    }
+    key = sha256(json_dumps(description, sort_keys=True, default=str).encode())
+    key.update(
+        np.array([parameter.value for parameter in parameters.values()], dtype="d").tobytes()
+    )
+    return key.hexdigest()
+
+
+def update_covariance_matrix_cached(
+    model, model_options: Mapping[str, Any], cache_directory: str
+) -> bool:
+    """Load Jacobians of systematic covariance matrix from cache or calculate and store them.
+
+    Jacobians of systematic parameters are the most expensive part of `full.covmat.*`
+    statistics and they are the same for every call with the same model and parameter
+    point. Loaded Jacobians are frozen in the model, as after their calculation.
+
+    Parameters
+    ----------
+    model : model_dayabay
+        Object of model.
+    model_options : Mapping[str, Any]
+        Options of model that change the model, see `get_covariance_cache_key`.
+    cache_directory : str
+        Directory for cache files.
+
+    Returns
+    -------
+    bool
+        True if Jacobians were loaded from cache.
+    """
+    storage = model.storage
+    jacobians = dict(storage["nodes.covariance.jacobians"].walkjoineditems())
+    key = get_covariance_cache_key(model, model_options)
+    filename = os.path.join(cache_directory, f"covariance-{key}.hdf5")
+    if os.path.exists(filename):
+        with h5py.File(filename, "r") as f:
+            for name, node in jacobians.items():
+                node.outputs[0].set(f[f"jacobians/{name}"][:], force_taint=True)
+                node.freeze()
+        return True
+
+    model.update_covariance_matrix()
+    os.makedirs(cache_directory, exist_ok=True)
+    with h5py.File(f"{filename}.tmp", "w") as f:
+        f.attrs["key"] = key
+        f.attrs["model_options"] = json_dumps(dict(model_options), default=str)
+        for name, node in jacobians.items():
+            f.create_dataset(f"jacobians/{name}", data=node.outputs[0].data)
+        f.create_dataset(
+            "covariance_matrix", data=storage["outputs.covariance.covmat_syst.sum"].data
+        )
+    os.replace(f"{filename}.tmp", filename)
+    return False
+
+
+def create_model(args: Namespace, **model_options: Any) -> tuple[Any, dict[str, Parameter]]:
+    """Create model and choose parameters for minimization from arguments of fit scripts.
+
+    Free parameters are added for minimization, constrained parameters are added only
+    for statistics without covariance matrix. Jacobians of systematic covariance matrix
+    are loaded from `--covariance-cache`, if it is given.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script: `source_type`, `concatenation_mode`, `statistic`,
+        `free_parameters`, `constrained_parameters` and `covariance_cache`.
+    **model_options : Any
+        Other options of model, e.g. `seed` and `monte_carlo_mode`.
+
+    Returns
+    -------
+    tuple[model_dayabay, dict[str, Parameter]]
+        Model and parameters for minimization.
+    """
+    model = model_dayabay(
+        path_data=get_path_data(args.source_type) if args.source_type else None,
+        concatenation_mode=args.concatenation_mode,
+        **model_options,
+    )
+    storage = model.storage
+
+    minimization_parameters: dict[str, Parameter] = {}
+    update_dict_parameters(
+        minimization_parameters, args.free_parameters, storage["parameters.free"]
+    )
+    if "covmat" not in args.statistic:
+        update_dict_parameters(
+            minimization_parameters,
+            args.constrained_parameters,
+            storage["parameters.constrained"],
+        )
+    elif args.constrained_parameters:
+        raise Exception(f"Statistic {args.statistic} can not be used with constrained parameters")
+
+    # Jacobians of systematic covariance matrix are the same for the same model and
+    # parameter point, load them from cache instead of calculating
+    if args.covariance_cache and "covmat" in args.statistic:
+        update_covariance_matrix_cached(
+            model,
+            {"source_type": args.source_type, "concatenation_mode": args.concatenation_mode},
+            args.covariance_cache,
+        )
+
+    return model, minimization_parameters
+
+
+def get_profile_of_map(
+    chi2_map: NDArray | h5py.Dataset,
+    grid_parameters: Sequence[str],
+    parameters: Sequence[str],
+    reduce: np.ufunc = np.fmin,
+) -> NDArray:
+    """Profile N-d chi-squared map: minimize it over axes of other parameters.
+
+    Map in HDF5 dataset is read chunk by chunk, so it is never loaded as a whole.
+
+    Parameters
+    ----------
+    chi2_map : NDArray | h5py.Dataset
+        N-d map of chi-squared values, points that are not profiled are `nan`.
+    grid_parameters : Sequence[str]
+        Names of parameters of axes of the map.
+    parameters : Sequence[str]
+        Names of parameters of the profile.
+    reduce : np.ufunc
+        Function to reduce values over axes of other parameters, e.g. `np.add`
+        to sum numbers of function evaluations. Default: minimum ignoring `nan`.
+
+    Returns
+    -------
+    NDArray
+        Map of chi-squared values over axes of `parameters` in the given order.
+    """
+    axes = tuple(axis for axis, name in enumerate(grid_parameters) if name not in parameters)
+    kept_axes = [axis for axis, name in enumerate(grid_parameters) if name in parameters]
+    if isinstance(chi2_map, np.ndarray):
+        profile = reduce.reduce(chi2_map, axis=axes)
+    else:
+        profile = np.full(
+            [chi2_map.shape[axis] for axis in kept_axes],
+            np.nan if reduce.identity is None else reduce.identity,
+            dtype=chi2_map.dtype,
+        )
+        for chunk in chi2_map.iter_chunks():
+            target = tuple(chunk[axis] for axis in kept_axes)
+            profile[target] = reduce(profile[target], reduce.reduce(chi2_map[chunk], axis=axes))
+    kept = [name for name in grid_parameters if name in parameters]
+    return profile.transpose([kept.index(name) for name in parameters])
+
+
+def load_chi2_map_profile(
+    filename: str, parameters: Sequence[str]
+) -> tuple[list[NDArray], NDArray]:
+    """Load profile of N-d map saved by `fits/fit_dayabay_dgm_chi2map.py` with `--output-map`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to HDF5 file.
+    parameters : Sequence[str]
+        Names of parameters of the profile, other parameters are profiled out.
+
+    Returns
+    -------
+    tuple[list[NDArray], NDArray]
+        Axes of the profile and map of chi-squared values over them.
+    """
+    with h5py.File(filename, "r") as f:
+        grid_parameters = list(f.attrs["parameters"])
+        grids = [f[f"axes/{parameter}"][:] for parameter in parameters]
+        return grids, get_profile_of_map(f["chi2"], grid_parameters, parameters)
+
+
+def convert_sigmas_to_chi2(df: int, sigmas: list[float] | NDArray) -> NDArray:
+    """Convert deviation of normal unit distribution N(0, 1) to critical value
+    of chi-squared.
+
+    Parameters
+    ----------
+    df : int
+        Degree of freedom of chi-squared distribution.
+    sigmas : list[float] | NDArray
+        List or array deviations from 0 in terms of standard deviation of normal unit distribution N(0, 1).
+
+    Returns
+    -------
+    NDArray
+        Array of critical values of chi-squared.
+    """
+    percentiles = 2 * norm(0, 1).cdf(sigmas) - 1
+    return chi2(df).ppf(percentiles)
+
+
+class Chi2Surrogate:
+    r"""Surrogate of chi-squared function over scanned parameters.
+
+    Map on a regular grid is interpolated with tensor-product spline,
+    scattered points (e.g. of adaptive scan) are interpolated with radial
+    basis functions. Values are returned as :math:`\Delta\chi^2` relative
+    to `fun`, so contours, errors and values at arbitrary points are
+    calculated without new fits.
+
+    Attributes
+    ----------
+    grids : list[NDArray] | None
+        Axes of the regular grid.
+    points : NDArray | None
+        Scattered points, `(number of points)x(number of parameters)`.
+    values : NDArray
+        Values of chi-squared function in points of the map.
+    fun : float
+        Value of chi-squared function in the best fit point.
+    method : str
+        Method of `RegularGridInterpolator` or kernel of `RBFInterpolator`.
+    """
+
+    __slots__ = ("grids", "points", "values", "fun", "method", "_interpolator", "_bounds")
+
+    grids: list[NDArray] | None
+    points: NDArray | None
+    values: NDArray
+    fun: float
+    method: str
+
+    def __init__(
+        self,
+        values: NDArray,
+        fun: float | None = None,
+        *,
+        grids: Sequence[NDArray] | None = None,
+        points: NDArray | None = None,
+        method: str | None = None,
+        smoothing: float = 0.0,
+    ) -> None:
+        """Build surrogate from the map on a regular grid or from scattered points.
+
+        Parameters
+        ----------
+        values : NDArray
+            Values of chi-squared function, in order of `itertools.product` for grid.
+        fun : float, optional
+            Value of chi-squared function in the best fit point. Default: minimum of values.
+        grids : Sequence[NDArray], optional
+            Axes of the regular grid.
+        points : NDArray, optional
+            Scattered points, if `grids` are not passed.
+        method : str, optional
+            Method of `RegularGridInterpolator`, default: `cubic` if there are at least
+            4 points along each axis, `linear` otherwise. Kernel of `RBFInterpolator`,
+            default: `thin_plate_spline`.
+        smoothing : float
+            Smoothing of `RBFInterpolator`.
+        """
+        if (grids is None) == (points is None):
+            raise RuntimeError("Either grids or points of the map should be passed")
+        self.fun = float(np.nanmin(values)) if fun is None else float(fun)
+        self.grids = None
+        self.points = None
+        if grids is not None:
+            self.grids = [np.asarray(grid) for grid in grids]
+            shape = tuple(grid.size for grid in self.grids)
+            self.values = np.asarray(values).reshape(shape)
+            self.method = method or ("cubic" if min(shape) >= 4 else "linear")
+            if len(shape) == 1 and self.method in {"linear", "cubic"}:
+                # 1d spline is faster and its roots are calculated exactly
+                self._interpolator = make_interp_spline(
+                    self.grids[0], self.values, k=1 if self.method == "linear" else 3
+                )
+            else:
+                self._interpolator = RegularGridInterpolator(
+                    self.grids, self.values, method=self.method
+                )
+        else:
+            self.points = np.asarray(points).reshape(len(values), -1)
+            self.values = np.asarray(values)
+            self.method = method or "thin_plate_spline"
+            # Axes of parameters could differ by orders, points are scaled to unit box
+            self._bounds = self.points.min(axis=0), np.ptp(self.points, axis=0)
+            self._interpolator = RBFInterpolator(
+                self._scale(self.points), self.values, kernel=self.method, smoothing=smoothing
+            )
+
+    @classmethod
+    def from_npz(cls, filename: str, method: str | None = None) -> Chi2Surrogate:
+        """Build surrogate from 2d map saved by `fits/fit_dayabay_dgm_chi2map.py`.
+
+        Map is interpolated as a grid, if it is a complete cartesian product,
+        and as scattered points otherwise.
+
+        Parameters
+        ----------
+        filename : str
+            Path to `npz` file.
+        method : str, optional
+            Method of interpolation, see `Chi2Surrogate`.
+
+        Returns
+        -------
+        Chi2Surrogate
+            Surrogate of the 2d map.
+        """
+        data = np.load(filename)
+        points, values = data["chi2map2d"][:, :2], data["chi2map2d"][:, 2]
+        fun = data["best_fit_values"]["fun"][0]
+        grids = [np.unique(column) for column in points.T]
+        if grids[0].size * grids[1].size == values.size and np.array_equal(
+            points, np.stack(np.meshgrid(*grids, indexing="ij"), axis=-1).reshape(-1, 2)
+        ):
+            return cls(values, fun, grids=grids, method=method)
+        return cls(values, fun, points=points, method=method)
+
+    @property
+    def ndim(self) -> int:
+        """Number of parameters of the map."""
+        return len(self.grids) if self.grids is not None else self.points.shape[1]
+
+    @property
+    def bounds(self) -> list[tuple[float, float]]:
+        """Lower and upper bounds of the map along each axis."""
+        if self.grids is not None:
+            return [(grid[0], grid[-1]) for grid in self.grids]
+        return list(zip(self.points.min(axis=0), self.points.max(axis=0)))
+
+    def __call__(self, points: NDArray | Sequence[float]) -> NDArray:
+        r"""Calculate :math:`\Delta\chi^2` in points, `(number of points)x(number of parameters)`."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, self.ndim)
+        if self.points is not None:
+            points = self._scale(points)
+        return self._interpolator(points).reshape(-1) - self.fun
+
+    def _scale(self, points: NDArray) -> NDArray:
+        lower, size = self._bounds
+        return (points - lower) / size
+
+    def get_residuals(self, folds: int = 5) -> tuple[NDArray, NDArray]:
+        """Estimate accuracy of interpolation on points of the map, which are excluded from it.
+
+        For grid, surrogate is built on every second node along each axis and residuals
+        are calculated in the rest nodes. For scattered points, k-fold cross-validation is used.
+
+        Parameters
+        ----------
+        folds : int
+            Number of folds for scattered points.
+
+        Returns
+        -------
+        tuple[NDArray, NDArray]
+            Points and residuals (interpolated minus calculated values) in them.
+        """
+        if self.grids is not None:
+            surrogate = Chi2Surrogate(
+                self.values[(slice(None, None, 2),) * self.ndim],
+                self.fun,
+                grids=[grid[::2] for grid in self.grids],
+                method=None if self.method in {"linear", "cubic"} else self.method,
+            )
+            excluded = np.ones(self.values.shape, dtype=bool)
+            excluded[(slice(None, None, 2),) * self.ndim] = False
+            # Points outside of the coarse grid are not interpolated
+            for axis, grid in enumerate(self.grids):
+                inside = np.ones(grid.size, dtype=bool)
+                inside[(grid.size - 1) // 2 * 2 + 1 :] = False
+                excluded &= np.expand_dims(inside, [i for i in range(self.ndim) if i != axis])
+            positions = np.nonzero(excluded)
+            points = np.stack([grid[i] for grid, i in zip(self.grids, positions)], axis=1)
+            return points, surrogate(points) + self.fun - self.values[positions]
+
+        fold = np.arange(self.values.size) % folds
+        residuals = np.zeros(self.values.size)
+        for i in range(folds):
+            surrogate = Chi2Surrogate(
+                self.values[fold != i], self.fun, points=self.points[fold != i], method=self.method
+            )
+            residuals[fold == i] = (
+                surrogate(self.points[fold == i]) + self.fun - self.values[fold == i]
+            )
+        return self.points, residuals
+
+    def get_contours(self, level: float, num: int = 200) -> list[NDArray]:
+        r"""Calculate polylines of contour of 2d surrogate.
+
+        Parameters
+        ----------
+        level : float
+            Level of :math:`\Delta\chi^2`, e.g. `scipy.stats.chi2(2).ppf(cl)` for confidence level `cl`.
+        num : int
+            Number of points of the mesh along each axis.
+
+        Returns
+        -------
+        list[NDArray]
+            Polylines, `(number of vertices)x2` each.
+        """
+        if self.ndim != 2:
+            raise RuntimeError(f"Contours are supported only for 2d surrogate, not {self.ndim}d")
+        (x_min, x_max), (y_min, y_max) = self.bounds
+        x = np.linspace(x_min, x_max, num)
+        y = np.linspace(y_min, y_max, num)
+        mesh = np.stack(np.meshgrid(x, y, indexing="xy"), axis=-1).reshape(-1, 2)
+        values = self(mesh).reshape(num, num)
+        return contour_generator(x, y, values).lines(level)
+
+    def get_errors(
+        self, level: float = 1.0, best_fit: float | None = None
+    ) -> tuple[float, float, float]:
+        r"""Calculate asymmetric errors from 1d surrogate of profile.
+
+        Parameters
+        ----------
+        level : float
+            Level of :math:`\Delta\chi^2`.
+        best_fit : float, optional
+            Best fit value of parameter. Default: minimum of surrogate.
+
+        Returns
+        -------
+        tuple[float, float, float]
+            Best fit value, left and right errors. Error is `nan`,
+            if the level is not crossed within the bounds.
+        """
+        if not isinstance(self._interpolator, BSpline):
+            raise RuntimeError("Errors are supported only for 1d surrogate on grid")
+        polynomial = PPoly.from_spline(self._interpolator)
+        polynomial.c[-1] -= self.fun + level
+        if best_fit is None:
+            extrema = np.concatenate(
+                (polynomial.derivative().roots(extrapolate=False), self.grids[0][[0, -1]])
+            )
+            best_fit = float(extrema[polynomial(extrema).argmin()])
+        roots = polynomial.roots(extrapolate=False)
+        left, right = roots[roots < best_fit], roots[roots > best_fit]
+        return (
+            best_fit,
+            best_fit - left.max() if left.size else np.nan,
+            right.min() - best_fit if right.size else np.nan,
+        )
+
+
 def filter_fit(src: dict, keys_to_filter: list[str]) -> None:
     """Remove keys from fit dictionary.
 
@@ -100,30 +1655,139 @@ def convert_numpy_to_lists(src: dict[str, NDArray | dict]) -> None:
             convert_numpy_to_lists(value)
 
 
-def do_fit(minimizer: MinimizerBase, model, is_iterative: bool = False) -> dict:
+def update_fixed_covariance(model, statistic: str) -> None:
+    """Update frozen statistical and systematic covariance matrices in the current point.
+
+    Fixed statistical errors of `*_iterative` statistics are calculated from the
+    prediction once, at the first evaluation, and the systematic covariance matrix
+    of `full.covmat.*` statistics is calculated in the point of its Jacobians. Both
+    are recalculated in the current point, pseudo-data is not regenerated.
+
+    Parameters
+    ----------
+    model : model_dayabay
+        Object of model.
+    statistic : str
+        Name of statistic, systematic covariance matrix is updated for `covmat` only.
+    """
+    model.storage["nodes.covariance.data.fixed"].next_sample()
+    if "covmat" in statistic:
+        model.update_covariance_matrix()
+
+
+def do_fit(
+    minimizer: MinimizerBase,
+    model,
+    is_iterative: bool | int = False,
+    *,
+    parameter_tolerance: float = 0.01,
+    fun_tolerance: float = 1e-3,
+    prediction_tolerance: float = 1e-6,
+    ncall: int | None = None,
+) -> dict:
     """Do fit procedure obtain iterative statistics.
 
+    For iterative statistics the covariance matrix (or statistical errors) is
+    updated in the best fit point with `update_fixed_covariance` and the fit is
+    repeated from the previous minimum. Iterations stop, when the parameters
+    shift less than `parameter_tolerance` of their errors and chi-squared
+    changes less than `fun_tolerance`. If the prediction has moved less than
+    `prediction_tolerance` (relative) since the last update, the covariance matrix
+    is not updated and the previous fit is final, since the refit would be the same.
+
     Parameters
     ----------
     minimizer : MinimizerBase
         Minimization object.
     model : model_dayabay
         Object of model.
-    is_iterative : bool
-        Minimizable function is iterative statistics or not.
+    is_iterative : bool | int
+        Minimizable function is iterative statistics or not. Integer is maximal
+        number of refits, `True` is 4 refits.
+    parameter_tolerance : float
+        Tolerance of shifts of parameters in units of their errors.
+    fun_tolerance : float
+        Tolerance of change of chi-squared.
+    prediction_tolerance : float
+        Relative change of prediction, below which the covariance matrix is not updated.
+    ncall : int, optional
+        Maximal number of function evaluations of the first fit. Fit, which is truncated
+        by the limit, gives only an upper bound of the minimum, so it is continued
+        by a complete fit and evaluations of both fits are counted.
 
     Returns
     -------
     dict
-        Fit result.
+        Fit result. For iterative statistics it has `iterations` with `fun`, `nfev`,
+        `clock`, change of chi-squared `delta_fun`, maximal shift of parameters
+        `max_shift` and relative shift of prediction `prediction_shift` of each fit,
+        total number of evaluations `nfev_iterations` and `converged` flag.
     """
-    fit = minimizer.fit()
-    if is_iterative:
-        for _ in range(4):
-            model.next_sample(mc_parameters=False, mc_statistics=False)
+    vector = ParametersVector(minimizer.parameters)
+    if ncall is None:
+        fit = minimizer.fit()
+    else:
+        fit = minimizer.fit(ncall=ncall, iterate=1)
+        if not fit["success"]:
+            nfev_truncated = fit["nfev"]
+            vector.set(fit["x"])
             fit = minimizer.fit()
-            if not fit["success"]:
+            fit["nfev"] += nfev_truncated
+    n_refits = 4 if is_iterative is True else int(is_iterative)
+    if n_refits <= 0:
+        return fit
+
+    prediction = model.storage["outputs.eventscount.final.concatenated.selected"]
+    reference = None
+    iterations = [
+        {
+            "fun": fit["fun"],
+            "nfev": fit["nfev"],
+            "clock": fit["clock"],
+            "delta_fun": None,
+            "max_shift": None,
+            "prediction_shift": None,
+        }
+    ]
+    converged = False
+    for _ in range(n_refits):
+        if not fit["success"]:
+            break
+        # Covariance matrix is updated in the best fit point, the refit starts from it
+        vector.set(fit["x"])
+        current = prediction.data.copy()
+        if reference is not None:
+            prediction_shift = np.abs(current - reference).max() / np.abs(reference).max()
+            iterations[-1]["prediction_shift"] = float(prediction_shift)
+            if prediction_shift < prediction_tolerance:
+                converged = True
                 break
+        reference = current
+        update_fixed_covariance(model, minimizer.statistic.node.name)
+
+        previous = fit
+        fit = minimizer.fit()
+        errors = np.array(fit["errors"]) if fit["errors"] is not None else None
+        shifts = np.abs(np.array(fit["x"]) - np.array(previous["x"]))
+        max_shift = float((shifts / errors).max() if errors is not None else shifts.max())
+        delta_fun = float(fit["fun"] - previous["fun"])
+        iterations.append(
+            {
+                "fun": fit["fun"],
+                "nfev": fit["nfev"],
+                "clock": fit["clock"],
+                "delta_fun": delta_fun,
+                "max_shift": max_shift,
+                "prediction_shift": None,
+            }
+        )
+        if fit["success"] and max_shift < parameter_tolerance and abs(delta_fun) < fun_tolerance:
+            converged = True
+            break
+
+    fit["iterations"] = iterations
+    fit["nfev_iterations"] = sum(iteration["nfev"] for iteration in iterations)
+    fit["converged"] = converged
     return fit
 
 
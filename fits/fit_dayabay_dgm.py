@@ -13,67 +13,410 @@ Example of call
       --constrained-parameters survival_probability detector reactor background reactor_anue \
       --constrain-osc-parameters \
       --output fit-result.yaml
+
+Example of call with fits from several start points
+
+.. code-block:: shell
+
+    ./fits/fit_dayabay_dgm.py \
+      --statistic full.pull.chi2p \
+      --free-parameters survival_probability neutrino_per_fission_factor \
+      --constrained-parameters survival_probability detector reactor background reactor_anue \
+      --multi-start 16 \
+      --multi-start-limits survival_probability.SinSq2Theta13 0.05 0.12 \
+      --multi-start-limits survival_probability.DeltaMSq32 2.0e-3 3.0e-3 \
+      --output fit-result.yaml
+
+Example of call with analytic minimization of near-linear nuisance parameters
+
+.. code-block:: shell
+
+    ./fits/fit_dayabay_dgm.py \
+      --statistic full.pull.chi2cnp \
+      --free-parameters survival_probability neutrino_per_fission_factor \
+      --constrained-parameters detector reactor background \
+      --profile-nuisance \
+      --profile-nuisance-check \
+      --output fit-result.yaml
 """
+from __future__ import annotations
+
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pprint import pprint
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
+import numpy as np
 from dag_modelling.tools.logger import DEBUG as INFO4
-from dag_modelling.tools.logger import INFO1, INFO2, INFO3, set_level
-from dayabay_data_official import get_path_data
-from dayabay_model import model_dayabay
+from dag_modelling.tools.logger import INFO1, INFO2, INFO3, logger, set_level
 from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+from scipy.stats.qmc import LatinHypercube
 
-from fits import do_fit, filter_save_fit, update_dict_parameters
+from fits import (
+    GaussNewtonMinimizer,
+    IMinuitGradientMinimizer,
+    IMinuitProfiledMinimizer,
+    ParametersVector,
+    StatisticResiduals,
+    create_model,
+    do_fit,
+    filter_fit,
+    filter_save_fit,
+    get_linear_parameters,
+    get_profile_crossing,
+    update_dict_parameters,
+    update_fixed_covariance,
+)
 
 if TYPE_CHECKING:
+    from typing import Callable
+
+    from dag_modelling.core.output import Output
     from dag_modelling.parameters import Parameter
+    from dgm_fit.minimizer_base import MinimizerBase
+    from numpy.typing import NDArray
 
 
-def main(args: Namespace) -> None:
-    # Set verbosity level
-    if args.verbose:
-        args.verbose = min(args.verbose, 3)
-        set_level(globals()[f"INFO{args.verbose}"])
+def initialize_model(args: Namespace) -> tuple[Any, Output, dict[str, Parameter]]:
+    """Create model, choose statistic and parameters for minimization.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
 
-    # Initialize model
-    model = model_dayabay(
-        path_data=get_path_data(args.source_type) if args.source_type else None,
+    Returns
+    -------
+    tuple[model_dayabay, Output, dict[str, Parameter]]
+        Model, statistic and parameters for minimization.
+    """
+    model, minimization_parameters = create_model(
+        args,
         seed=args.seed,
         monte_carlo_mode=args.monte_carlo_mode,
-        concatenation_mode=args.concatenation_mode,
         parameter_values=args.par,
     )
 
-    # Initialize helpful variables and switch output of model
-    # to Asimov (output 0) or Real data (output 1).
-    storage = model.storage
+    # Switch output of model to Asimov (output 0) or Real data (output 1)
     model.switch_data(args.data)
 
-    parameters_free = storage("parameters.free")
-    parameters_constrained = storage("parameters.constrained")
-    statistic = storage("outputs.statistic")
-
     # Choose statistic for minimization
-    chi2 = statistic[f"{args.statistic}"]
-    # Fill variable `minimization_parameters` free and constrained parameters,
-    # if they are given
-    minimization_parameters: dict[str, Parameter] = {}
-    update_dict_parameters(minimization_parameters, args.free_parameters, parameters_free)
-    if "covmat" not in args.statistic:
+    chi2 = model.storage[f"outputs.statistic.{args.statistic}"]
+
+    return model, chi2, minimization_parameters
+
+
+def get_minimizer_class(args: Namespace, model) -> Callable[..., MinimizerBase]:
+    """Choose minimizer of `--minimizer`, `--gradient` and `--profile-nuisance` options.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+    model : model_dayabay
+        Object of model.
+
+    Returns
+    -------
+    Callable[..., MinimizerBase]
+        Class of minimizer or partial with residuals of statistic for Gauss-Newton
+        and for analytic minimization of nuisance parameters.
+    """
+    if args.minimizer == "gauss-newton":
+        return partial(
+            GaussNewtonMinimizer, residuals=StatisticResiduals(model.storage, args.statistic)
+        )
+    if args.profile_nuisance:
+        residuals = StatisticResiduals(model.storage, args.statistic)
+        constrained_parameters: dict[str, Parameter] = {}
         update_dict_parameters(
-            minimization_parameters,
+            constrained_parameters,
             args.constrained_parameters,
-            parameters_constrained,
+            model.storage["parameters.constrained"],
+        )
+        nonlinearity = get_linear_parameters(residuals, constrained_parameters)
+        profiled = [name for name, value in nonlinearity.items() if value < args.linear_tolerance]
+        logger.info(
+            f"{len(profiled)} of {len(nonlinearity)} constrained parameters are minimized "
+            "analytically"
+        )
+        for name, value in nonlinearity.items():
+            logger.log(INFO2, f"Non-linearity of {name}: {value:.3g}")
+        return partial(IMinuitProfiledMinimizer, residuals=residuals, profiled=profiled)
+    if args.gradient:
+        return IMinuitGradientMinimizer
+    return IMinuitMinimizer
+
+
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(args: Namespace) -> None:
+    """Build model and minimizer in the worker process.
+
+    Model passes the same steps as in the main process: statistic is evaluated
+    in the initial point first, so Asimov data and covariance matrix are the same.
+    """
+    model, chi2, minimization_parameters = initialize_model(args)
+    chi2.data
+    vector = ParametersVector(minimization_parameters)
+    _worker_state.update(
+        args=args,
+        model=model,
+        chi2=chi2,
+        parameters=minimization_parameters,
+        minimizer=get_minimizer_class(args, model)(
+            chi2, parameters=minimization_parameters, nbins=model.nbins
+        ),
+        vector=vector,
+        nominal=vector.values,
+        start_vector=ParametersVector(
+            {name: minimization_parameters[name] for name, *_ in args.multi_start_limits}
+        ),
+    )
+
+
+def _fit_from_start_worker(start: NDArray) -> dict[str, Any]:
+    """Fit within model of the worker process, starting from nominal values and `start`."""
+    state = _worker_state
+    state["vector"].set(state["nominal"])
+    state["start_vector"].set(start)
+    fit = do_fit(state["minimizer"], state["model"], state["args"].n_iterations)
+    filter_fit(fit, ["summary"])
+    logger.info(f"Start {start}: chi2={fit['fun']}, success={fit['success']}")
+    return fit
+
+
+def _profile_side_worker(task: tuple[str, int, NDArray, float, float]) -> dict[str, Any]:
+    """Find one side of profile error within model of the worker process."""
+    name, side, best_fit_values, fun_min, error = task
+    state = _worker_state
+    model, parameters = state["model"], state["parameters"]
+    state["vector"].set(best_fit_values)
+    if state["args"].n_iterations:
+        update_fixed_covariance(model, state["args"].statistic)
+    minimizer = IMinuitMinimizer(
+        state["chi2"],
+        parameters={key: parameter for key, parameter in parameters.items() if key != name},
+        nbins=model.nbins,
+    )
+    status = get_profile_crossing(minimizer, parameters[name], fun_min, error, side)
+    logger.info(f"Profile error of {name} ({'+' if side > 0 else '-'}): {status['error']}")
+    return status
+
+
+def profile_errors_parallel(args: Namespace, fit: dict[str, Any]) -> dict[str, Any]:
+    """Calculate profile errors of `--profile-parameters` in worker processes.
+
+    Each side of each parameter is found in its own task with `get_profile_crossing`,
+    starting from the best fit. Result has the same layout as result of
+    `IMinuitMinimizer.profile_errors`.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+    fit : dict[str, Any]
+        Best fit.
+
+    Returns
+    -------
+    dict[str, Any]
+        Names, errors, `errorsdict` with lower and upper errors and statuses of errors.
+    """
+    names = args.profile_parameters
+    tasks = [
+        (name, side, np.array(fit["x"]), fit["fun"], fit["errorsdict"][name])
+        for name in names
+        for side in (-1, 1)
+    ]
+    with ProcessPoolExecutor(
+        max_workers=min(args.jobs, len(tasks)), initializer=_initialize_worker, initargs=(args,)
+    ) as executor:
+        statuses = list(executor.map(_profile_side_worker, tasks))
+
+    result: dict[str, Any] = {"names": names, "errors": [], "errorsdict": {}}
+    result["errors_profile_status"] = {}
+    for name, lower, upper in zip(names, statuses[0::2], statuses[1::2]):
+        result["errors_profile_status"][name] = {"lower": lower, "upper": upper}
+        if lower["is_valid"] and upper["is_valid"]:
+            result["errors"].append([lower["error"], upper["error"]])
+            result["errorsdict"][name] = result["errors"][-1]
+    return result
+
+
+def check_profile_nuisance(
+    args: Namespace,
+    model,
+    chi2: Output,
+    minimization_parameters: dict[str, Parameter],
+    start: NDArray,
+    fit: dict[str, Any],
+) -> dict[str, Any]:
+    """Repeat fit with Migrad over all the parameters and compare with fit of `--profile-nuisance`.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+    model : model_dayabay
+        Object of model.
+    chi2 : Output
+        Statistic for minimization.
+    minimization_parameters : dict[str, Parameter]
+        Parameters for minimization.
+    start : NDArray
+        Start values of fit with analytic minimization.
+    fit : dict[str, Any]
+        Fit with analytic minimization.
+
+    Returns
+    -------
+    dict[str, Any]
+        Chi-squared, status and number of evaluations of fit over all the parameters,
+        difference of chi-squared, shifts of best fit values in units of errors and
+        ratios of errors.
+    """
+    vector = ParametersVector(minimization_parameters)
+    best_fit_values = vector.values
+    vector.set(start)
+    minimizer = IMinuitMinimizer(chi2, parameters=minimization_parameters, nbins=model.nbins)
+    full = do_fit(minimizer, model, args.n_iterations)
+    vector.set(best_fit_values)
+
+    shifts = {
+        name: (fit["xdict"][name] - value) / full["errorsdict"][name]
+        for name, value in full["xdict"].items()
+    }
+    check = {
+        "fun": full["fun"],
+        "success": full["success"],
+        "nfev": full["nfev"],
+        "clock": full["clock"],
+        "delta_fun": fit["fun"] - full["fun"],
+        "max_shift": max(abs(shift) for shift in shifts.values()),
+        "shifts": shifts,
+        "errors_ratio": {
+            name: fit["errorsdict"][name] / error
+            for name, error in full["errorsdict"].items()
+            if name in fit["errorsdict"]
+        },
+    }
+    logger.info(
+        f"Fit over all the parameters: chi2={full['fun']}, nfev={full['nfev']}, "
+        f"time {full['clock']:.1f} s, "
+        f"difference of chi2 {check['delta_fun']:.3g}, "
+        f"maximal shift of parameters {check['max_shift']:.3g} errors"
+    )
+    return check
+
+
+def get_basins(
+    fits: list[dict[str, Any]], tolerance: float, distance: float
+) -> list[dict[str, Any]]:
+    """Group valid minima into basins by value of chi-squared and by best fit values.
+
+    Parameters
+    ----------
+    fits : list[dict[str, Any]]
+        Fits from different start points.
+    tolerance : float
+        Minima, whose chi-squared differ less than tolerance from the lowest minimum
+        of the basin, might belong to the same basin.
+    distance : float
+        Minima, whose best fit values differ less than distance in units of errors
+        from the lowest minimum of the basin, might belong to the same basin.
+        Degenerate minima with close chi-squared belong to different basins.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Basins sorted by chi-squared: chi-squared, best fit values and errors of the lowest
+        minimum, number and fraction of fits, which reached the basin.
+    """
+    basins: list[dict[str, Any]] = []
+    for fit in sorted((fit for fit in fits if fit["success"]), key=lambda fit: fit["fun"]):
+        for basin in basins:
+            if fit["fun"] - basin["fun"] >= tolerance:
+                continue
+            shift = max(
+                abs(fit["xdict"][name] - value) / basin["errorsdict"][name]
+                for name, value in basin["xdict"].items()
+            )
+            if shift < distance:
+                basin["count"] += 1
+                break
+        else:
+            basins.append(
+                {
+                    "fun": fit["fun"],
+                    "xdict": fit["xdict"],
+                    "errorsdict": fit["errorsdict"],
+                    "count": 1,
+                }
+            )
+    for basin in basins:
+        basin["fraction"] = basin["count"] / len(fits)
+    return basins
+
+
+def fit_multi_start(args: Namespace) -> tuple[NDArray, dict[str, Any]]:
+    """Fit from Latin-hypercube-sampled start points in worker processes.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+
+    Returns
+    -------
+    tuple[NDArray, dict[str, Any]]
+        Best fit values of the lowest valid minimum and summary of fits.
+    """
+    lower, upper = np.array([limits for _, *limits in args.multi_start_limits], dtype="d").T
+    sampler = LatinHypercube(d=lower.size, seed=args.seed)
+    starts = lower + sampler.random(args.multi_start) * (upper - lower)
+    with ProcessPoolExecutor(
+        max_workers=args.jobs, initializer=_initialize_worker, initargs=(args,)
+    ) as executor:
+        fits = list(executor.map(_fit_from_start_worker, starts))
+
+    basins = get_basins(fits, args.basin_tolerance, args.basin_distance)
+    if not basins:
+        raise RuntimeError(f"None of {args.multi_start} fits from different start points is valid")
+    for basin in basins:
+        logger.info(
+            f"Basin chi2={basin['fun']}: reached {basin['count']} of {args.multi_start} times"
         )
-    elif args.constrained_parameters:
-        raise Exception(f"Statistic {args.statistic} can not be used with constrained parameters")
+    best_fit = min((fit for fit in fits if fit["success"]), key=lambda fit: fit["fun"])
+    summary = {
+        "starts": starts,
+        "fun": np.array([fit["fun"] for fit in fits], dtype="d"),
+        "success": [bool(fit["success"]) for fit in fits],
+        "nfev": sum(fit["nfev"] for fit in fits),
+        "basins": basins,
+    }
+    return best_fit["x"], summary
+
+
+def main(args: Namespace) -> None:
+    # Set verbosity level
+    if args.verbose:
+        args.verbose = min(args.verbose, 3)
+        set_level(globals()[f"INFO{args.verbose}"])
+
+    model, chi2, minimization_parameters = initialize_model(args)
+    # Asimov data and covariance matrix are frozen at the first evaluation of statistic,
+    # evaluate it in the initial point before start values are changed
+    chi2.data
+    minimizer_class = get_minimizer_class(args, model)
 
     # Sometimes fit is unstable. And constraining of free parameters
     # might improve robustness of fit
     if args.constrain_osc_parameters:
         # Initialize minimizer object
-        minimizer = IMinuitMinimizer(
+        minimizer = minimizer_class(
             chi2,
             parameters=minimization_parameters,
             limits={"oscprob.SinSq2Theta13": (0, 1), "oscprob.DeltaMSq32": (2e-3, 3e-3)},
@@ -95,17 +438,35 @@ def main(args: Namespace) -> None:
 
     # import IPython; IPython.embed()
     # Initialize minimizer object
-    minimizer = IMinuitMinimizer(
+    minimizer = minimizer_class(
         chi2, parameters=minimization_parameters, nbins=model.nbins, verbose=args.verbose > 1
     )
 
+    # Fits from several start points, the lowest valid minimum is used as start point
+    # of the final fit
+    summary_multi_start = None
+    if args.multi_start:
+        best_fit_values, summary_multi_start = fit_multi_start(args)
+        ParametersVector(minimization_parameters).set(best_fit_values)
+    start = ParametersVector(minimization_parameters).values
+
     # Start fitting
     result = do_fit(minimizer, model, args.n_iterations)
+    if summary_multi_start:
+        result["multi_start"] = summary_multi_start
 
-    if args.profile_parameters:
+    if args.profile_parameters and args.profile_parallel:
+        errors_profiled = profile_errors_parallel(args, result)
+        result["errorsdict_profiled"] = errors_profiled["errorsdict"]
+    elif args.profile_parameters:
         errors_profiled = minimizer.profile_errors(args.profile_parameters)
         result["errorsdict_profiled"] = errors_profiled["errorsdict"]
 
+    if args.profile_nuisance_check:
+        result["profile_nuisance_check"] = check_profile_nuisance(
+            args, model, chi2, minimization_parameters, start, result
+        )
+
     if args.output:
         filter_save_fit(result, args.output)
 
@@ -168,6 +529,11 @@ if __name__ == "__main__":
         default=[],
         help="choose parameters for Minos profiling",
     )
+    fit_options.add_argument(
+        "--profile-parallel",
+        action="store_true",
+        help="find lower and upper profile errors of `--profile-parameters` in `--jobs` worker processes",
+    )
     fit_options.add_argument(
         "--statistic",
         default="full.pull.chi2cnp",
@@ -194,7 +560,72 @@ if __name__ == "__main__":
     fit_options.add_argument(
         "--n-iterations",
         default=0,
-        help="number of iterations of fit procedure, usefull only for iterative chi-squared",
+        type=int,
+        help="maximal number of iterations of fit procedure, usefull only for iterative chi-squared",
+    )
+    fit_options.add_argument(
+        "--minimizer",
+        default="iminuit",
+        choices=["iminuit", "gauss-newton"],
+        help="choose minimizer: Migrad or Levenberg-Marquardt for residuals of statistic",
+    )
+    fit_options.add_argument(
+        "--gradient",
+        action="store_true",
+        help="pass gradient of statistic to Minuit instead of numerical derivatives",
+    )
+    fit_options.add_argument(
+        "--profile-nuisance",
+        action="store_true",
+        help="minimize near-linear constrained parameters analytically inside each call of Minuit",
+    )
+    fit_options.add_argument(
+        "--linear-tolerance",
+        default=0.05,
+        type=float,
+        help="constrained parameters with relative non-linearity of residuals within one sigma below tolerance are minimized analytically",
+    )
+    fit_options.add_argument(
+        "--profile-nuisance-check",
+        action="store_true",
+        help="repeat fit of `--profile-nuisance` with Minuit over all the parameters and compare",
+    )
+    fit_options.add_argument(
+        "--multi-start",
+        default=0,
+        type=int,
+        help="number of fits from start points sampled from Latin hypercube within `--multi-start-limits`",
+    )
+    fit_options.add_argument(
+        "--multi-start-limits",
+        nargs=3,
+        action="append",
+        default=[],
+        metavar=("PARAMETER", "LOWER", "UPPER"),
+        help="limits of start values of parameter for `--multi-start`, other parameters start from nominal values",
+    )
+    fit_options.add_argument(
+        "--basin-tolerance",
+        default=1e-2,
+        type=float,
+        help="minima of `--multi-start` with difference of chi-squared below tolerance belong to the same basin",
+    )
+    fit_options.add_argument(
+        "--basin-distance",
+        default=1.0,
+        type=float,
+        help="minima of `--multi-start` with difference of best fit values below distance in units of errors belong to the same basin",
+    )
+    fit_options.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="number of worker processes for `--multi-start` and `--profile-parallel`, each worker builds its own model",
+    )
+    fit_options.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="directory to cache Jacobians of systematic covariance matrix for `full.covmat.*` statistics",
     )
     fit_options.add_argument(
         "--free-parameters",
@@ -216,5 +647,22 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+    if args.multi_start and not args.multi_start_limits:
+        parser.error("`--multi-start` requires at least one `--multi-start-limits`")
+    if args.minimizer == "gauss-newton" and (args.profile_parameters or args.gradient):
+        parser.error("`--profile-parameters` and `--gradient` require `--minimizer iminuit`")
+    if args.profile_nuisance and (
+        not args.statistic.startswith("full.pull.") or args.minimizer != "iminuit" or args.gradient
+    ):
+        parser.error(
+            "`--profile-nuisance` requires `full.pull.*` statistic, `--minimizer iminuit` "
+            "and no `--gradient`"
+        )
+    if args.profile_parallel and (not args.profile_parameters or args.profile_nuisance):
+        parser.error(
+            "`--profile-parallel` requires `--profile-parameters` and no `--profile-nuisance`"
+        )
+    if args.profile_nuisance_check and not args.profile_nuisance:
+        parser.error("`--profile-nuisance-check` requires `--profile-nuisance`")
 
     main(args)
@@ -2,18 +2,34 @@
 from __future__ import annotations
 
 import itertools
+import os
+import sqlite3
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from json import dumps as json_dumps
 from pprint import pprint
 from typing import TYPE_CHECKING, Any
 
+import h5py
 import numpy as np
-from dayabay_data_official import get_path_data
-from dayabay_model import model_dayabay
+from dag_modelling.tools.logger import logger
 from dgm_fit.iminuit_minimizer import IMinuitMinimizer
 
-from fits import update_dict_parameters
+from fits import (
+    ParametersVector,
+    convert_sigmas_to_chi2,
+    create_model,
+    do_fit,
+    get_profile_of_map,
+    update_fixed_covariance,
+)
 
 if TYPE_CHECKING:
+    from typing import Callable, Iterator
+
+    from dag_modelling.core.output import Output
     from dag_modelling.parameters.gaussian_parameter import Parameter
     from numpy.typing import NDArray
 
@@ -53,10 +69,62 @@ def get_profile_of_chi2(
     return profile_grid[mask], chi2_profile
 
 
+def get_initial_values_from_map(
+    grids: list[NDArray],
+    chi2_map: NDArray,
+    fitted_values: NDArray,
+    grid_parameters: list[str],
+    fitted_parameters: list[str],
+    parameter: str,
+    parameters_1d: list[str],
+) -> NDArray:
+    """Get initial values of 1d profile fits from the minimum envelope of the map.
+
+    For each point of 1d grid the map is minimized over other scanned parameters,
+    the values of other scanned parameters and fitted values in the minimum are used.
+
+    Parameters
+    ----------
+    grids : list[NDArray]
+        Axes of the map created by `cartesian_product`.
+    chi2_map : NDArray | h5py.Dataset
+        N-d map of values of chi-squared function, only a hyperplane of the map
+        is read for each point of 1d grid.
+    fitted_values : NDArray | h5py.Dataset
+        Fitted values of parameters in points of the map,
+        `(shape of the map)x(number of fitted parameters)`.
+    grid_parameters : list[str]
+        Names of scanned parameters of the map.
+    fitted_parameters : list[str]
+        Names of fitted parameters of the map.
+    parameter : str
+        Name of parameter of 1d profile.
+    parameters_1d : list[str]
+        Names of fitted parameters of 1d profile.
+
+    Returns
+    -------
+    NDArray
+        Initial values of parameters of 1d profile in each point of the axis of parameter.
+    """
+    shape = tuple(grid.size for grid in grids)
+    axis = grid_parameters.index(parameter)
+    initial_values = np.zeros((shape[axis], len(parameters_1d)))
+    for idx in range(shape[axis]):
+        line = chi2_map[(slice(None),) * axis + (idx,)]
+        position = list(np.unravel_index(line.argmin(), line.shape))
+        position.insert(axis, idx)
+        values = {name: grid[i] for name, grid, i in zip(grid_parameters, grids, position)}
+        values.update(zip(fitted_parameters, fitted_values[tuple(position)]))
+        initial_values[idx] = [values[name] for name in parameters_1d]
+    return initial_values
+
+
 def cartesian_product(
     grid_opts: list[tuple[str, float, float, int]],
-) -> tuple[list[str], list[NDArray], NDArray]:
-    """Create cartesian products of several axes.
+) -> tuple[list[str], list[NDArray]]:
+    """Create axes of cartesian product. Points of the product are not created,
+    use `get_grid_points` to get them by indices.
 
     Parameters
     ----------
@@ -66,80 +134,991 @@ def cartesian_product(
 
     Returns
     -------
-    tuple[list[str], NDArray]
-        List of parameter names, list of arrays for cartersian product, and cartesian products of arrays.
+    tuple[list[str], list[NDArray]]
+        List of parameter names and list of arrays for cartersian product.
     """
     parameters = []
     grids = []
     for parameter, l_bound, r_bound, num in grid_opts:
         parameters.append(parameter)
         grids.append(np.linspace(float(l_bound), float(r_bound), int(num)))
-    grid = np.array(list(itertools.product(*grids)))
-    return parameters, grids, grid
+    return parameters, grids
 
 
-def main(args: Namespace) -> None:
-    model = model_dayabay(
-        path_data=get_path_data(args.source_type) if args.source_type else None,
-        concatenation_mode=args.concatenation_mode)
+def get_grid_points(grids: list[NDArray], flat_indices: NDArray) -> NDArray:
+    """Get points of cartesian product of axes by indices in order of `itertools.product`.
+
+    Parameters
+    ----------
+    grids : list[NDArray]
+        Axes of cartesian product.
+    flat_indices : NDArray
+        Indices of points.
+
+    Returns
+    -------
+    NDArray
+        Points, `(number of points)x(number of axes)`.
+    """
+    positions = np.unravel_index(flat_indices, tuple(grid.size for grid in grids))
+    return np.stack([grid[position] for grid, position in zip(grids, positions)], axis=1)
+
+
+def create_map_file(
+    filename: str, grid_parameters: list[str], grids: list[NDArray], nfitted: int = 0
+) -> h5py.File:
+    """Create HDF5 file for N-d chi-squared map.
+
+    Datasets `chi2`, `nfev` and `success` are N-d arrays with axes `axes/<parameter>`,
+    stored in chunks, so a slice could be read without reading the whole map.
+    Points, that are not profiled yet, are `nan`. Profiles could be loaded by
+    `fits.load_chi2_map_profile`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to HDF5 file.
+    grid_parameters : list[str]
+        Names of scanned parameters.
+    grids : list[NDArray]
+        Axes of the map.
+    nfitted : int
+        Number of fitted parameters, if positive, their values are saved
+        to dataset `fitted` with the last axis over parameters.
 
-    storage = model.storage
+    Returns
+    -------
+    h5py.File
+        Opened file.
+    """
+    shape = tuple(grid.size for grid in grids)
+    f = h5py.File(filename, "w")
+    f.attrs["parameters"] = grid_parameters
+    for parameter, grid in zip(grid_parameters, grids):
+        f.create_dataset(f"axes/{parameter}", data=grid)
+    f.create_dataset("chi2", shape=shape, dtype=np.float64, chunks=True, fillvalue=np.nan)
+    f.create_dataset("nfev", shape=shape, dtype=np.int64, chunks=True, fillvalue=0)
+    f.create_dataset("success", shape=shape, dtype=bool, chunks=True, fillvalue=False)
+    if nfitted:
+        f.create_dataset(
+            "fitted", shape=(*shape, nfitted), dtype=np.float64, chunks=True, fillvalue=np.nan
+        )
+    return f
+
+
+def save_map_points(
+    f: h5py.File,
+    flat_indices: NDArray,
+    chi2: NDArray,
+    nfev: NDArray,
+    success: NDArray,
+    fitted: NDArray | None = None,
+) -> None:
+    """Write profiled points to the file created by `create_map_file`."""
+    shape = f["chi2"].shape
+    for idx, position in enumerate(zip(*np.unravel_index(flat_indices, shape))):
+        f["chi2"][position] = chi2[idx]
+        f["nfev"][position] = nfev[idx]
+        f["success"][position] = success[idx]
+        if fitted is not None:
+            f["fitted"][position] = fitted[idx]
+    f.flush()
+
+
+def initialize_model(args: Namespace) -> tuple[Any, Output, dict[str, Parameter]]:
+    """Create model, choose statistic and parameters for minimization.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+
+    Returns
+    -------
+    tuple[model_dayabay, Output, dict[str, Parameter]]
+        Model, chi-squared function, and minimization parameters.
+    """
+    model, minimization_parameters = create_model(args)
     model.switch_data(args.data)
+    stat_chi2 = model.storage[f"outputs.statistic.{args.statistic}"]
+
+    model.next_sample(mc_parameters=False, mc_statistics=False)
+    return model, stat_chi2, minimization_parameters
+
+
+def get_store_options(args: Namespace) -> dict[str, Any]:
+    """Collect options of the script, which change chi-squared function of the scan.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+
+    Returns
+    -------
+    dict[str, Any]
+        Options of model, data and statistic.
+    """
+    return {
+        "source_type": args.source_type,
+        "concatenation_mode": args.concatenation_mode,
+        "data": args.data,
+        "statistic": args.statistic,
+    }
+
+
+def get_traversal_order(
+    shape: tuple[int, ...],
+    traversal: str = "product",
+    center: tuple[int, ...] | None = None,
+) -> NDArray:
+    """Get order of traversal of the grid created by `cartesian_product`.
+
+    Parameters
+    ----------
+    shape : tuple[int, ...]
+        Number of points along each axis.
+    traversal : str
+        Type of traversal:
+          - `product`: order of `itertools.product`;
+          - `serpentine`: order of `itertools.product`, where direction along every axis
+            is reversed after each step along previous axes, so consecutive points are neighbors;
+          - `spiral`: rings of points around `center` outwards. Within ring of 2d grid
+            points are ordered by angle, of N-d grid in `serpentine` order over all the axes.
+    center : tuple[int, ...], optional
+        Indices of the start point of `spiral` traversal.
+
+    Returns
+    -------
+    NDArray
+        Array of indices of points of the grid.
+    """
+    indices = np.indices(shape).reshape(len(shape), -1).T
+    match traversal:
+        case "product":
+            return np.arange(indices.shape[0])
+        case "serpentine":
+            keys = indices.copy()
+            for axis in range(1, len(shape)):
+                odd = indices[:, :axis].sum(axis=1) % 2 == 1
+                keys[odd, axis] = shape[axis] - 1 - indices[odd, axis]
+            return np.lexsort(keys.T[::-1])
+        case "spiral":
+            shift = indices - np.asarray(center)
+            ring = np.abs(shift).max(axis=1)
+            if len(shape) > 2:
+                rank = np.argsort(get_traversal_order(shape, "serpentine"))
+                return np.lexsort((rank, ring))
+            angle = np.arctan2(shift[:, -1], shift[:, 0])
+            return np.lexsort((angle, ring))
+        case _:
+            raise RuntimeError(f"Traversal `{traversal}` is not supported")
+
+
+def get_traversal_batches(
+    shape: tuple[int, ...],
+    traversal: str = "product",
+    center: tuple[int, ...] | None = None,
+    batch_size: int = 4096,
+) -> Iterator[NDArray]:
+    """Get batches of indices of points in order of traversal of the grid.
+
+    Order of `product` and `serpentine` traversals is calculated for each batch,
+    so indices of the whole grid are not created. Order of `spiral` traversal
+    requires sorting of the whole grid, see `get_traversal_order`.
+
+    Parameters
+    ----------
+    shape : tuple[int, ...]
+        Number of points along each axis.
+    traversal : str
+        Type of traversal, see `get_traversal_order`.
+    center : tuple[int, ...], optional
+        Indices of the start point of `spiral` traversal.
+    batch_size : int
+        Number of points in a batch.
+
+    Yields
+    ------
+    NDArray
+        Array of indices of points of the batch.
+    """
+    size = int(np.prod(shape))
+    order = get_traversal_order(shape, traversal, center) if traversal == "spiral" else None
+    for start in range(0, size, batch_size):
+        steps = np.arange(start, min(start + batch_size, size))
+        match traversal:
+            case "product":
+                yield steps
+            case "serpentine":
+                # Position of the step in order of `itertools.product` with reversed axes
+                indices = np.stack(np.unravel_index(steps, shape))
+                for axis in range(1, len(shape)):
+                    odd = indices[:axis].sum(axis=0) % 2 == 1
+                    indices[axis, odd] = shape[axis] - 1 - indices[axis, odd]
+                yield np.ravel_multi_index(indices, shape)
+            case "spiral":
+                yield order[steps]
+            case _:
+                raise RuntimeError(f"Traversal `{traversal}` is not supported")
+
+
+class ScanStore:
+    """SQLite store of profiled points of the scan.
+
+    Each point is written right after its fit, so the scan could be resumed
+    after a crash. Several processes could append to the same store. Points
+    with failed fits are fitted again on resume, the new result replaces them.
+
+    Parameters
+    ----------
+    filename : str
+        Path to SQLite file.
+    resume : bool
+        Continue the scan from existing file, otherwise the file must not exist.
+    """
+
+    __slots__ = ("filename", "_connection")
 
-    parameters_free = storage["parameters.free"]
-    parameters_constrained = storage["parameters.constrained"]
-    statistic = storage["outputs.statistic"]
-
-    stat_chi2 = statistic[f"{args.statistic}"]
-    minimization_parameters: dict[str, Parameter] = {}
-    update_dict_parameters(minimization_parameters, args.free_parameters, parameters_free)
-    if "covmat" not in args.statistic:
-        update_dict_parameters(
-            minimization_parameters,
-            args.constrained_parameters,
-            parameters_constrained,
+    def __init__(self, filename: str, resume: bool = False):
+        if not resume and os.path.exists(filename):
+            raise RuntimeError(
+                f"Store `{filename}` already exists, use `--resume` to continue scan"
+            )
+        self.filename = filename
+        self._connection = sqlite3.connect(filename, timeout=600)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS options (options TEXT);
+            CREATE TABLE IF NOT EXISTS scans (name TEXT PRIMARY KEY, parameters TEXT);
+            CREATE TABLE IF NOT EXISTS points (
+                scan TEXT,
+                coordinates BLOB,
+                chi2 REAL,
+                success INTEGER,
+                nfev INTEGER,
+                nuisance BLOB,
+                PRIMARY KEY (scan, coordinates)
+            );
+            """)
+
+    def register_options(self, options: dict[str, Any]) -> None:
+        """Register options of the scan, which change chi-squared function.
+
+        Raises
+        ------
+        RuntimeError
+            If points were stored with other options.
+        """
+        with self._connection:
+            if self._connection.execute("SELECT options FROM options").fetchone() is None:
+                self._connection.execute("INSERT INTO options VALUES (?)", (json_dumps(options),))
+        (stored,) = self._connection.execute("SELECT options FROM options").fetchone()
+        if stored != json_dumps(options):
+            raise RuntimeError(f"Scan in `{self.filename}` was stored with other options: {stored}")
+
+    def register(self, scan: str, parameters: list[str]) -> None:
+        """Register scan with names of scanned and fitted parameters.
+
+        Raises
+        ------
+        RuntimeError
+            If scan was stored with other parameters.
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO scans VALUES (?, ?)", (scan, json_dumps(parameters))
+            )
+        (stored,) = self._connection.execute(
+            "SELECT parameters FROM scans WHERE name = ?", (scan,)
+        ).fetchone()
+        if stored != json_dumps(parameters):
+            raise RuntimeError(f"Scan `{scan}` in `{self.filename}` has other parameters: {stored}")
+
+    def append(self, scan: str, coordinates: NDArray, fit: dict[str, Any]) -> None:
+        """Write result of the fit in the point of the scan."""
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    scan,
+                    np.asarray(coordinates, dtype=np.float64).tobytes(),
+                    float(fit["fun"]),
+                    int(fit["success"]),
+                    int(fit["nfev"]),
+                    np.asarray(fit["x"], dtype=np.float64).tobytes(),
+                ),
+            )
+
+    def get(self, scan: str, coordinates: NDArray) -> tuple[float, bool, int, NDArray] | None:
+        """Read chi-squared, fit status, number of function evaluations
+        and fitted values of parameters in the point, if it was stored."""
+        row = self._connection.execute(
+            "SELECT chi2, success, nfev, nuisance FROM points WHERE scan = ? AND coordinates = ?",
+            (scan, np.asarray(coordinates, dtype=np.float64).tobytes()),
+        ).fetchone()
+        if row is None:
+            return None
+        chi2, success, nfev, nuisance = row
+        return chi2, bool(success), nfev, np.frombuffer(nuisance, dtype=np.float64)
+
+    def load(self, scan: str, grid: NDArray) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+        """Read chi-squared, number of function evaluations, fitted values
+        of parameters and fit status in points of the grid.
+
+        Raises
+        ------
+        RuntimeError
+            If any point was not stored.
+        """
+        chi2_map = np.zeros(grid.shape[0])
+        nfev = np.zeros(grid.shape[0], dtype=int)
+        success = np.zeros(grid.shape[0], dtype=bool)
+        fitted_values = []
+        for idx, grid_values in enumerate(grid):
+            point = self.get(scan, grid_values)
+            if point is None:
+                raise RuntimeError(f"Point {grid_values} of scan `{scan}` is not stored")
+            chi2_map[idx], success[idx], nfev[idx], nuisance = point
+            fitted_values.append(nuisance)
+        return chi2_map, nfev, np.array(fitted_values), success
+
+
+def scan_grid(
+    minimizer: IMinuitMinimizer,
+    grid_vector: ParametersVector,
+    grid: NDArray,
+    indices: NDArray | None = None,
+    store: ScanStore | None = None,
+    scan: str = "2d",
+    initial_values: NDArray | None = None,
+    ncall: int | None = None,
+    model=None,
+    n_iterations: int = 0,
+    profiled: tuple[NDArray, NDArray] | None = None,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Fit in each point of the grid.
+
+    Every fit starts from initial values of minimizer or, if indices of points
+    are passed, from the fitted values of the nearest already profiled point
+    of the grid or of points profiled before.
+    Explicit initial values of points take precedence over both.
+    If store is passed, results are appended to it and points, which are already
+    stored with successful fits, are not fitted again.
+
+    Parameters
+    ----------
+    minimizer : IMinuitMinimizer
+        Minimizer of parameters that are not scanned.
+    grid_vector : ParametersVector
+        Binding of scanned parameters.
+    grid : NDArray
+        Points of the grid, `(number of points)x(number of scanned parameters)`.
+    indices : NDArray, optional
+        Indices of points along axes of the grid, the same shape as grid.
+        Distance between points is measured in indices.
+    store : ScanStore, optional
+        Store of profiled points.
+    scan : str
+        Name of the scan in the store.
+    initial_values : NDArray, optional
+        Initial values of parameters of minimizer in each point,
+        `(number of points)x(number of parameters of minimizer)`.
+    ncall : int, optional
+        Maximal number of function evaluations of the first fit in each point, see `do_fit`.
+        Suits fits, which start close to the minimum.
+    model : model_dayabay, optional
+        Object of model, required for iterative statistics.
+    n_iterations : int
+        Maximal number of refits of iterative statistics in each point, see `do_fit`.
+    profiled : tuple[NDArray, NDArray], optional
+        Indices and fitted values of points profiled before, e.g. of the previous batch,
+        so the first point of the grid starts from the nearest of them too.
+
+    Returns
+    -------
+    tuple[NDArray, NDArray, NDArray, NDArray]
+        Values of chi-squared function, number of function evaluations,
+        fitted values of parameters of minimizer and fit status in points of the grid.
+    """
+    fitted_vector = ParametersVector(dict(zip(minimizer.parameters_names, minimizer.parameters)))
+    fitted_values = np.zeros((grid.shape[0], len(fitted_vector)))
+    chi2_map = np.zeros(grid.shape[0])
+    nfev = np.zeros(grid.shape[0], dtype=int)
+    success = np.zeros(grid.shape[0], dtype=bool)
+    for idx, grid_values in enumerate(grid):
+        if store is not None and (point := store.get(scan, grid_values)) is not None:
+            if point[1]:
+                chi2_map[idx], success[idx], nfev[idx], fitted_values[idx] = point
+                logger.info(f"Point {grid_values}: chi2={chi2_map[idx]:.6f}, loaded from store")
+                continue
+            logger.info(f"Point {grid_values}: fit in store failed, fit again")
+        minimizer.push_initial_values()
+        if initial_values is not None:
+            fitted_vector.set(initial_values[idx])
+        elif indices is not None:
+            start_indices, start_values = indices[:idx], fitted_values[:idx]
+            if profiled is not None:
+                start_indices = np.concatenate((profiled[0], start_indices))
+                start_values = np.concatenate((profiled[1], start_values))
+            if start_indices.shape[0]:
+                distance = np.square(start_indices - indices[idx]).sum(axis=1)
+                fitted_vector.set(start_values[distance.argmin()])
+        grid_vector.set(grid_values)
+        fit = do_fit(minimizer, model, n_iterations, ncall=ncall)
+        # Evaluations of all the refits of iterative statistics are counted
+        fit["nfev"] = fit.get("nfev_iterations", fit["nfev"])
+        fitted_values[idx] = fit["x"]
+        chi2_map[idx] = fit["fun"]
+        nfev[idx] = fit["nfev"]
+        success[idx] = fit["success"]
+        if store is not None:
+            store.append(scan, grid_values, fit)
+        logger.info(
+            f"Point {grid_values}: chi2={fit['fun']:.6f}, nfev={fit['nfev']}, "
+            f"success={fit['success']}"
         )
-    elif args.constrained_parameters:
-        raise Exception(f"Statistic {args.statistic} can not be used with constrained parameters")
+    minimizer.push_initial_values()
+    return chi2_map, nfev, fitted_values, success
+
+
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(
+    args: Namespace, best_fit_values: dict[str, float], grid_parameters: list[str]
+) -> None:
+    """Build model and minimizer of the scan in the worker process.
+
+    Minimizers of 1d scans are created for each task, see `scan_profile`.
 
+    Model passes the same steps as in the main process: statistic is evaluated
+    in the initial point first, so the covariance matrix is the same.
+    """
+    model, stat_chi2, minimization_parameters = initialize_model(args)
+    stat_chi2.data
+    model.set_parameters(best_fit_values)
+    model.next_sample(mc_parameters=False, mc_statistics=False)
+    # Covariance matrix of iterative statistics is updated in the global best fit,
+    # as by `do_fit` in the main process
+    if args.n_iterations:
+        update_fixed_covariance(model, args.statistic)
+    _worker_state["args"] = args
+    _worker_state["model"] = model
+    _worker_state["n_iterations"] = args.n_iterations
+    _worker_state["stat_chi2"] = stat_chi2
+    _worker_state["parameters"] = minimization_parameters
+    _worker_state["best_fit_values"] = best_fit_values
+    _worker_state["minimizer"] = IMinuitMinimizer(
+        stat_chi2,
+        parameters={
+            name: parameter
+            for name, parameter in minimization_parameters.items()
+            if name not in grid_parameters
+        },
+    )
+    _worker_state["grid_vector"] = ParametersVector(
+        {parameter: minimization_parameters[parameter] for parameter in grid_parameters}
+    )
+    _worker_state["store"] = ScanStore(args.store, resume=True) if args.store else None
+    _worker_state["scan"] = f"{len(grid_parameters)}d"
+
+
+def _scan_grid_worker(
+    grid: NDArray, indices: NDArray | None, profiled: tuple[NDArray, NDArray] | None
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Scan tile of the grid within minimizer of the worker process."""
+    return scan_grid(
+        _worker_state["minimizer"],
+        _worker_state["grid_vector"],
+        grid,
+        indices,
+        store=_worker_state["store"],
+        scan=_worker_state["scan"],
+        model=_worker_state["model"],
+        n_iterations=_worker_state["n_iterations"],
+        profiled=profiled,
+    )
+
+
+def scan_profile(
+    model,
+    stat_chi2: Output,
+    minimization_parameters: dict[str, Parameter],
+    best_fit_values: dict[str, float],
+    parameter: str,
+    grid: NDArray,
+    indices: NDArray | None = None,
+    *,
+    store: ScanStore | None = None,
+    initial_values: NDArray | None = None,
+    ncall: int | None = None,
+    n_iterations: int = 0,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Fit in points of 1d grid of the parameter, the other parameters are fitted.
+
+    Parameters are set to the global best fit before the scan, so the result does not
+    depend on previous scans of the process.
+
+    Parameters
+    ----------
+    model : model_dayabay
+        Object of model.
+    stat_chi2 : Output
+        Chi-squared function.
+    minimization_parameters : dict[str, Parameter]
+        Parameters of the global fit.
+    best_fit_values : dict[str, float]
+        Values of parameters in the global best fit.
+    parameter : str
+        Name of scanned parameter.
+    grid : NDArray
+        Points of the grid, `(number of points)x1`.
+    indices : NDArray, optional
+        Indices of points of the grid, see `scan_grid`.
+    store : ScanStore, optional
+        Store of profiled points, scan is named `1d.<parameter>`.
+    initial_values : NDArray, optional
+        Initial values of the other parameters in each point, see `scan_grid`.
+    ncall : int, optional
+        Maximal number of function evaluations of the first fit, see `scan_grid`.
+    n_iterations : int
+        Maximal number of refits of iterative statistics, see `scan_grid`.
+
+    Returns
+    -------
+    tuple[NDArray, NDArray, NDArray, NDArray]
+        Values of chi-squared function, number of function evaluations,
+        fitted values of the other parameters and fit status in points of the grid.
+    """
+    model.set_parameters(best_fit_values)
     model.next_sample(mc_parameters=False, mc_statistics=False)
+    minimizer = IMinuitMinimizer(
+        stat_chi2,
+        parameters={
+            name: value for name, value in minimization_parameters.items() if name != parameter
+        },
+    )
+    grid_vector = ParametersVector({parameter: minimization_parameters[parameter]})
+    return scan_grid(
+        minimizer,
+        grid_vector,
+        grid,
+        indices,
+        store=store,
+        scan=f"1d.{parameter}",
+        initial_values=initial_values,
+        ncall=ncall,
+        model=model,
+        n_iterations=n_iterations,
+    )
+
+
+def _scan_profile_worker(
+    parameter: str, grid: NDArray, indices: NDArray | None, initial_values: NDArray | None
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Scan tile of 1d grid of the parameter within model of the worker process."""
+    state = _worker_state
+    args = state["args"]
+    return scan_profile(
+        state["model"],
+        state["stat_chi2"],
+        state["parameters"],
+        state["best_fit_values"],
+        parameter,
+        grid,
+        indices,
+        store=state["store"],
+        initial_values=initial_values,
+        ncall=args.scan_1d_ncall if args.scan_1d_from_2d else None,
+        n_iterations=args.n_iterations,
+    )
+
+
+def scan_tiles(
+    executor: ProcessPoolExecutor,
+    jobs: int,
+    grid: NDArray,
+    indices: NDArray | None = None,
+    profiled: tuple[NDArray, NDArray] | None = None,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Split the grid into tiles and scan them in worker processes.
+
+    Grid is split into several tiles per worker to balance the load,
+    points of each tile are profiled in the passed order. The first point
+    of each tile starts from the nearest of points profiled before.
+
+    Parameters
+    ----------
+    executor : ProcessPoolExecutor
+        Executor with workers initialized by `_initialize_worker`.
+    jobs : int
+        Number of worker processes.
+    grid : NDArray
+        Points of the grid, `(number of points)x(number of scanned parameters)`.
+    indices : NDArray, optional
+        Indices of points along axes of the grid, see `scan_grid`.
+    profiled : tuple[NDArray, NDArray], optional
+        Indices and fitted values of points profiled before, see `scan_grid`.
+
+    Returns
+    -------
+    tuple[NDArray, NDArray, NDArray, NDArray]
+        Values of chi-squared function, number of function evaluations,
+        fitted values of parameters and fit status in points of the grid.
+    """
+    ntiles = min(jobs * 4, grid.shape[0])
+    results = list(
+        executor.map(
+            _scan_grid_worker,
+            np.array_split(grid, ntiles),
+            (
+                np.array_split(indices, ntiles)
+                if indices is not None
+                else itertools.repeat(None, ntiles)
+            ),
+            itertools.repeat(profiled, ntiles),
+        )
+    )
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def _get_refined_points(grids: list[NDArray], indices: NDArray, step: int) -> NDArray:
+    """Convert indices of the grid refined `step` times to values of parameters."""
+    return np.stack(
+        [
+            grid[0] + index / step * (grid[-1] - grid[0]) / (grid.size - 1)
+            for grid, index in zip(grids, indices.T)
+        ],
+        axis=1,
+    )
+
+
+def refine_grid(
+    scan: Callable[..., tuple[NDArray, NDArray, NDArray, NDArray]],
+    grids: list[NDArray],
+    chi2_map: NDArray,
+    nfev_map: NDArray,
+    success_map: NDArray,
+    levels: NDArray,
+    depth: int,
+    warm_start: bool = False,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Refine the grid created by `cartesian_product` near contours.
+
+    Each cell of the grid, whose values of chi-squared in corners straddle
+    any of the levels, is split in halves along every axis. New points are
+    profiled and procedure is repeated for new cells `depth` times. Contours,
+    that are placed within a single cell, are not found.
+
+    Parameters
+    ----------
+    scan : Callable[..., tuple[NDArray, NDArray, NDArray, NDArray]]
+        Function that profiles points, see `scan_grid`.
+    grids : list[NDArray]
+        Arrays of the coarse grid along each axis.
+    chi2_map : NDArray
+        Values of chi-squared function in points of the coarse grid.
+    nfev_map : NDArray
+        Number of function evaluations in points of the coarse grid.
+    success_map : NDArray
+        Status of fits in points of the coarse grid.
+    levels : NDArray
+        Values of chi-squared function of contours.
+    depth : int
+        Number of subdivisions of cells.
+    warm_start : bool
+        Start each fit from the nearest profiled point of the same or previous subdivision.
+
+    Returns
+    -------
+    tuple[NDArray, NDArray, NDArray, NDArray]
+        Scattered points, values of chi-squared function, number of function evaluations
+        and status of fits in them.
+    """
+    ndim = len(grids)
+    step = 2**depth
+    shape = np.array([grid.size for grid in grids])
+    # Points are labelled by indices of the finest grid
+    indices = np.indices(shape).reshape(ndim, -1).T * step
+    values = {
+        tuple(index): (chi2, nfev, success)
+        for index, chi2, nfev, success in zip(indices, chi2_map, nfev_map, success_map)
+    }
+    corners = np.array(list(itertools.product((0, 1), repeat=ndim)))
+    cells = indices[(indices < (shape - 1) * step).all(axis=1)]
+    profiled = None
+    for level in range(depth):
+        size = step >> level
+        chi2_corners = np.array(
+            [[values[tuple(cell + size * corner)][0] for corner in corners] for cell in cells]
+        )
+        straddle = (chi2_corners.min(axis=1, keepdims=True) < levels) & (
+            levels < chi2_corners.max(axis=1, keepdims=True)
+        )
+        cells = cells[straddle.any(axis=1)]
+        cells = (cells[:, None, :] + size // 2 * corners).reshape(-1, ndim)
+        new_indices = np.unique((cells[:, None, :] + size // 2 * corners).reshape(-1, ndim), axis=0)
+        new_indices = new_indices[[tuple(index) not in values for index in new_indices]]
+        logger.info(
+            f"Refinement {level + 1}: {cells.shape[0] // len(corners)} cells straddle contours, "
+            f"{new_indices.shape[0]} new points"
+        )
+        if not new_indices.shape[0]:
+            break
+        new_grid = _get_refined_points(grids, new_indices, step)
+        chi2_new, nfev_new, fitted_new, success_new = scan(
+            new_grid, new_indices if warm_start else None, profiled=profiled
+        )
+        if warm_start:
+            profiled = (new_indices[success_new], fitted_new[success_new])
+        values.update(
+            (tuple(index), (chi2, nfev, success))
+            for index, chi2, nfev, success in zip(new_indices, chi2_new, nfev_new, success_new)
+        )
+
+    indices = np.array(sorted(values))
+    chi2_points, nfev_points, success_points = np.array(
+        [values[tuple(index)] for index in indices]
+    ).T
+    points = _get_refined_points(grids, indices, step)
+    return points, chi2_points, nfev_points.astype(int), success_points.astype(bool)
+
+
+def main(args: Namespace) -> None:
+    model, stat_chi2, minimization_parameters = initialize_model(args)
+
     minimizer = IMinuitMinimizer(stat_chi2, parameters=minimization_parameters, nbins=model.nbins)
-    global_fit = minimizer.fit()
+    global_fit = do_fit(minimizer, model, args.n_iterations)
     pprint(global_fit)
     bf_x_dict = global_fit["xdict"]
     model.set_parameters(bf_x_dict)
 
-    parameters, grids, xy_grid = cartesian_product(args.scan_par)
+    parameters, grids = cartesian_product(args.scan_par)
     grid_parameters = []
     minimization_parameters_2d = minimization_parameters.copy()
     for parameter in parameters:
         minimization_parameters_2d.pop(parameter)
         grid_parameters.append(parameter)
+    ndim = len(grid_parameters)
+    scan_name = f"{ndim}d"
+
+    store = ScanStore(args.store, resume=args.resume) if args.store else None
+    if store is not None:
+        store.register_options(get_store_options(args))
+        store.register(scan_name, grid_parameters + list(minimization_parameters_2d))
+
+    # Points are profiled in order of traversal. Except `product` traversal,
+    # each fit starts from the nearest already profiled point
+    shape = tuple(grid.size for grid in grids)
+    size = int(np.prod(shape))
+    center = tuple(np.abs(grid - bf_x_dict[name]).argmin() for name, grid in zip(parameters, grids))
 
     model.next_sample(mc_parameters=False, mc_statistics=False)
-    minimizer_scan_2d = IMinuitMinimizer(stat_chi2, parameters=minimization_parameters_2d)
-    chi2_map = np.zeros(xy_grid.shape[0])
-    for idx, grid_values in enumerate(xy_grid):
-        model.set_parameters(dict(zip(grid_parameters, grid_values)))
-        fit = minimizer_scan_2d.fit()
-        minimizer_scan_2d.push_initial_values()
-        chi2_map[idx] = fit["fun"]
+    # Fitted values are kept only to start 1d scans from the map
+    nfitted = len(minimization_parameters_2d) if args.scan_1d_from_2d else 0
+    initial_values_1d = {}
+    tiles_1d, results_1d = [], []
+    with ExitStack() as stack:
+        if args.jobs > 1:
+            executor = stack.enter_context(
+                ProcessPoolExecutor(
+                    max_workers=args.jobs,
+                    initializer=_initialize_worker,
+                    initargs=(args, bf_x_dict, grid_parameters),
+                )
+            )
+            scan = partial(scan_tiles, executor, args.jobs)
+        else:
+            minimizer_scan_2d = IMinuitMinimizer(stat_chi2, parameters=minimization_parameters_2d)
+            grid_vector = ParametersVector(
+                {parameter: minimization_parameters[parameter] for parameter in grid_parameters}
+            )
+            scan = partial(
+                scan_grid,
+                minimizer_scan_2d,
+                grid_vector,
+                store=store,
+                scan=scan_name,
+                model=model,
+                n_iterations=args.n_iterations,
+            )
+        # N-d map is kept in memory only without `--output-map`
+        grid_map = None
+        if args.output_map:
+            grid_map = stack.enter_context(
+                create_map_file(args.output_map, grid_parameters, grids, nfitted)
+            )
+            grid_map.attrs["best_fit_fun"] = global_fit["fun"]
+            chi2_map, nfev_map = grid_map["chi2"], grid_map["nfev"]
+            success_map, fitted_map = grid_map["success"], grid_map.get("fitted")
+        else:
+            chi2_map = np.full(shape, np.nan)
+            nfev_map = np.zeros(shape, dtype=int)
+            success_map = np.zeros(shape, dtype=bool)
+            fitted_map = np.zeros((*shape, nfitted)) if nfitted else None
+
+        # Points are created from indices by batches, each batch is saved right after scan
+        profiled = None
+        for batch in get_traversal_batches(shape, args.traversal, center, args.batch_size):
+            positions = np.stack(np.unravel_index(batch, shape), axis=1)
+            points = get_grid_points(grids, batch)
+            chi2_batch, nfev_batch, fitted_batch, success_batch = scan(
+                points, positions if args.traversal != "product" else None, profiled=profiled
+            )
+            if store is not None:
+                chi2_batch, nfev_batch, fitted_batch, success_batch = store.load(scan_name, points)
+            if grid_map is not None:
+                save_map_points(
+                    grid_map,
+                    batch,
+                    chi2_batch,
+                    nfev_batch,
+                    success_batch,
+                    fitted_batch if nfitted else None,
+                )
+            else:
+                chi2_map.flat[batch], nfev_map.flat[batch] = chi2_batch, nfev_batch
+                success_map.flat[batch] = success_batch
+                if fitted_map is not None:
+                    fitted_map.reshape(size, nfitted)[batch] = fitted_batch
+            # The first points of the next batch start from the nearest points of this one
+            if args.traversal != "product":
+                profiled = (positions[success_batch], fitted_batch[success_batch])
+
+        # 2d map is saved as a whole, points of the coarse grid are kept for profiles,
+        # refined points are scattered. N-d map is profiled to the first two parameters
+        # chunk by chunk, profiled point is successful if all fits over other axes are
+        if ndim == 2:
+            chi2_coarse, nfev_coarse = chi2_map[...].ravel(), nfev_map[...].ravel()
+            success_coarse = success_map[...].ravel()
+            points = get_grid_points(grids, np.arange(size))
+            chi2_points, nfev_points, success_points = chi2_coarse, nfev_coarse, success_coarse
+        else:
+            chi2_points = get_profile_of_map(chi2_map, grid_parameters, grid_parameters[:2]).ravel()
+            points = get_grid_points(grids[:2], np.arange(chi2_points.size))
+            nfev_points = get_profile_of_map(
+                nfev_map, grid_parameters, grid_parameters[:2], reduce=np.add
+            ).ravel()
+            success_points = get_profile_of_map(
+                success_map, grid_parameters, grid_parameters[:2], reduce=np.logical_and
+            ).ravel()
+            chi2_profiles = {
+                parameter: get_profile_of_map(chi2_map, grid_parameters, [parameter])
+                for parameter in grid_parameters
+            }
+        success_map_1d = {
+            parameter: get_profile_of_map(
+                success_map, grid_parameters, [parameter], reduce=np.logical_and
+            )
+            for parameter in grid_parameters
+        }
+        npoints = size
+        if args.adaptive_depth:
+            levels = global_fit["fun"] + convert_sigmas_to_chi2(ndim, args.adaptive_sigmas)
+            points, chi2_points, nfev_points, success_points = refine_grid(
+                scan,
+                grids,
+                chi2_coarse,
+                nfev_coarse,
+                success_coarse,
+                levels,
+                args.adaptive_depth,
+                warm_start=args.traversal != "product",
+            )
+            if store is not None:
+                chi2_points, nfev_points, _, success_points = store.load(scan_name, points)
+            npoints = chi2_points.size
+
+        if args.scan_1d_from_2d:
+            for parameter in grid_parameters:
+                initial_values_1d[parameter] = get_initial_values_from_map(
+                    grids,
+                    chi2_map,
+                    fitted_map,
+                    grid_parameters,
+                    list(minimization_parameters_2d),
+                    parameter,
+                    [name for name in minimization_parameters if name != parameter],
+                )
+
+        logger.info(
+            f"Number of function evaluations in {ndim}d scan: {nfev_points.sum()}, "
+            f"number of points: {npoints}"
+        )
+        if not success_points.all():
+            logger.warning(
+                f"Fits failed in {np.count_nonzero(~success_points)} of {success_points.size} "
+                f"points of {ndim}d scan, they are fitted again on `--resume` with `--store`"
+            )
+
+        # 1d scans are split into tiles of traversal order, with `--jobs` tiles are
+        # profiled by the same worker processes as the map
+        if args.scan_1d or args.scan_1d_from_2d:
+            for parameter, grid_1d, center_1d in zip(grid_parameters, grids, center):
+                order_1d = get_traversal_order(grid_1d.shape, args.traversal, (center_1d,))
+                if store is not None:
+                    store.register(
+                        f"1d.{parameter}",
+                        [parameter]
+                        + [name for name in minimization_parameters if name != parameter],
+                    )
+                ntiles = min(args.jobs, grid_1d.size)
+                tiles_1d.extend((parameter, tile) for tile in np.array_split(order_1d, ntiles))
+            tasks_1d = [
+                (
+                    parameter,
+                    grids[grid_parameters.index(parameter)][tile, None],
+                    tile[:, None] if args.traversal != "product" else None,
+                    initial_values_1d[parameter][tile] if args.scan_1d_from_2d else None,
+                )
+                for parameter, tile in tiles_1d
+            ]
+            if args.jobs > 1:
+                results_1d = list(executor.map(_scan_profile_worker, *zip(*tasks_1d)))
+            else:
+                results_1d = [
+                    scan_profile(
+                        model,
+                        stat_chi2,
+                        minimization_parameters,
+                        bf_x_dict,
+                        parameter,
+                        grid_1d,
+                        indices_1d,
+                        store=store,
+                        initial_values=initial_values,
+                        ncall=args.scan_1d_ncall if args.scan_1d_from_2d else None,
+                        n_iterations=args.n_iterations,
+                    )
+                    for parameter, grid_1d, indices_1d, initial_values in tasks_1d
+                ]
 
     chi2_map_1d: dict[str, NDArray | Any] = dict.fromkeys(grid_parameters)
-    if args.scan_1d:
+    if args.scan_1d or args.scan_1d_from_2d:
         for parameter, grid_1d in zip(grid_parameters, grids):
-            model.set_parameters(bf_x_dict)
-            model.next_sample(mc_parameters=False, mc_statistics=False)
             chi2_map_1d[parameter] = np.zeros_like(grid_1d)
-            minimization_parameters_1d = minimization_parameters.copy()
-            minimization_parameters_1d.pop(parameter)
-            minimizer_scan_1d = IMinuitMinimizer(stat_chi2, parameters=minimization_parameters_1d)
-            for idx, grid_value in enumerate(grid_1d):
-                model.set_parameters({parameter: grid_value})
-                fit = minimizer_scan_1d.fit()
-                minimizer_scan_1d.push_initial_values()
-                chi2_map_1d[parameter][idx] = fit["fun"]
-    else:
+            nfev_1d = np.zeros(grid_1d.size, dtype=int)
+            success_1d = np.zeros(grid_1d.size, dtype=bool)
+            for (name, tile), (chi2_tile, nfev_tile, _, success_tile) in zip(tiles_1d, results_1d):
+                if name == parameter:
+                    chi2_map_1d[parameter][tile], nfev_1d[tile] = chi2_tile, nfev_tile
+                    success_1d[tile] = success_tile
+            if store is not None:
+                chi2_map_1d[parameter], nfev_1d, _, success_1d = store.load(
+                    f"1d.{parameter}", grid_1d[:, None]
+                )
+            logger.info(
+                f"Number of function evaluations in 1d scan of {parameter}: {nfev_1d.sum()}"
+            )
+            if not success_1d.all():
+                logger.warning(
+                    f"Fits failed in {np.count_nonzero(~success_1d)} of {success_1d.size} "
+                    f"points of 1d scan of {parameter}, "
+                    "they are fitted again on `--resume` with `--store`"
+                )
+            success_map_1d[parameter] = success_1d
+    elif ndim == 2:
+        xy_grid = get_grid_points(grids, np.arange(size))
         parameter_x, parameter_y = grid_parameters
         best_fit_x = global_fit["xdict"][parameter_x]
         best_fit_y = global_fit["xdict"][parameter_y]
@@ -147,7 +1126,7 @@ def main(args: Namespace) -> None:
         grid_x, chi2_map_1d[parameter_x] = get_profile_of_chi2(
             xy_grid[:, 0],
             xy_grid[:, 1],
-            chi2_map,
+            chi2_coarse,
             best_fit_x,
             fun,
         )
@@ -155,29 +1134,38 @@ def main(args: Namespace) -> None:
         grid_y, chi2_map_1d[parameter_y] = get_profile_of_chi2(
             xy_grid[:, 1],
             xy_grid[:, 0],
-            chi2_map,
+            chi2_coarse,
             best_fit_y,
             fun,
         )
+    else:
+        # Profiles of N-d map are minimized over other axes
+        for parameter in grid_parameters:
+            chi2_map_1d[parameter] = chi2_profiles[parameter] - global_fit["fun"]
 
     if args.output:
-        parameter_x, parameter_y = grid_parameters
+        # The first two scanned parameters are saved, N-d map is profiled to 2d one
+        parameter_x, parameter_y = grid_parameters[:2]
         np.savez(
             args.output,
             **{
-                "chi2map2d": np.stack((*xy_grid.T, chi2_map), axis=1),
+                "chi2map2d": np.stack((*points.T, chi2_points), axis=1),
+                "nfev2d": np.stack((*points.T, nfev_points), axis=1),
+                "success2d": np.stack((*points.T, success_points), axis=1),
                 "chi2map1d_x": np.stack((grids[0], chi2_map_1d[parameter_x]), axis=1),
                 "chi2map1d_y": np.stack((grids[1], chi2_map_1d[parameter_y]), axis=1),
+                "success1d_x": np.stack((grids[0], success_map_1d[parameter_x]), axis=1),
+                "success1d_y": np.stack((grids[1], success_map_1d[parameter_y]), axis=1),
                 "best_fit_values": np.array(
                     [
                         (
-                            global_fit["xdict"][parameter_x],
-                            global_fit["xdict"][parameter_y],
+                            *(global_fit["xdict"][parameter] for parameter in grid_parameters),
                             global_fit["fun"],
                         )
                     ],
                     dtype=np.dtype(
-                        [(parameter_x, np.float64), (parameter_y, np.float64), ("fun", np.float64)]
+                        [(parameter, np.float64) for parameter in grid_parameters]
+                        + [("fun", np.float64)]
                     ),
                 ),
                 "best_fit_errors": global_fit.get("errorsdict_profiled", global_fit["errorsdict"]),
@@ -225,6 +1213,17 @@ if __name__ == "__main__":
         action="store_true",
         help="provide 1d profiling with minos algorithm",
     )
+    parser.add_argument(
+        "--scan-1d-from-2d",
+        action="store_true",
+        help="provide 1d profiling with fits started from the minimum of 2d map over other axis",
+    )
+    parser.add_argument(
+        "--scan-1d-ncall",
+        default=None,
+        type=int,
+        help="maximal number of function evaluations of each fit of `--scan-1d-from-2d`",
+    )
     parser.add_argument(
         "--statistic",
         default="full.pull.chi2cnp",
@@ -251,7 +1250,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "--n-iterations",
         default=0,
-        help="number of iterations of fit procedure, usefull only for iterative chi-squared",
+        type=int,
+        help="maximal number of refits of global fit and fits in points of the grid, usefull only for iterative chi-squared",
+    )
+    parser.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="Directory to cache Jacobians of systematic covariance matrix for `full.covmat.*` statistics",
     )
     parser.add_argument(
         "--free-parameters",
@@ -265,11 +1270,65 @@ if __name__ == "__main__":
         nargs="*",
         help="Add constrained parameters to minimization process",
     )
+    parser.add_argument(
+        "--traversal",
+        default="product",
+        choices=["product", "serpentine", "spiral"],
+        help="Order of profiling of points of the grid, "
+        "serpentine and spiral start fit from the nearest profiled point",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of worker processes for N-d and 1d scans, each worker builds its own model",
+    )
+    parser.add_argument(
+        "--adaptive-depth",
+        default=0,
+        type=int,
+        help="Number of subdivisions of cells of the grid, which straddle contours, "
+        "the 2d map is saved as scattered points",
+    )
+    parser.add_argument(
+        "--adaptive-sigmas",
+        default=[1, 2, 3],
+        type=float,
+        nargs="+",
+        help="Levels of contours for --adaptive-depth in terms of standard deviations",
+    )
+    parser.add_argument(
+        "--batch-size",
+        default=4096,
+        type=int,
+        help="Number of points of the grid, which are created and profiled at once",
+    )
+    parser.add_argument(
+        "--output-map",
+        default=None,
+        help="Path to HDF5 file to save N-d map, points are saved after each batch",
+    )
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="Path to SQLite file, where each profiled point is saved right after its fit",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the scan from --store, stored points are not fitted again",
+    )
     parser.add_argument(
         "--output",
         help="path to save contour data, supports npz",
     )
 
     args = parser.parse_args()
+    if args.resume and not args.store:
+        parser.error("--resume requires --store")
+    if len(args.scan_par) < 2:
+        parser.error("--scan-par should be used at least twice")
+    if args.adaptive_depth and len(args.scan_par) != 2:
+        parser.error("--adaptive-depth supports only 2d scan")
 
     main(args)
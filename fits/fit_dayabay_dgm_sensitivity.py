@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+r"""Fit Asimov data generated in true points of parameters to study sensitivity.
+
+The model is built once in each worker process. In each true point Asimov data
+is generated with parameters set to the point, then parameters are fitted starting
+from nominal values. Best fit values, errors and, optionally, profiled errors of all
+the points are saved into a single table.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./fits/fit_dayabay_dgm_sensitivity.py \
+        --free-parameters survival_probability neutrino_per_fission_factor \
+        --constrained-parameters detector reactor background \
+        --true-par survival_probability.SinSq2Theta13 0.075 0.095 5 \
+        --true-par survival_probability.DeltaMSq32 2.4e-3 2.6e-3 5 \
+        --profile-parameters survival_probability.SinSq2Theta13 survival_probability.DeltaMSq32 \
+        --jobs 4 \
+        --output sensitivity.hdf5
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentTypeError, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import h5py
+import numpy as np
+import pandas as pd
+from dag_modelling.tools.logger import logger
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import (
+    ParametersVector,
+    create_model,
+    do_fit,
+    update_covariance_matrix_cached,
+    update_fixed_covariance,
+)
+from fits.fit_dayabay_dgm_chi2map import cartesian_product, get_grid_points
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+
+def load_true_points(args: Namespace) -> tuple[list[str], NDArray]:
+    """Get true points from grid of `--true-par` or from file of `--true-points`.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+
+    Returns
+    -------
+    tuple[list[str], NDArray]
+        Names of parameters and array of points, one point per row.
+    """
+    if args.true_points:
+        points = pd.read_csv(args.true_points)
+        return list(points.columns), points.to_numpy(dtype=np.float64)
+    parameters, grids = cartesian_product(args.true_par)
+    size = int(np.prod([grid.size for grid in grids]))
+    return parameters, get_grid_points(grids, np.arange(size))
+
+
+TABLE_FORMATS = ("hdf5", "csv")
+
+
+def check_table_filename(filename: str) -> str:
+    """Check format of table before fits, type of `--output` argument.
+
+    Raises
+    ------
+    ArgumentTypeError
+        If format of table is not supported.
+    """
+    *_, ext = filename.split(".")
+    if ext not in TABLE_FORMATS:
+        raise ArgumentTypeError(
+            f"couldn't save table to `.{ext}`-type, supports: {', '.join(TABLE_FORMATS)}"
+        )
+    return filename
+
+
+def save_table(table: pd.DataFrame, filename: str) -> None:
+    """Save table of fits, each column is saved to a separate dataset of `hdf5`.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Table of fits, one row per true point.
+    filename : str
+        Path to save table, supports: `hdf5`, `csv`.
+
+    Returns
+    -------
+    None
+    """
+    *rootparts, ext = filename.split(".")
+    match ext:
+        case "hdf5":
+            with h5py.File(filename, "w") as f:
+                for column in table.columns:
+                    f.create_dataset(column, data=table[column].to_numpy())
+        case "csv":
+            table.to_csv(filename, index=False)
+        case _:
+            raise RuntimeError(f"Couldn't save table to `.{ext}`-type")
+
+
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(args: Namespace, true_parameters: list[str]) -> None:
+    """Build model, minimizer and bindings of parameters in the worker process."""
+    model, minimization_parameters = create_model(args)
+    storage = model.storage
+    model.switch_data("asimov")
+
+    vector = ParametersVector(minimization_parameters)
+    true_vector = ParametersVector(
+        {parameter: storage["parameters.all"][parameter] for parameter in true_parameters}
+    )
+    _worker_state.update(
+        args=args,
+        model=model,
+        minimizer=IMinuitMinimizer(
+            storage[f"outputs.statistic.{args.statistic}"], parameters=minimization_parameters
+        ),
+        vector=vector,
+        nominal=vector.values,
+        true_vector=true_vector,
+        true_nominal=true_vector.values,
+    )
+
+
+def _fit_points_worker(points: NDArray) -> list[dict[str, Any]]:
+    """Generate and fit Asimov data in true points within model of the worker process.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Rows of table, one per point.
+    """
+    state = _worker_state
+    args, model, minimizer = state["args"], state["model"], state["minimizer"]
+    vector, true_vector = state["vector"], state["true_vector"]
+
+    rows = []
+    for point in points:
+        vector.set(state["nominal"])
+        true_vector.set(point)
+        # Asimov data is frozen, it is regenerated from the prediction in the true point
+        model.next_sample(mc_parameters=False, mc_statistics=True)
+        # Fixed statistical errors and systematic covariance matrix are calculated
+        # in the true point too, as for the model built with `--par`
+        if args.covariance_cache and "covmat" in args.statistic:
+            model.storage["nodes.covariance.data.fixed"].next_sample()
+            update_covariance_matrix_cached(
+                model,
+                {"source_type": args.source_type, "concatenation_mode": args.concatenation_mode},
+                args.covariance_cache,
+            )
+        else:
+            update_fixed_covariance(model, args.statistic)
+        true_vector.set(state["true_nominal"])
+        vector.set(state["nominal"])
+
+        fit = do_fit(minimizer, model, "iterative" in args.statistic)
+        row: dict[str, Any] = {
+            f"true.{name}": value for name, value in zip(true_vector.names, point)
+        }
+        row.update(chi2=fit["fun"], success=fit["success"], nfev=fit["nfev"])
+        row.update({f"fit.{name}": value for name, value in fit["xdict"].items()})
+        row.update({f"error.{name}": value for name, value in fit["errorsdict"].items()})
+        if args.profile_parameters:
+            errors_profiled = minimizer.profile_errors(args.profile_parameters)["errorsdict"]
+            for name in args.profile_parameters:
+                row[f"error_low.{name}"], row[f"error_up.{name}"] = errors_profiled.get(
+                    name, (np.nan, np.nan)
+                )
+        logger.info(f"True point {point}: chi2={fit['fun']:.6g}, success={fit['success']}")
+        rows.append(row)
+    vector.set(state["nominal"])
+    return rows
+
+
+def main(args: Namespace) -> None:
+    true_parameters, points = load_true_points(args)
+    chunks = [
+        points[start : start + args.chunk_size]
+        for start in range(0, points.shape[0], args.chunk_size)
+    ]
+    logger.info(f"Number of true points: {points.shape[0]}, number of tasks: {len(chunks)}")
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=_initialize_worker,
+        initargs=(args, true_parameters),
+    ) as executor:
+        rows = [row for chunk in executor.map(_fit_points_worker, chunks) for row in chunk]
+
+    table = pd.DataFrame(rows)
+    print(table.to_string(max_cols=8))
+    if args.output:
+        save_table(table, args.output)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--source-type",
+        default=None,
+        help="Source type of dataset loaded from dayabay-data-official",
+    )
+    parser.add_argument(
+        "--concatenation-mode",
+        default="detector_period",
+        choices=["detector", "detector_period"],
+        help="Choose type of concatenation for final observation: by detector or by detector and period",
+    )
+    truth = parser.add_mutually_exclusive_group(required=True)
+    truth.add_argument(
+        "--true-par",
+        nargs=4,
+        action="append",
+        help="linspace of true values of parameter, could be used several times",
+    )
+    truth.add_argument(
+        "--true-points",
+        help="Path to csv file with true points, header contains names of parameters",
+    )
+    parser.add_argument(
+        "--statistic",
+        default="full.pull.chi2cnp",
+        choices=[
+            "stat.chi2p_iterative",
+            "stat.chi2n",
+            "stat.chi2p",
+            "stat.chi2cnp",
+            "stat.chi2p_unbiased",
+            "stat.chi2poisson",
+            "full.covmat.chi2p_iterative",
+            "full.covmat.chi2n",
+            "full.covmat.chi2p",
+            "full.covmat.chi2p_unbiased",
+            "full.covmat.chi2cnp",
+            "full.pull.chi2p_iterative",
+            "full.pull.chi2p",
+            "full.pull.chi2cnp",
+            "full.pull.chi2p_unbiased",
+            "full.pull.chi2poisson",
+        ],
+        help="Choose chi-squared function for minimizer",
+    )
+    parser.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="Directory to cache Jacobians of systematic covariance matrix for `full.covmat.*` statistics",
+    )
+    parser.add_argument(
+        "--free-parameters",
+        default=[],
+        nargs="*",
+        help="Add free parameters to minimization process",
+    )
+    parser.add_argument(
+        "--constrained-parameters",
+        default=[],
+        nargs="*",
+        help="Add constrained parameters to minimization process",
+    )
+    parser.add_argument(
+        "--profile-parameters",
+        default=[],
+        nargs="*",
+        help="Choose parameters for Minos profiling in each point",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=1,
+        type=int,
+        help="Number of true points of a single task of worker",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of worker processes, each worker builds its own model",
+    )
+    parser.add_argument(
+        "--output",
+        type=check_table_filename,
+        help="Path to save table of fits, supports: hdf5, csv",
+    )
+
+    args = parser.parse_args()
+
+    main(args)
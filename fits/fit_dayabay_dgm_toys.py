@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+r"""Calculate distributions of :math:`\Delta\chi^2` with toy Monte-Carlo in points of the grid.
+
+In each point of the grid pseudo-experiments are generated with scanned parameters
+fixed in the point and the other parameters fitted to data. Each toy is fitted twice:
+with all the parameters free (global fit) and with scanned parameters fixed in the point.
+Difference of chi-squared values is used to calculate critical values of Feldman-Cousins
+construction and coverage of Wilks' theorem.
+
+Examples
+--------
+Example of call
+
+.. code-block:: shell
+
+    ./fits/fit_dayabay_dgm_toys.py \
+        --data real \
+        --free-parameters survival_probability neutrino_per_fission_factor \
+        --scan-par survival_probability.SinSq2Theta13 0.075 0.095 3 \
+        --scan-par survival_probability.DeltaMSq32 2.4e-3 2.6e-3 3 \
+        --statistic stat.chi2cnp \
+        --ntoys 1000 \
+        --jobs 4 \
+        --store toys.sqlite \
+        --output critical-chi2.npz
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from json import dumps as json_dumps
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from dag_modelling.tools.logger import logger
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+from numpy.random import MT19937, SeedSequence
+from scipy.stats import chi2
+
+from fits import ParametersVector, create_model
+from fits.fit_dayabay_dgm_chi2map import cartesian_product, get_grid_points
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+
+class ToyStore:
+    """Append-only SQLite store of fitted pseudo-experiments.
+
+    Each toy is written right after its fits, so the calculation could be
+    resumed. Several processes could append to the same store. Toys are keyed
+    by coordinates of the point, so the grid could be changed on resume.
+
+    Parameters
+    ----------
+    filename : str
+        Path to SQLite file.
+    """
+
+    __slots__ = ("filename", "_connection")
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._connection = sqlite3.connect(filename, timeout=600)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS options (options TEXT);
+            CREATE TABLE IF NOT EXISTS toys (
+                coordinates BLOB,
+                toy INTEGER,
+                chi2_global REAL,
+                chi2_point REAL,
+                success INTEGER,
+                nfev INTEGER,
+                best_fit BLOB,
+                PRIMARY KEY (coordinates, toy)
+            );
+            """)
+
+    def register(self, options: dict[str, Any]) -> None:
+        """Register options of the run, which change toys.
+
+        Raises
+        ------
+        RuntimeError
+            If toys were stored with other options.
+        """
+        with self._connection:
+            if self._connection.execute("SELECT options FROM options").fetchone() is None:
+                self._connection.execute("INSERT INTO options VALUES (?)", (json_dumps(options),))
+        (stored,) = self._connection.execute("SELECT options FROM options").fetchone()
+        if stored != json_dumps(options):
+            raise RuntimeError(f"Toys in `{self.filename}` are stored with other options: {stored}")
+
+    def append(
+        self, point: NDArray, toy: int, fit_global: dict[str, Any], fit_point: dict[str, Any]
+    ) -> None:
+        """Write results of global fit and fit in the point of the toy."""
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO toys VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    np.asarray(point, dtype=np.float64).tobytes(),
+                    toy,
+                    float(fit_global["fun"]),
+                    float(fit_point["fun"]),
+                    int(fit_global["success"] and fit_point["success"]),
+                    int(fit_global["nfev"] + fit_point["nfev"]),
+                    np.asarray(fit_global["x"], dtype=np.float64).tobytes(),
+                ),
+            )
+
+    def get_toys(self, point: NDArray) -> set[int]:
+        """Get indices of stored toys of the point."""
+        return {
+            toy
+            for (toy,) in self._connection.execute(
+                "SELECT toy FROM toys WHERE coordinates = ?",
+                (np.asarray(point, dtype=np.float64).tobytes(),),
+            )
+        }
+
+    def load(self, point: NDArray) -> tuple[NDArray, NDArray]:
+        r"""Read :math:`\Delta\chi^2` and status of fits of stored toys of the point."""
+        rows = self._connection.execute(
+            "SELECT chi2_point - chi2_global, success FROM toys WHERE coordinates = ? ORDER BY toy",
+            (np.asarray(point, dtype=np.float64).tobytes(),),
+        ).fetchall()
+        delta_chi2, success = np.array(rows, dtype=np.float64).reshape(-1, 2).T
+        return delta_chi2, success.astype(bool)
+
+
+def get_store_options(args: Namespace) -> dict[str, Any]:
+    """Collect options of the script, which change toys in the store.
+
+    Parameters
+    ----------
+    args : Namespace
+        Options of the script.
+
+    Returns
+    -------
+    dict[str, Any]
+        Options of model, truth, generation and fits of toys.
+    """
+    return {
+        "source_type": args.source_type,
+        "concatenation_mode": args.concatenation_mode,
+        "data": args.data,
+        "monte_carlo_mode": args.monte_carlo_mode,
+        "mc_parameters": args.mc_parameters,
+        "seed": args.seed,
+        "scan_par": [name for name, *_ in args.scan_par],
+        "statistic": args.statistic,
+        "free_parameters": args.free_parameters,
+        "constrained_parameters": args.constrained_parameters,
+    }
+
+
+def get_toy_seed(seed: int, point: NDArray, toy: int) -> SeedSequence:
+    """Get seed of the toy from seed of the run, coordinates of the point and index of the toy."""
+    words = np.frombuffer(np.asarray(point, dtype=np.float64).tobytes(), dtype=np.uint32)
+    return SeedSequence((seed, *words.tolist(), toy))
+
+
+def initialize_model(
+    args: Namespace,
+) -> tuple[Any, IMinuitMinimizer, IMinuitMinimizer, ParametersVector, ParametersVector]:
+    """Create model and minimizers for global fit and fit in the point of the grid.
+
+    Parameters
+    ----------
+    args : Namespace
+        Arguments of the script.
+
+    Returns
+    -------
+    tuple[model_dayabay, IMinuitMinimizer, IMinuitMinimizer, ParametersVector, ParametersVector]
+        Model, minimizer of all the parameters, minimizer of parameters that are not scanned,
+        binding of all the parameters and binding of scanned parameters.
+    """
+    model, minimization_parameters = create_model(
+        args, monte_carlo_mode=args.monte_carlo_mode, seed=args.seed
+    )
+    storage = model.storage
+
+    grid_parameters = [parameter for parameter, *_ in args.scan_par]
+    stat_chi2 = storage[f"outputs.statistic.{args.statistic}"]
+    minimizer_global = IMinuitMinimizer(stat_chi2, parameters=minimization_parameters)
+    minimizer_point = IMinuitMinimizer(
+        stat_chi2,
+        parameters={
+            name: parameter
+            for name, parameter in minimization_parameters.items()
+            if name not in grid_parameters
+        },
+    )
+    vector = ParametersVector(minimization_parameters)
+    grid_vector = ParametersVector(
+        {parameter: minimization_parameters[parameter] for parameter in grid_parameters}
+    )
+    return model, minimizer_global, minimizer_point, vector, grid_vector
+
+
+def get_truth(
+    model,
+    minimizer_point: IMinuitMinimizer,
+    grid_vector: ParametersVector,
+    point: NDArray,
+    data: str,
+) -> None:
+    """Set parameters of the model to truth of toys in the point of the grid.
+
+    Scanned parameters are set to the point. For real data other parameters are fitted,
+    for Asimov data they keep nominal values.
+    """
+    minimizer_point.push_initial_values()
+    grid_vector.set(point)
+    if data == "real":
+        model.switch_data("real")
+        fit = minimizer_point.fit()
+        ParametersVector(
+            dict(zip(minimizer_point.parameters_names, minimizer_point.parameters))
+        ).set(fit["x"])
+    # Output of Asimov data is replaced by pseudo-data in Monte-Carlo mode
+    model.switch_data("asimov")
+
+
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(args: Namespace) -> None:
+    """Build model and minimizers in the worker process."""
+    model, minimizer_global, minimizer_point, vector, grid_vector = initialize_model(args)
+    _worker_state.update(
+        args=args,
+        model=model,
+        minimizer_global=minimizer_global,
+        minimizer_point=minimizer_point,
+        vector=vector,
+        grid_vector=grid_vector,
+        store=ToyStore(args.store),
+        truth={},
+    )
+
+
+def _fit_toys_worker(point_index: int, point: NDArray, toys: range) -> int:
+    """Generate and fit toys in the point of the grid within model of the worker process.
+
+    Returns
+    -------
+    int
+        Number of fitted toys, stored toys are skipped.
+    """
+    state = _worker_state
+    args, model, store = state["args"], state["model"], state["store"]
+    stored = store.get_toys(point)
+    toys = [toy for toy in toys if toy not in stored]
+    if not toys:
+        return 0
+
+    # Fit of the truth is done once per point in each worker
+    if point_index not in state["truth"]:
+        get_truth(model, state["minimizer_point"], state["grid_vector"], point, args.data)
+        state["truth"][point_index] = state["vector"].values
+    truth = state["truth"][point_index]
+
+    for toy in toys:
+        # Each toy has its own seed, so it does not depend on scheduling of tasks
+        generator = model._random_generator
+        generator.bit_generator.state = MT19937(get_toy_seed(args.seed, point, toy)).state
+        state["vector"].set(truth)
+        model.next_sample(mc_parameters=args.mc_parameters, mc_statistics=True)
+        # Pseudo-data is calculated before parameters are changed by fit
+        model.storage["outputs.data.pseudo.self"].data
+
+        state["vector"].set(truth)
+        fit_global = state["minimizer_global"].fit()
+        state["vector"].set(truth)
+        fit_point = state["minimizer_point"].fit()
+        store.append(point, toy, fit_global, fit_point)
+    state["vector"].set(truth)
+    logger.info(f"Point {point}: {len(toys)} toys are fitted")
+    return len(toys)
+
+
+def main(args: Namespace) -> None:
+    parameters, grids = cartesian_product(args.scan_par)
+    size = int(np.prod([grid.size for grid in grids]))
+    grid = get_grid_points(grids, np.arange(size))
+    store = ToyStore(args.store)
+    store.register(get_store_options(args))
+
+    # Tasks are chunks of toys in points of the grid, stored toys are skipped
+    tasks = []
+    for point_index, point in enumerate(grid):
+        stored = store.get_toys(point)
+        for start in range(0, args.ntoys, args.chunk_size):
+            toys = range(start, min(start + args.chunk_size, args.ntoys))
+            if not stored.issuperset(toys):
+                tasks.append((point_index, point, toys))
+    logger.info(f"Number of tasks: {len(tasks)}, number of points: {size}")
+    with ProcessPoolExecutor(
+        max_workers=args.jobs, initializer=_initialize_worker, initargs=(args,)
+    ) as executor:
+        nfitted = sum(executor.map(_fit_toys_worker, *zip(*tasks))) if tasks else 0
+    logger.info(f"Number of fitted toys: {nfitted}")
+
+    ndof = len(parameters)
+    levels = np.asarray(args.confidence_levels)
+    critical_chi2 = np.full((size, levels.size), np.nan)
+    wilks_coverage = np.full((size, levels.size), np.nan)
+    ntoys = np.zeros(size, dtype=int)
+    for point_index, point in enumerate(grid):
+        delta_chi2, success = store.load(point)
+        delta_chi2 = delta_chi2[success]
+        ntoys[point_index] = delta_chi2.size
+        if not delta_chi2.size:
+            continue
+        critical_chi2[point_index] = np.quantile(delta_chi2, levels)
+        wilks_coverage[point_index] = (delta_chi2[:, None] <= chi2(ndof).ppf(levels)).mean(axis=0)
+        logger.info(
+            f"Point {point}: {delta_chi2.size} toys, critical values {critical_chi2[point_index]}, "
+            f"coverage of Wilks' theorem {wilks_coverage[point_index]}"
+        )
+
+    if args.output:
+        np.savez(
+            args.output,
+            parameters=np.array(parameters),
+            grid=grid,
+            confidence_levels=levels,
+            critical_chi2=critical_chi2,
+            wilks_chi2=chi2(ndof).ppf(levels),
+            wilks_coverage=wilks_coverage,
+            ntoys=ntoys,
+        )
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--source-type",
+        default=None,
+        help="Source type of dataset loaded from dayabay-data-official",
+    )
+    parser.add_argument(
+        "--concatenation-mode",
+        default="detector_period",
+        choices=["detector", "detector_period"],
+        help="Choose type of concatenation for final observation: by detector or by detector and period",
+    )
+    parser.add_argument(
+        "--data",
+        default="real",
+        choices=["asimov", "real"],
+        help="Choose data to fit parameters of truth, which are not scanned",
+    )
+    parser.add_argument(
+        "--monte-carlo-mode",
+        "--mc",
+        default="poisson",
+        choices=["poisson", "normal-stats"],
+        help="Choose Monte-Carlo option",
+    )
+    parser.add_argument(
+        "--mc-parameters",
+        action="store_true",
+        help="Vary constrained parameters in generation of toys",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="Choose seed for random generation, each toy uses seed (seed, coordinates of point, toy)",
+    )
+    parser.add_argument(
+        "--scan-par",
+        nargs=4,
+        action="append",
+        default=[],
+        help="linspace of parameter",
+    )
+    parser.add_argument(
+        "--statistic",
+        default="full.pull.chi2cnp",
+        choices=[
+            "stat.chi2p_iterative",
+            "stat.chi2n",
+            "stat.chi2p",
+            "stat.chi2cnp",
+            "stat.chi2p_unbiased",
+            "stat.chi2poisson",
+            "full.covmat.chi2p_iterative",
+            "full.covmat.chi2n",
+            "full.covmat.chi2p",
+            "full.covmat.chi2p_unbiased",
+            "full.covmat.chi2cnp",
+            "full.pull.chi2p_iterative",
+            "full.pull.chi2p",
+            "full.pull.chi2cnp",
+            "full.pull.chi2p_unbiased",
+            "full.pull.chi2poisson",
+        ],
+        help="Choose chi-squared function for minimizer",
+    )
+    parser.add_argument(
+        "--covariance-cache",
+        default=None,
+        help="Directory to cache Jacobians of systematic covariance matrix for `full.covmat.*` statistics",
+    )
+    parser.add_argument(
+        "--free-parameters",
+        default=[],
+        nargs="*",
+        help="Add free parameters to minimization process",
+    )
+    parser.add_argument(
+        "--constrained-parameters",
+        default=[],
+        nargs="*",
+        help="Add constrained parameters to minimization process",
+    )
+    parser.add_argument("--ntoys", default=1000, type=int, help="Number of toys in each point")
+    parser.add_argument(
+        "--chunk-size",
+        default=100,
+        type=int,
+        help="Number of toys of a single task of worker",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of worker processes, each worker builds its own model",
+    )
+    parser.add_argument(
+        "--confidence-levels",
+        default=[0.6827, 0.9545, 0.9973],
+        type=float,
+        nargs="+",
+        help="Confidence levels of critical values",
+    )
+    parser.add_argument(
+        "--store",
+        required=True,
+        help="Path to SQLite file, where each toy is saved, existing file is resumed",
+    )
+    parser.add_argument(
+        "--output",
+        help="Path to save critical values of chi-squared, supports npz",
+    )
+
+    args = parser.parse_args()
+
+    main(args)
@@ -22,7 +22,7 @@ from dag_modelling.tools.make_fcn import make_fcn
 from dayabay_data_official import get_path_data
 from dayabay_model import model_dayabay
 
-from fits import filter_save_fit
+from fits import StatisticGradient, filter_save_fit
 
 
 def main(args) -> None:
@@ -76,9 +76,16 @@ def main(args) -> None:
         safe=False,
     )
 
+    gradient = None
+    if args.gradient:
+        gradient = StatisticGradient(storage[f"outputs.statistic.{args.statistic}"], parameters)
+
     # Initialize minimizer
     minimizer = iminuit.Minuit(
-        fcn, name=parameters.keys(), **{name: par.value for name, par in parameters.items()}
+        fcn,
+        grad=gradient,
+        name=parameters.keys(),
+        **{name: par.value for name, par in parameters.items()},
     )
     # Do fit
     result = minimizer.migrad()
@@ -146,6 +153,11 @@ if __name__ == "__main__":
         default=[],
         help="choose parameters for Minos profiling",
     )
+    parser.add_argument(
+        "--gradient",
+        action="store_true",
+        help="Pass gradient of statistic to Minuit instead of numerical derivatives",
+    )
     parser.add_argument(
         "--output",
         type=str,
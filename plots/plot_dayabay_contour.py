@@ -32,7 +32,9 @@ def convert_to_dm_ee(dm32: NDArray | float):
     return cos_sq_theta12 * (delta_m_sq21 + dm32) + sin_sq_theta12 * dm32
 
 
-def calculate_errors(x: NDArray, y: NDArray, bf: float) -> tuple[float, float]:
+def calculate_errors(
+    x: NDArray, y: NDArray, bf: float, surrogate: bool = False
+) -> tuple[float, float]:
     """Calculate errors for best fit point based on 1d profile
 
     Parameters
@@ -43,6 +45,8 @@ def calculate_errors(x: NDArray, y: NDArray, bf: float) -> tuple[float, float]:
         Y-axis of profile
     bf : float
         Best fit value of chosen parameter
+    surrogate : bool, optional
+        Use cubic spline surrogate `fits.Chi2Surrogate` instead of quadratic interpolation
 
     Returns
     -------
@@ -50,6 +54,13 @@ def calculate_errors(x: NDArray, y: NDArray, bf: float) -> tuple[float, float]:
         Values of left and right errors
     """
 
+    if surrogate:
+        from fits import Chi2Surrogate
+
+        _, error_left, error_right = Chi2Surrogate(y, 0.0, grids=[x]).get_errors(
+            1.0, float(np.squeeze(bf))
+        )
+        return error_left, error_right
     interp = interp1d(x, y - 1, kind="quadratic")
     return (bf - bisect(interp, x.min(), x.mean()), bisect(interp, x.mean(), x.max()) - bf)
 
@@ -135,7 +146,9 @@ def main(args: Namespace) -> None:
     fig, axes = plt.subplots(2, 2, gridspec_kw={"width_ratios": [3, 1], "height_ratios": [1, 3]})
 
     sin_sq2theta13, chi2_profile = data["chi2map1d_x"].T
-    best_fit_x_errors = calculate_errors(sin_sq2theta13, chi2_profile, best_fit_x)
+    best_fit_x_errors = calculate_errors(
+        sin_sq2theta13, chi2_profile, best_fit_x, args.surrogate
+    )
     label = r"$\Delta\chi^2$"
     prepare_axes(
         axes[0, 0],
@@ -147,7 +160,7 @@ def main(args: Namespace) -> None:
     dm, chi2_profile = data["chi2map1d_y"].T
     if not args.dm32:
         dm = convert_to_dm_ee(dm)
-    best_fit_y_errors = calculate_errors(dm, chi2_profile, best_fit_y)
+    best_fit_y_errors = calculate_errors(dm, chi2_profile, best_fit_y, args.surrogate)
     prepare_axes(
         axes[1, 1],
         limits=[(0, 20), (xy_grid[:, 1].min(), xy_grid[:, 1].max())],
@@ -158,12 +171,30 @@ def main(args: Namespace) -> None:
     ndof = 2
     levels = convert_sigmas_to_chi2(ndof, [0, 1, 2, 3])
     axes[1, 0].grid(linestyle="--")
-    axes[1, 0].tricontourf(xy_grid[:, 0], xy_grid[:, 1], chi2_map - fun, levels=levels, cmap="GnBu")
+    if args.surrogate:
+        from fits import Chi2Surrogate
+
+        surrogate = Chi2Surrogate.from_npz(args.chi2map)
+        _, residuals = surrogate.get_residuals()
+        print(
+            f"Surrogate: {surrogate.method}, maximal residual of interpolation "
+            f"{np.abs(residuals).max():.3g} in {residuals.size} points"
+        )
+        (x_min, x_max), (y_min, y_max) = surrogate.bounds
+        x, y = np.meshgrid(np.linspace(x_min, x_max, 200), np.linspace(y_min, y_max, 200))
+        delta_chi2 = surrogate(np.stack((x.ravel(), y.ravel()), axis=1)).reshape(x.shape)
+        if not args.dm32:
+            y = convert_to_dm_ee(y)
+        axes[1, 0].contourf(x, y, delta_chi2, levels=levels, cmap="GnBu")
+    else:
+        axes[1, 0].tricontourf(
+            xy_grid[:, 0], xy_grid[:, 1], chi2_map - fun, levels=levels, cmap="GnBu"
+        )
     axes[1, 0].errorbar(
         best_fit_x,
         best_fit_y,
-        xerr=best_fit_x_errors,
-        yerr=best_fit_y_errors,
+        xerr=np.reshape(best_fit_x_errors, (2, 1)),
+        yerr=np.reshape(best_fit_y_errors, (2, 1)),
         color="black",
         marker="o",
         markersize=3,
@@ -205,6 +236,13 @@ if __name__ == "__main__":
         action="store_true",
         help=r"Switch plot y-axis from $\Delta m^2_{32}$ to $\Delta m^2_{ee}$",
     )
+    parser.add_argument(
+        "--surrogate",
+        action="store_true",
+        help="draw contours of spline (RBF for scattered points) surrogate of the map "
+        "instead of triangulation and calculate errors with spline of 1d profiles, "
+        "requires the root of repository in PYTHONPATH",
+    )
     parser.add_argument(
         "--show",
         action="store_true",
@@ -0,0 +1,207 @@
+import sqlite3
+
+import h5py
+import numpy as np
+import pytest
+from dayabay_model import model_dayabay
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import ParametersVector, get_profile_of_map, update_dict_parameters
+from fits.fit_dayabay_dgm_chi2map import (
+    ScanStore,
+    create_map_file,
+    get_grid_points,
+    get_initial_values_from_map,
+    get_traversal_batches,
+    get_traversal_order,
+    save_map_points,
+    scan_grid,
+)
+
+STATISTIC = "stat.chi2cnp"
+GRID_PARAMETER = "survival_probability.SinSq2Theta13"
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = model_dayabay()
+    model.switch_data("real")
+    return model
+
+
+@pytest.fixture
+def parameters(model):
+    parameters: dict = {}
+    update_dict_parameters(
+        parameters,
+        ["survival_probability", "detector.global_normalization"],
+        model.storage["parameters.free"],
+    )
+    return parameters
+
+
+@pytest.fixture
+def scan(model, parameters):
+    """Scan of sin^2 2theta_13 with the other free parameters fitted."""
+    minimizer = IMinuitMinimizer(
+        model.storage[f"outputs.statistic.{STATISTIC}"],
+        parameters={name: value for name, value in parameters.items() if name != GRID_PARAMETER},
+    )
+    grid_vector = ParametersVector({GRID_PARAMETER: parameters[GRID_PARAMETER]})
+    grid = np.linspace(0.07, 0.1, 5)[:, None]
+    return minimizer, grid_vector, grid
+
+
+@pytest.mark.parametrize("traversal", ["product", "serpentine", "spiral"])
+@pytest.mark.parametrize("shape", [(7,), (4, 5), (3, 4, 5), (2, 3, 2, 3)])
+def test_traversal_batches(shape, traversal):
+    center = tuple(size // 2 for size in shape)
+
+    batches = list(get_traversal_batches(shape, traversal, center, batch_size=7))
+
+    assert all(batch.size <= 7 for batch in batches)
+    assert np.concatenate(batches) == pytest.approx(get_traversal_order(shape, traversal, center))
+
+
+@pytest.mark.parametrize("shape", [(7, 9), (5, 5, 5), (3, 5, 4, 3)])
+def test_spiral_traversal(shape):
+    center = tuple(size // 2 for size in shape)
+
+    order = get_traversal_order(shape, "spiral", center)
+
+    indices = np.stack(np.unravel_index(order, shape), axis=1)
+    ring = np.abs(indices - center).max(axis=1)
+    assert (np.diff(ring) >= 0).all()
+    # Consecutive points of a ring are mostly neighbors along all the axes
+    step = np.abs(np.diff(indices, axis=0)).max(axis=1)[np.diff(ring) == 0]
+    assert step.mean() < 1.5
+
+
+def test_profile_of_chunked_map(tmp_path):
+    parameters = ["x", "y", "z"]
+    grids = [np.linspace(0.0, 1.0, 40), np.linspace(0.0, 1.0, 30), np.linspace(0.0, 1.0, 20)]
+    shape = tuple(grid.size for grid in grids)
+    generator = np.random.default_rng(1)
+    chi2_map = generator.uniform(size=shape)
+    nfev_map = generator.integers(10, 100, size=shape)
+    # Points that are not profiled yet
+    chi2_map[0, 0] = np.nan
+    nfev_map[0, 0] = 0
+    flat_indices = np.flatnonzero(~np.isnan(chi2_map))
+
+    with create_map_file(tmp_path / "map.hdf5", parameters, grids, nfitted=2) as f:
+        save_map_points(
+            f,
+            flat_indices,
+            chi2_map.ravel()[flat_indices],
+            nfev_map.ravel()[flat_indices],
+            np.ones(flat_indices.size, dtype=bool),
+            np.zeros((flat_indices.size, 2)),
+        )
+    with h5py.File(tmp_path / "map.hdf5", "r") as f:
+        assert f["fitted"].shape == (*shape, 2)
+        assert np.count_nonzero(f["success"]) == flat_indices.size
+        assert f["chi2"].chunks != shape
+        for profile in (["z", "x"], ["y"], []):
+            assert get_profile_of_map(f["chi2"], parameters, profile) == pytest.approx(
+                get_profile_of_map(chi2_map, parameters, profile), nan_ok=True
+            )
+        assert get_profile_of_map(f["nfev"], parameters, ["x", "y"], reduce=np.add) == (
+            pytest.approx(nfev_map.sum(axis=2))
+        )
+
+
+def test_resume_scan(scan, tmp_path, monkeypatch):
+    minimizer, grid_vector, grid = scan
+    chi2_expected, _, fitted_expected, success_expected = scan_grid(minimizer, grid_vector, grid)
+    assert success_expected.all()
+
+    # Scan is killed after two fits
+    fit = IMinuitMinimizer.fit
+    nfits = 0
+
+    def fit_and_crash(self, **kwargs):
+        nonlocal nfits
+        if nfits == 2:
+            raise KeyboardInterrupt
+        nfits += 1
+        return fit(self, **kwargs)
+
+    store = ScanStore(tmp_path / "store.sqlite")
+    store.register("1d", ["x"])
+    with monkeypatch.context() as patch:
+        patch.setattr(IMinuitMinimizer, "fit", fit_and_crash)
+        with pytest.raises(KeyboardInterrupt):
+            scan_grid(minimizer, grid_vector, grid, store=store, scan="1d")
+    with pytest.raises(RuntimeError):
+        store.load("1d", grid)
+    # Failed fit in store is fitted again
+    with sqlite3.connect(tmp_path / "store.sqlite") as connection:
+        connection.execute("UPDATE points SET chi2 = 0, success = 0 WHERE rowid = 1")
+
+    store = ScanStore(tmp_path / "store.sqlite", resume=True)
+    chi2, _, fitted, success = scan_grid(minimizer, grid_vector, grid, store=store, scan="1d")
+
+    assert success.all()
+    assert chi2 == pytest.approx(chi2_expected, rel=1e-6)
+    assert fitted == pytest.approx(fitted_expected, rel=1e-3)
+    chi2_stored, _, _, success_stored = store.load("1d", grid)
+    assert success_stored.all()
+    assert chi2_stored == pytest.approx(chi2, rel=1e-12)
+
+
+def test_scan_1d_from_map(model, parameters, scan):
+    minimizer_1d, grid_vector, grid = scan
+    grid_parameters = [GRID_PARAMETER, "survival_probability.DeltaMSq32"]
+    fitted_parameters = [name for name in parameters if name not in grid_parameters]
+    grids = [grid[:, 0], np.linspace(0.0024, 0.0026, 3)]
+    shape = tuple(axis.size for axis in grids)
+    minimizer_2d = IMinuitMinimizer(
+        model.storage[f"outputs.statistic.{STATISTIC}"],
+        parameters={name: parameters[name] for name in fitted_parameters},
+    )
+    chi2_map, _, fitted_map, _ = scan_grid(
+        minimizer_2d,
+        ParametersVector({name: parameters[name] for name in grid_parameters}),
+        get_grid_points(grids, np.arange(np.prod(shape))),
+    )
+    initial_values = get_initial_values_from_map(
+        grids,
+        chi2_map.reshape(shape),
+        fitted_map.reshape(*shape, -1),
+        grid_parameters,
+        fitted_parameters,
+        GRID_PARAMETER,
+        minimizer_1d.parameters_names,
+    )
+
+    chi2_expected, _, _, _ = scan_grid(minimizer_1d, grid_vector, grid)
+    # Fits truncated by the limit are completed
+    chi2, nfev, _, success = scan_grid(
+        minimizer_1d, grid_vector, grid, initial_values=initial_values, ncall=10
+    )
+
+    assert success.all()
+    assert (nfev > 10).all()
+    assert chi2 == pytest.approx(chi2_expected, rel=1e-6)
+
+
+def test_warm_start_from_profiled(scan, monkeypatch):
+    minimizer, grid_vector, grid = scan
+    _, _, fitted_expected, _ = scan_grid(minimizer, grid_vector, grid[:2])
+
+    # Start values of each fit are recorded
+    fit = IMinuitMinimizer.fit
+    starts = []
+
+    def fit_and_record(self, **kwargs):
+        starts.append([parameter.value for parameter in self.parameters])
+        return fit(self, **kwargs)
+
+    monkeypatch.setattr(IMinuitMinimizer, "fit", fit_and_record)
+    # The first point starts from the nearest of points profiled before
+    profiled = (np.array([[0], [1], [4]]), fitted_expected[[0, 1, 1]] * [[1.0], [1.0], [2.0]])
+    scan_grid(minimizer, grid_vector, grid[2:4], np.array([[2], [3]]), profiled=profiled)
+
+    assert starts[0] == pytest.approx(fitted_expected[1], rel=1e-12)
+    assert len(starts) == 2
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from fits import Chi2Surrogate
+
+
+def parabola(x: np.ndarray) -> np.ndarray:
+    return 10.0 + ((x - 1.0) / 0.5) ** 2 + 0.5 * (x - 1.0) ** 3
+
+
+def ellipse(points: np.ndarray) -> np.ndarray:
+    x, y = (points / [0.1, 2.0e-4]).T
+    return 100.0 + (x**2 - 1.2 * x * y + y**2) / (1 - 0.6**2)
+
+
+@pytest.mark.parametrize("level", [1.0, 4.0])
+def test_get_errors(level):
+    grid = np.linspace(-1.0, 3.0, 41)
+    surrogate = Chi2Surrogate(parabola(grid), 10.0, grids=[grid])
+    roots = np.roots([0.5, 4.0, 0.0, -level]).real
+    left, right = -roots[(roots < 0) & (roots > -2)].max(), roots[roots > 0].min()
+
+    best_fit, error_left, error_right = surrogate.get_errors(level)
+
+    assert best_fit == pytest.approx(1.0, abs=1e-10)
+    assert error_left == pytest.approx(left, rel=1e-8)
+    assert error_right == pytest.approx(right, rel=1e-8)
+    assert error_left > error_right
+
+
+def test_get_errors_not_crossed():
+    grid = np.linspace(0.8, 3.0, 23)
+    surrogate = Chi2Surrogate(parabola(grid), 10.0, grids=[grid])
+
+    best_fit, error_left, error_right = surrogate.get_errors(1.0, best_fit=1.0)
+
+    assert best_fit == 1.0
+    assert np.isnan(error_left)
+    assert error_right > 0
+
+
+@pytest.mark.parametrize("level", [2.3, 6.18])
+def test_get_contours(level):
+    grids = [np.linspace(-0.4, 0.4, 21), np.linspace(-8e-4, 8e-4, 21)]
+    points = np.stack(np.meshgrid(*grids, indexing="ij"), axis=-1).reshape(-1, 2)
+    surrogate = Chi2Surrogate(ellipse(points), 100.0, grids=grids)
+
+    (contour,) = surrogate.get_contours(level, num=400)
+
+    assert ellipse(contour) - 100.0 == pytest.approx(level, rel=1e-3)
+    assert contour[0] == pytest.approx(contour[-1])
+
+
+def test_from_npz(tmp_path):
+    grids = [np.linspace(-0.4, 0.4, 9), np.linspace(-8e-4, 8e-4, 7)]
+    points = np.stack(np.meshgrid(*grids, indexing="ij"), axis=-1).reshape(-1, 2)
+    chi2map = np.stack((*points.T, ellipse(points)), axis=1)
+    best_fit_values = np.array(
+        [(0.0, 0.0, 100.0)], dtype=[("x", np.float64), ("y", np.float64), ("fun", np.float64)]
+    )
+    np.savez(tmp_path / "grid.npz", chi2map2d=chi2map, best_fit_values=best_fit_values)
+    np.savez(tmp_path / "scattered.npz", chi2map2d=chi2map[1:], best_fit_values=best_fit_values)
+
+    grid = Chi2Surrogate.from_npz(tmp_path / "grid.npz")
+    scattered = Chi2Surrogate.from_npz(tmp_path / "scattered.npz")
+
+    assert grid.points is None
+    assert [axis.size for axis in grid.grids] == [9, 7]
+    assert grid.method == "cubic"
+    assert scattered.grids is None
+    assert scattered.points.shape == (points.shape[0] - 1, 2)
+    assert scattered.method == "thin_plate_spline"
+    assert grid.fun == scattered.fun == 100.0
+    assert scattered(points[1:]) == pytest.approx(ellipse(points[1:]) - 100.0, abs=1e-6)
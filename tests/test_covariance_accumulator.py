@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from covmatrix_mc import CovarianceAccumulator
+
+
+@pytest.fixture
+def samples() -> np.ndarray:
+    generator = np.random.default_rng(1)
+    return generator.normal(loc=10.0, scale=[1.0, 2.0, 3.0, 0.5], size=(257, 4))
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 100, 1000])
+def test_add(samples, block_size):
+    accumulator = CovarianceAccumulator(samples.shape[1], block_size)
+    for sample in samples:
+        accumulator.add(sample)
+
+    assert accumulator.covariance() == pytest.approx(np.cov(samples, rowvar=False), rel=1e-12)
+    assert accumulator.mean == pytest.approx(samples.mean(axis=0), rel=1e-12)
+    assert accumulator.count == samples.shape[0]
+
+
+def test_covariance_asimov(samples):
+    accumulator = CovarianceAccumulator(samples.shape[1], 10)
+    for sample in samples:
+        accumulator.add(sample)
+    asimov = np.full(samples.shape[1], 10.0)
+    deviations = samples - asimov
+
+    assert accumulator.covariance(asimov) == pytest.approx(
+        deviations.T @ deviations / samples.shape[0], rel=1e-12
+    )
+
+
+@pytest.mark.parametrize("splits", [[1], [100, 101], [3, 50, 200], [256]])
+def test_merge(samples, splits):
+    accumulator = CovarianceAccumulator(samples.shape[1], 16)
+    for stream, block_size in zip(np.split(samples, splits), [5, 16, 100, 3]):
+        stream_accumulator = CovarianceAccumulator(samples.shape[1], block_size)
+        for sample in stream:
+            stream_accumulator.add(sample)
+        accumulator.merge(stream_accumulator)
+
+    assert accumulator.covariance() == pytest.approx(np.cov(samples, rowvar=False), rel=1e-12)
+    assert accumulator.count == samples.shape[0]
+
+
+def test_merge_empty(samples):
+    accumulator = CovarianceAccumulator(samples.shape[1], 16)
+    for sample in samples:
+        accumulator.add(sample)
+    accumulator.merge(CovarianceAccumulator(samples.shape[1], 16))
+
+    assert accumulator.covariance() == pytest.approx(np.cov(samples, rowvar=False), rel=1e-12)
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from covmatrix_mc import (
+    CovarianceAccumulator,
+    accumulate_covariance_streams,
+    create_generators,
+    split_samples,
+)
+
+SAMPLERS = ["normal", "sobol", "latin-hypercube", "antithetic"]
+# Observation is quadratic over normalized parameters
+QUADRATIC = 0.1
+
+
+class Observation:
+    """Observation y = A x + c (A x)^2 over normalized parameters x."""
+
+    def __init__(self, matrix, parameters, quadratic=QUADRATIC):
+        self.matrix = matrix
+        self.parameters = parameters
+        self.quadratic = quadratic
+
+    @property
+    def data(self):
+        linear = self.matrix @ np.array([parameter.value for parameter in self.parameters])
+        return linear + self.quadratic * linear**2
+
+
+@pytest.fixture(scope="module")
+def observation():
+    generator = np.random.default_rng(1)
+    parameters = [SimpleNamespace(value=0.0) for _ in range(6)]
+    return Observation(generator.normal(size=(10, len(parameters))), parameters)
+
+
+def get_covariance(observation, sampler, N, nstreams=1, steps=1, seed=1):
+    accumulator = CovarianceAccumulator(observation.matrix.shape[0])
+    generators = create_generators(seed, nstreams)
+    for N_step in split_samples(N, steps, 2):
+        generators = accumulate_covariance_streams(
+            accumulator,
+            generators,
+            N_step,
+            observation.parameters,
+            observation,
+            sampler=sampler,
+            seed=seed,
+            total=N,
+        )
+    return accumulator.covariance()
+
+
+def get_error(observation, covariance):
+    # Covariance of quadratic function of normal parameters is known exactly
+    linear = observation.matrix @ observation.matrix.T
+    expected = linear + 2 * QUADRATIC**2 * linear**2
+    return np.linalg.norm(covariance - expected) / np.linalg.norm(expected)
+
+
+@pytest.mark.parametrize("N", [9, 16, 23])
+@pytest.mark.parametrize("multiple", [1, 2])
+def test_split_samples(N, multiple):
+    counts = split_samples(N, 4, multiple)
+
+    assert sum(counts) == N
+    assert all(count % multiple == 0 for count in counts[:-1])
+    assert max(counts[:-1]) - min(counts[:-1]) <= multiple
+
+
+@pytest.mark.parametrize("sampler", ["sobol", "latin-hypercube"])
+def test_quasi_random_sequence(observation, sampler):
+    # Sequence is split between streams and steps, it does not depend on them
+    covariance = get_covariance(observation, sampler, 256)
+
+    assert get_covariance(observation, sampler, 256, nstreams=3, steps=4) == pytest.approx(
+        covariance, rel=1e-10
+    )
+
+
+def test_antithetic_pairs(observation):
+    # Pairs are kept within streams and steps, so the mean of linear observation is exact
+    linear = Observation(observation.matrix, observation.parameters, quadratic=0.0)
+    accumulator = CovarianceAccumulator(linear.matrix.shape[0])
+    generators = create_generators(1, 3)
+    for N_step in (10, 6):
+        generators = accumulate_covariance_streams(
+            accumulator, generators, N_step, linear.parameters, linear, sampler="antithetic"
+        )
+
+    assert accumulator.count == 16
+    assert accumulator.mean == pytest.approx(0.0, abs=1e-12)
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS)
+def test_frobenius_error(observation, sampler):
+    errors = [
+        get_error(observation, get_covariance(observation, sampler, N, nstreams=4))
+        for N in (2**8, 2**12, 2**16)
+    ]
+
+    # Error of pseudo-random samplers falls as 1/sqrt(N)
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] < 0.03
+    if sampler == "sobol":
+        assert errors[2] < 0.002
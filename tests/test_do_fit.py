@@ -0,0 +1,63 @@
+import pytest
+from dayabay_model import model_dayabay
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import ParametersVector, do_fit, update_dict_parameters, update_fixed_covariance
+
+STATISTIC = "stat.chi2p_iterative"
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = model_dayabay()
+    model.switch_data("real")
+    return model
+
+
+@pytest.fixture
+def minimizer(model):
+    parameters: dict = {}
+    update_dict_parameters(
+        parameters,
+        ["survival_probability", "detector.global_normalization"],
+        model.storage["parameters.free"],
+    )
+    statistic = model.storage[f"outputs.statistic.{STATISTIC}"]
+    statistic.data
+    vector = ParametersVector(parameters)
+    nominal = vector.values
+    yield IMinuitMinimizer(statistic, parameters=parameters)
+    # Statistical errors are restored in the nominal point for the next test
+    vector.set(nominal)
+    update_fixed_covariance(model, STATISTIC)
+
+
+def is_converged(iteration):
+    # Parameters and chi-squared are stable or prediction has not moved
+    stable = iteration["max_shift"] < 0.01 and abs(iteration["delta_fun"]) < 1e-3
+    return stable or (iteration["prediction_shift"] or 1.0) < 1e-6
+
+
+@pytest.mark.parametrize("ncall", [None, 10])
+def test_do_fit_iterative(model, minimizer, ncall):
+    fit = do_fit(minimizer, model, 10, ncall=ncall)
+
+    iterations = fit["iterations"]
+    assert fit["success"]
+    assert fit["converged"]
+    assert is_converged(iterations[-1])
+    assert not any(is_converged(iteration) for iteration in iterations[1:-1])
+    # Statistical errors of the nominal point are far from the best fit
+    assert len(iterations) > 2
+    assert abs(iterations[1]["delta_fun"]) > 1.0
+    assert fit["nfev_iterations"] == sum(iteration["nfev"] for iteration in iterations)
+    if ncall is not None:
+        # The first fit is truncated by the limit and completed
+        assert iterations[0]["nfev"] > ncall
+
+
+def test_do_fit_not_converged(model, minimizer):
+    fit = do_fit(minimizer, model, 1)
+
+    assert not fit["converged"]
+    assert len(fit["iterations"]) == 2
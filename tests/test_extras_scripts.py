@@ -1,5 +1,8 @@
+import os
 import subprocess
 
+import pytest
+
 
 def _run_script(script: str) -> tuple[str, str, int]:
     print("Starting the test of the following script: ", script)
@@ -33,3 +36,119 @@ def test_run_dayabay_plot_all_nodes():
 
     assert code == 0
     assert stderr == ""
+
+
+def test_profile_parallel_matches_minos(tmp_path):
+    """Errors of `--profile-parallel` match sequential Minos, see `scripts/fit_dayabay_dgm.sh`."""
+    from yaml import safe_load
+
+    errors = {}
+    for label, options in (("minos", []), ("parallel", ["--profile-parallel", "--jobs", "1"])):
+        output = tmp_path / f"fit-{label}.yaml"
+        result = subprocess.run(
+            [
+                "./fits/fit_dayabay_dgm.py",
+                "--data",
+                "asimov",
+                "--statistic",
+                "stat.chi2cnp",
+                "--free-parameters",
+                "survival_probability.DeltaMSq32",
+                "survival_probability.SinSq2Theta13",
+                "--profile-parameters",
+                "survival_probability.DeltaMSq32",
+                "survival_probability.SinSq2Theta13",
+                *options,
+                "--output",
+                str(output),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+        assert result.returncode == 0, result.stderr.decode()
+        with open(output) as f:
+            errors[label] = safe_load(f)["errorsdict_profiled"]
+
+    assert errors["parallel"].keys() == errors["minos"].keys()
+    for name, (lower, upper) in errors["minos"].items():
+        assert errors["parallel"][name] == pytest.approx([lower, upper], rel=1e-3)
+
+
+def test_covariance_workers_bit_identical(tmp_path):
+    """Monte-Carlo matrix depends on `--seed` and `--streams`, but not on `--workers`."""
+    import numpy as np
+
+    matrices = {}
+    for workers in (1, 2):
+        output = tmp_path / f"covariance-{workers}.npy"
+        result = subprocess.run(
+            [
+                "./covariances/covmatrix_mc.py",
+                "--systematic-parameters-groups",
+                "detector",
+                "--num",
+                "12",
+                "--seed",
+                "2",
+                "--streams",
+                "3",
+                "--workers",
+                str(workers),
+                "--output",
+                str(output),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, "PYTHONPATH": os.getcwd(), "MPLBACKEND": "Agg"},
+        )
+        assert result.returncode == 0, result.stderr.decode()
+        matrices[workers] = np.load(output)
+
+    assert np.array_equal(matrices[1], matrices[2])
+
+
+def test_chi2_map_jobs_match_serial(tmp_path):
+    """N-d and 1d scans in `--jobs` worker processes match serial scans."""
+    import numpy as np
+
+    keys = ("chi2map2d", "chi2map1d_x", "chi2map1d_y", "success2d", "success1d_x", "success1d_y")
+    maps = {}
+    for jobs in (1, 2):
+        output = tmp_path / f"chi2map-{jobs}.npz"
+        result = subprocess.run(
+            [
+                "./fits/fit_dayabay_dgm_chi2map.py",
+                "--statistic",
+                "stat.chi2cnp",
+                "--free-parameters",
+                "survival_probability",
+                "detector.global_normalization",
+                "--scan-par",
+                "survival_probability.SinSq2Theta13",
+                "0.08",
+                "0.09",
+                "3",
+                "--scan-par",
+                "survival_probability.DeltaMSq32",
+                "2.4e-3",
+                "2.6e-3",
+                "3",
+                "--scan-1d",
+                "--jobs",
+                str(jobs),
+                "--output",
+                str(output),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+        assert result.returncode == 0, result.stderr.decode()
+        with np.load(output) as f:
+            maps[jobs] = {key: f[key] for key in keys}
+
+    for key in keys:
+        assert maps[2][key] == pytest.approx(maps[1][key], rel=1e-6)
+    for key in ("success2d", "success1d_x", "success1d_y"):
+        assert maps[2][key][:, -1].all()
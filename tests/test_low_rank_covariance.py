@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from fits import LowRankCovariance
+
+
+@pytest.fixture
+def covariance() -> LowRankCovariance:
+    generator = np.random.default_rng(1)
+    factor = generator.normal(size=(40, 5))
+    diagonal = generator.uniform(0.5, 2.0, size=40)
+    return LowRankCovariance(factor, diagonal)
+
+
+@pytest.fixture
+def residual() -> np.ndarray:
+    return np.random.default_rng(2).normal(size=40)
+
+
+@pytest.mark.parametrize("statistical", [False, True])
+def test_woodbury(covariance, residual, statistical):
+    diagonal = np.linspace(0.1, 1.0, residual.size) if statistical else None
+    matrix = covariance.factor @ covariance.factor.T + np.diag(covariance.diagonal)
+    if statistical:
+        matrix += np.diag(diagonal)
+
+    assert covariance.solve(residual, diagonal) == pytest.approx(
+        np.linalg.solve(matrix, residual), rel=1e-10
+    )
+    assert covariance.chi2(residual, diagonal) == pytest.approx(
+        residual @ np.linalg.solve(matrix, residual), rel=1e-10
+    )
+    assert covariance.log_determinant(diagonal) == pytest.approx(
+        np.linalg.slogdet(matrix)[1], rel=1e-10
+    )
+
+
+def test_from_matrix(covariance):
+    matrix = covariance.to_matrix()
+    full = LowRankCovariance.from_matrix(matrix)
+    truncated = LowRankCovariance.from_matrix(matrix, rank=3)
+
+    assert full.to_matrix() == pytest.approx(matrix, rel=1e-10, abs=1e-12)
+    assert np.diagonal(truncated.to_matrix()) == pytest.approx(np.diagonal(matrix), rel=1e-12)
+    assert truncated.rank == 3
+    assert 0.0 < truncated.retained_variance < 1.0
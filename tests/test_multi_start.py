@@ -0,0 +1,77 @@
+import os
+import subprocess
+
+import pytest
+from yaml import safe_load
+
+from fits.fit_dayabay_dgm import get_basins
+
+
+def make_fit(fun, x, y, success=True):
+    return {
+        "fun": fun,
+        "success": success,
+        "xdict": {"x": x, "y": y},
+        "errorsdict": {"x": 0.1, "y": 1.0},
+    }
+
+
+def test_get_basins():
+    fits = [
+        make_fit(10.0, 0.0, 0.0),
+        make_fit(10.005, 0.05, 0.5),
+        # Degenerate minimum: the same chi-squared, but far in units of errors
+        make_fit(10.001, 1.0, 0.0),
+        make_fit(12.0, 0.0, 0.0),
+        make_fit(9.0, 0.0, 0.0, success=False),
+    ]
+
+    basins = get_basins(fits, tolerance=1e-2, distance=1.0)
+
+    assert [basin["fun"] for basin in basins] == [10.0, 10.001, 12.0]
+    assert [basin["count"] for basin in basins] == [2, 1, 1]
+    assert basins[1]["xdict"] == {"x": 1.0, "y": 0.0}
+    assert sum(basin["fraction"] for basin in basins) == pytest.approx(0.8)
+    # Without distance minima are grouped by chi-squared only
+    assert [basin["count"] for basin in get_basins(fits, 1e-2, float("inf"))] == [3, 1]
+
+
+def test_fit_multi_start(tmp_path):
+    """Fits from different start points of Asimov data reach the same minimum."""
+    output = tmp_path / "fit.yaml"
+    result = subprocess.run(
+        [
+            "./fits/fit_dayabay_dgm.py",
+            "--data",
+            "asimov",
+            "--statistic",
+            "stat.chi2cnp",
+            "--free-parameters",
+            "survival_probability.DeltaMSq32",
+            "survival_probability.SinSq2Theta13",
+            "--multi-start",
+            "3",
+            "--multi-start-limits",
+            "survival_probability.SinSq2Theta13",
+            "0.07",
+            "0.1",
+            "--multi-start-limits",
+            "survival_probability.DeltaMSq32",
+            "2.3e-3",
+            "2.7e-3",
+            "--output",
+            str(output),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    assert result.returncode == 0, result.stderr.decode()
+    with open(output) as f:
+        fit = safe_load(f)
+
+    summary = fit["multi_start"]
+    assert all(summary["success"])
+    assert len(summary["basins"]) == 1
+    assert summary["basins"][0]["count"] == 3
+    assert fit["fun"] == pytest.approx(summary["basins"][0]["fun"], abs=1e-2)
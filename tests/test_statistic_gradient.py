@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from dayabay_model import model_dayabay
+
+from fits import IMinuitGradientMinimizer, ParametersVector, StatisticGradient
+
+STATISTIC = "stat.chi2cnp"
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = model_dayabay()
+    model.switch_data("real")
+    return model
+
+
+@pytest.fixture
+def parameters(model):
+    storage = model.storage
+    parameters: dict = dict(storage["parameters.free"]["survival_probability"].walkjoineditems())
+    parameters["global_normalization"] = storage["parameters.free.detector.global_normalization"]
+    return parameters
+
+
+def get_numeric_gradient(statistic, vector, point, steps):
+    gradient = np.empty_like(point)
+    for i, step in enumerate(steps):
+        shift = np.zeros_like(point)
+        shift[i] = step
+        vector.set(point + shift)
+        upper = statistic.data[0]
+        vector.set(point - shift)
+        gradient[i] = (upper - statistic.data[0]) / (2.0 * step)
+    vector.set(point)
+    return gradient
+
+
+@pytest.mark.parametrize("method", ["central", "forward"])
+def test_gradient(model, parameters, method):
+    statistic = model.storage[f"outputs.statistic.{STATISTIC}"]
+    gradient = StatisticGradient(statistic, parameters, method=method)
+    vector = ParametersVector(parameters)
+    point = vector.values * np.array([1.05, 0.99, 1.01])
+
+    result = gradient(*point)
+
+    expected = get_numeric_gradient(statistic, vector, point, 0.1 * gradient.steps)
+    assert result == pytest.approx(expected, rel=1e-2 if method == "forward" else 1e-4)
+    assert gradient.nevaluations == (6 if method == "central" else 4)
+    # Gradient of the same point is cached
+    assert gradient(*point) == pytest.approx(result, rel=0, abs=0)
+    assert gradient.nevaluations == (6 if method == "central" else 4)
+
+
+def test_gradient_reset(model, parameters):
+    storage = model.storage
+    statistic = storage[f"outputs.statistic.{STATISTIC}"]
+    minimizer = IMinuitGradientMinimizer(statistic, parameters)
+    vector = ParametersVector(parameters)
+    point = vector.values
+    gradient = minimizer.gradient(*point)
+
+    # Statistic is changed by parameter, which is not minimized
+    efficiency = ParametersVector.from_groups(
+        ["detector.detector_relative"], storage["parameters.constrained"]
+    )
+    nominal = efficiency.values
+    efficiency.set(nominal + 0.01)
+    try:
+        assert minimizer.gradient(*point) == pytest.approx(gradient, rel=0, abs=0)
+        minimizer.init_minimizer()
+        vector.set(point)
+        changed = minimizer.gradient(*point)
+        assert changed == pytest.approx(StatisticGradient(statistic, parameters)(*point))
+        assert changed != pytest.approx(gradient)
+    finally:
+        efficiency.set(nominal)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from dayabay_model import model_dayabay
+from dgm_fit.iminuit_minimizer import IMinuitMinimizer
+
+from fits import GaussNewtonMinimizer, ParametersVector, StatisticResiduals
+
+STATISTICS = [
+    *(f"stat.{name}" for name in ("chi2p_iterative", "chi2n", "chi2p", "chi2cnp")),
+    *(f"full.pull.{name}" for name in ("chi2p_iterative", "chi2p", "chi2cnp")),
+    *(f"full.covmat.{name}" for name in ("chi2p_iterative", "chi2n", "chi2p", "chi2cnp")),
+]
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = model_dayabay()
+    model.switch_data("asimov")
+    storage = model.storage
+    # Asimov data and fixed statistical errors are frozen in the nominal point,
+    # parameters are shifted after the first evaluation
+    for statistic in STATISTICS:
+        storage[f"outputs.statistic.{statistic}"].data
+    model.update_covariance_matrix()
+    generator = np.random.default_rng(1)
+    normalized = ParametersVector(dict(storage["parameters.normalized"].walkjoineditems()))
+    normalized.set(generator.normal(scale=0.3, size=len(normalized)))
+    oscillation = ParametersVector.from_groups(["survival_probability"], storage["parameters.free"])
+    oscillation.set(oscillation.values * 1.05)
+    return model
+
+
+@pytest.mark.parametrize("statistic", STATISTICS)
+def test_residuals(model, statistic):
+    residuals = StatisticResiduals(model.storage, statistic)()
+
+    assert residuals @ residuals == pytest.approx(
+        model.storage[f"outputs.statistic.{statistic}"].data[0], rel=1e-10
+    )
+
+
+@pytest.mark.parametrize("statistic", ["stat.chi2poisson", "full.pull.chi2p_unbiased"])
+def test_residuals_unsupported(model, statistic):
+    with pytest.raises(RuntimeError):
+        StatisticResiduals(model.storage, statistic)
+
+
+def test_gauss_newton(model):
+    storage = model.storage
+    statistic = "stat.chi2cnp"
+    parameters: dict = dict(storage["parameters.free"]["survival_probability"].walkjoineditems())
+    vector = ParametersVector(parameters)
+    start = vector.values
+
+    minimizer = GaussNewtonMinimizer(
+        storage[f"outputs.statistic.{statistic}"],
+        parameters,
+        residuals=StatisticResiduals(storage, statistic),
+        nbins=model.nbins,
+    )
+    fit = minimizer.fit()
+    vector.set(start)
+    fit_iminuit = IMinuitMinimizer(
+        storage[f"outputs.statistic.{statistic}"], parameters, nbins=model.nbins
+    ).fit()
+
+    assert fit["success"]
+    assert fit["nfev"] < fit_iminuit["nfev"]
+    assert fit["fun"] == pytest.approx(fit_iminuit["fun"], abs=1e-3)
+    assert fit["x"] == pytest.approx(fit_iminuit["x"], rel=1e-3)
+    # Errors of chi2cnp depend on prediction, which is not included in J^T J
+    assert fit["errors"] == pytest.approx(fit_iminuit["errors"], rel=5e-2)
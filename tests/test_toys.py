@@ -0,0 +1,58 @@
+import sqlite3
+
+import numpy as np
+import pytest
+from numpy.random import MT19937
+
+from fits.fit_dayabay_dgm_toys import ToyStore, _fit_toys_worker, _worker_state, get_toy_seed
+
+POINT = np.array([0.085, 2.5e-3])
+
+
+def make_fit(fun, success=True):
+    return {"fun": fun, "success": success, "nfev": 10, "x": np.array([0.085, 2.5e-3, 1.0])}
+
+
+def test_toy_store_resume(tmp_path):
+    filename = tmp_path / "toys.sqlite"
+    store = ToyStore(filename)
+    store.register({"seed": 1})
+    store.append(POINT, 2, make_fit(1.0), make_fit(3.0))
+    store.append(POINT, 0, make_fit(1.0), make_fit(1.5, success=False))
+    store.append(POINT + 1e-3, 1, make_fit(1.0), make_fit(2.0))
+
+    # Toys are read back after the store is opened again
+    store = ToyStore(filename)
+    store.register({"seed": 1})
+    assert store.get_toys(POINT) == {0, 2}
+    delta_chi2, success = store.load(POINT)
+    assert delta_chi2 == pytest.approx([0.5, 2.0])
+    assert success.tolist() == [False, True]
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append(POINT, 0, make_fit(1.0), make_fit(1.5))
+    with pytest.raises(RuntimeError):
+        store.register({"seed": 2})
+
+
+def test_stored_toys_are_skipped(tmp_path, monkeypatch):
+    store = ToyStore(tmp_path / "toys.sqlite")
+    for toy in range(3):
+        store.append(POINT, toy, make_fit(1.0), make_fit(2.0))
+    # Model is not touched, if all the toys of the task are stored
+    monkeypatch.setitem(_worker_state, "args", None)
+    monkeypatch.setitem(_worker_state, "model", None)
+    monkeypatch.setitem(_worker_state, "store", store)
+
+    assert _fit_toys_worker(0, POINT, range(3)) == 0
+
+
+def test_toy_seed():
+    def get_state(*key):
+        return MT19937(get_toy_seed(*key)).random_raw(4).tolist()
+
+    assert get_state(1, POINT, 3) == get_state(1, POINT.copy(), 3)
+    states = [
+        get_state(*key)
+        for key in ((1, POINT, 3), (2, POINT, 3), (1, POINT, 4), (1, POINT[::-1], 3))
+    ]
+    assert len({tuple(state) for state in states}) == len(states)